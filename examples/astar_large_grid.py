@@ -0,0 +1,50 @@
+# This file is part of OMG-tools.
+#
+# OMG-tools -- Optimal Motion Generation-tools
+# Copyright (C) 2016 Ruben Van Parys & Tim Mercy, KU Leuven.
+# All rights reserved.
+#
+# OMG-tools is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+# This example finds a path through a large room with many obstacles, using
+# the A-star algorithm on a fine grid of 400x400 cells.
+
+from omgtools import *
+import time
+
+start = [2., 2.]
+goal = [98., 98.]
+size = 100.
+
+# three walls, each with an opening at the other side, and randomly placed blocks
+environment = Environment(room={'shape': Square(size), 'position': [50., 50.]})
+for k, y in enumerate([25., 50., 75.]):
+    x = 40. if k % 2 == 0 else 60.
+    environment.add_obstacle(Obstacle({'position': [x, y]}, shape=Rectangle(width=80., height=1.)))
+np.random.seed(0)
+for position in np.random.uniform(5., 95., (40, 2)):
+    environment.add_obstacle(Obstacle({'position': list(position)}, shape=Rectangle(width=3., height=3.)))
+
+t0 = time.time()
+planner = AStarPlanner(environment, [400, 400], start, goal, options={'veh_size': 0.5})
+waypoints = planner.get_path()
+print 'Planned a path of ', len(waypoints), ' waypoints in ', time.time()-t0, ' s'
+
+# each step of the path goes to an accessible neighbouring cell
+cells = [planner.grid.get_cell(waypoint) for waypoint in waypoints]
+for cell, next_cell in zip(cells[:-1], cells[1:]):
+    if next_cell not in planner.grid.get_neighbors(cell):
+        raise RuntimeError('The path moves to a cell which is not accessible.')
+
+planner.plot_path(waypoints)
@@ -0,0 +1,56 @@
+# This file is part of OMG-tools.
+#
+# OMG-tools -- Optimal Motion Generation-tools
+# Copyright (C) 2016 Ruben Van Parys & Tim Mercy, KU Leuven.
+# All rights reserved.
+#
+# OMG-tools is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+# This example shows which grid cells the A-star planner blocks for
+# obstacles of different shapes. The obstacles are blown up with the vehicle
+# size, and every cell which overlaps with a blown up obstacle is blocked.
+
+from omgtools import *
+
+veh_size = 0.3
+environment = Environment(room={'shape': Square(10.), 'position': [5., 5.]})
+obstacles = [Obstacle({'position': [2.5, 7.]}, shape=Circle(1.2)),
+             Obstacle({'position': [7., 7.]}, shape=Rectangle(width=3., height=0.5, orientation=np.pi/6)),
+             Obstacle({'position': [4., 2.5]}, shape=RegularPolyhedron(1.5, 3, np.pi/2))]
+for obstacle in obstacles:
+    environment.add_obstacle(obstacle)
+
+planner = AStarPlanner(environment, [50, 50], [0.5, 0.5], [9.5, 9.5], options={'veh_size': veh_size})
+waypoints = planner.get_path()
+print 'Blocked ', np.sum(planner.grid.occupied), ' of ', planner.grid.occupied.size, ' cells'
+
+# points of the obstacles, moved by at most veh_size in x and y, lie in blocked cells
+np.random.seed(0)
+for obstacle in obstacles:
+    position = obstacle.signals['position'][:, -1]
+    if isinstance(obstacle.shape, Circle):
+        radius = obstacle.shape.radius*np.sqrt(np.random.uniform(0., 1., 1000))
+        angle = np.random.uniform(0., 2*np.pi, 1000)
+        points = radius*np.vstack((np.cos(angle), np.sin(angle)))
+    else:
+        # random convex combinations of the vertices
+        weights = np.random.dirichlet(np.ones(obstacle.shape.n_vert), 1000)
+        points = obstacle.shape.vertices.dot(weights.T)
+    points = 0.99*points + np.c_[position] + np.random.uniform(-0.99*veh_size, 0.99*veh_size, points.shape)
+    for point in points.T:
+        if not planner.grid.occupied[tuple(planner.grid.get_cell(point))]:
+            raise RuntimeError('A point of a blown up obstacle lies in a free cell.')
+
+planner.draw()
+planner.plot_path(waypoints)
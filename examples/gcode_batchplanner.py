@@ -0,0 +1,60 @@
+# This file is part of OMG-tools.
+#
+# OMG-tools -- Optimal Motion Generation-tools
+# Copyright (C) 2016 Ruben Van Parys & Tim Mercy, KU Leuven.
+# All rights reserved.
+#
+# OMG-tools is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+# This example plans the trajectory of a milling tool over a complete GCode
+# program offline: the program is split in windows of GCode blocks, which are
+# planned in parallel processes and then concatenated.
+
+from omgtools import *
+from omgtools.gui.gcode_block import generate_gcodeblock
+
+# GCode of a rounded square (rsq5.nc in GCode_examples), converted to GCode
+# blocks as the GCodeReader does, but without opening a file dialog
+commands = ['G00 X0 Y0', 'G01 X20 Y0', 'G03 X25 Y5 I0 J5', 'G01 X25 Y45',
+            'G03 X20 Y50 I-5 J0', 'G01 X-20 Y50', 'G03 X-25 Y45 I0 J-5',
+            'G01 X-25 Y5', 'G03 X-20 Y0 I5 J0', 'G01 X0 Y0']
+GCode = []
+prev_block = None
+for cnt, command in enumerate(commands):
+    block = generate_gcodeblock(command, cnt+1, prev_block)
+    # skip blocks without movement
+    if not (block.type in ['G00', 'G01'] and block.start == block.end):
+        GCode.append(block)
+    prev_block = block
+
+# create tool
+tol = 6e-3  # required tolerance of the machined part [mm]
+bounds = {'vmin':-150, 'vmax':150,
+          'amin':-20e3, 'amax':20e3,
+          'jmin':-1500e3, 'jmax':1500e3}  # [mm]
+tool = Tool(tol, bounds=bounds, options={'vel_limit':'axes'})
+tool.define_knots(knot_intervals=10)
+
+# plan windows of 3 GCode blocks in 2 processes, the connection states between
+# the windows are found by planning 1 block before and after each connection
+# the keyword arguments are passed on to the GCodeSchedulerProblem of each window
+planner = GCodeBatchPlanner(tool, GCode, options={'window': 3, 'overlap': 1, 'processes': 2},
+                            n_segments=3, split_circle=True)
+state_traj, input_traj, dinput_traj, ddinput_traj = planner.run()
+
+# the trajectory starts and ends at the GCode end points and passes through
+# the connection states
+if (np.linalg.norm(state_traj[:, 0] - GCode[0].start) > tol or
+        np.linalg.norm(state_traj[:, -1] - GCode[-1].end) > tol):
+    raise RuntimeError('Trajectory does not connect the GCode end points.')
@@ -0,0 +1,52 @@
+# This file is part of OMG-tools.
+#
+# OMG-tools -- Optimal Motion Generation-tools
+# Copyright (C) 2016 Ruben Van Parys & Tim Mercy, KU Leuven.
+# All rights reserved.
+#
+# OMG-tools is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+from omgtools import *
+
+
+# a scenario builds a new (not yet initialized) problem,
+# the campaign initializes it and reuses the solver in every worker
+def scenario():
+    vehicle = Holonomic()
+    vehicle.set_options({'safety_distance': 0.1})
+    vehicle.set_options({'stop_tol': 1.e-2})
+    vehicle.set_initial_conditions([-1.5, -1.5])
+    vehicle.set_terminal_conditions([2., 2.])
+    environment = Environment(room={'shape': Square(5.)})
+    rectangle = Rectangle(width=3., height=0.2)
+    environment.add_obstacle(Obstacle({'position': [-2.1, -0.5]}, shape=rectangle))
+    environment.add_obstacle(Obstacle({'position': [1.7, -0.5]}, shape=rectangle))
+    return Point2point(vehicle, environment, freeT=False)
+
+# disturbed runs: every disturbance setting is simulated for each seed
+disturbances = [{'fc': 0.01, 'stdev': 0.02*np.ones(2)},
+                {'fc': 0.01, 'stdev': 0.05*np.ones(2)}]
+campaign = Campaign(scenario, seeds=range(2), disturbances=disturbances,
+                    options={'processes': 2, 'max_time': 30.})
+statistics = campaign.run()
+
+for stats in statistics:
+    print 'stdev %.2f: %d/%d runs reached the target' % (
+        stats['disturbance']['stdev'][0], stats['reached'], stats['runs'])
+    if stats['motion_time'] is not None:
+        print '  motion time: %.2f s (std %.2f s)' % (
+            stats['motion_time']['mean'], stats['motion_time']['std'])
+    print '  update time: %.2f ms (95%%: %.2f ms)' % (
+        stats['solve_time']['mean']*1e3, stats['solve_time']['p95']*1e3)
+    print '  max constraint violation: %.2e' % stats['max_violation']['max']
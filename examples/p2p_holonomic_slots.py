@@ -0,0 +1,72 @@
+# This file is part of OMG-tools.
+#
+# OMG-tools -- Optimal Motion Generation-tools
+# Copyright (C) 2016 Ruben Van Parys & Tim Mercy, KU Leuven.
+# All rights reserved.
+#
+# OMG-tools is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+# This example uses obstacle slots: the environment has a fixed number of
+# places for obstacles, whose position and shape are parameters of the
+# problem. Obstacles can then be added or removed without building a new
+# solver.
+
+from omgtools import *
+
+# create vehicle
+vehicle = Holonomic()
+vehicle.set_initial_conditions([-1.5, -1.5])
+vehicle.set_terminal_conditions([2., 2.])
+
+# create environment with 2 obstacle slots
+environment = Environment(room={'shape': Square(5.)}, n_slots=2)
+obstacle1 = Obstacle({'position': [0., 0.]}, shape=Circle(0.4))
+obstacle2 = Obstacle({'position': [1., 1.]}, shape=Rectangle(width=0.6, height=0.6))
+environment.add_obstacle(obstacle1)
+
+# create a point-to-point problem
+problem = Point2point(vehicle, environment, freeT=True)
+problem.init()
+solver = problem.problem
+
+vehicle.plot('input', knots=True)
+problem.plot('scene')
+
+# avoid the first obstacle
+print 'Obstacle 1'
+simulator = Simulator(problem)
+simulator.run()
+
+# add the second obstacle: it takes the free slot
+print '\n'
+print 'Obstacle 1 and 2'
+environment.add_obstacle(obstacle2)
+vehicle.overrule_state([-1.5, -1.5])
+vehicle.overrule_input([0., 0.])
+problem.reinitialize()
+simulator = Simulator(problem)
+simulator.run()
+
+# remove the first obstacle: its slot is deactivated
+print '\n'
+print 'Obstacle 2'
+environment.remove_obstacle(obstacle1)
+vehicle.overrule_state([-1.5, -1.5])
+vehicle.overrule_input([0., 0.])
+problem.reinitialize()
+simulator = Simulator(problem)
+simulator.run()
+
+if problem.problem is not solver:
+    raise RuntimeError('Changing the obstacles in the slots rebuilt the solver.')
@@ -0,0 +1,47 @@
+# This file is part of OMG-tools.
+#
+# OMG-tools -- Optimal Motion Generation-tools
+# Copyright (C) 2016 Ruben Van Parys & Tim Mercy, KU Leuven.
+# All rights reserved.
+#
+# OMG-tools is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+# This example finds a path with a quadmap: the room is divided in square
+# blocks, which are only subdivided where they are partly occupied. Open areas
+# are covered by a few large blocks, so the search stays fast at a fine
+# resolution of 1024x1024 cells.
+
+from omgtools import *
+
+start = [2., 2.]
+goal = [98., 98.]
+
+environment = Environment(room={'shape': Square(100.), 'position': [50., 50.]})
+np.random.seed(1)
+for position in np.random.uniform(10., 90., (35, 2)):
+    environment.add_obstacle(Obstacle({'position': list(position)}, shape=Rectangle(width=5., height=5.)))
+
+planner = QuadmapPlanner(environment, [1024, 1024], start, goal, options={'veh_size': 0.5})
+print 'The quadmap has ', len(planner.cells), ' free blocks'
+waypoints = planner.get_path()
+
+# each part of the path only crosses free cells
+for point1, point2 in zip(waypoints[:-1], waypoints[1:]):
+    for s in np.linspace(0., 1., 100):
+        point = [point1[k] + s*(point2[k]-point1[k]) for k in range(2)]
+        if planner.grid.occupied[tuple(planner.grid.get_cell(point))]:
+            raise RuntimeError('The path crosses an occupied cell.')
+
+planner.draw()
+planner.plot_path(waypoints)
@@ -0,0 +1,65 @@
+# This file is part of OMG-tools.
+#
+# OMG-tools -- Optimal Motion Generation-tools
+# Copyright (C) 2016 Ruben Van Parys & Tim Mercy, KU Leuven.
+# All rights reserved.
+#
+# OMG-tools is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+from omgtools import *
+
+# In this example the scheduler of schedulerproblem_example2.py is run twice:
+# once building every local problem when it is needed, and once building the
+# next local problem while the control loop is idle, i.e. after each update
+# ('prebuild': True). Both runs should give the same motion.
+
+def run(prebuild):
+    # create vehicle
+    vehicle = Holonomic(shapes=Circle(radius=0.5), options={'syslimit': 'norm_2', 'stop_tol': 1.e-2},
+                        bounds={'vmax': 2, 'vmin':-2, 'amax':4, 'amin':-4})
+    start = [5, 0]
+    goal = [40, 20]
+    vehicle.set_initial_conditions(start)
+    vehicle.set_terminal_conditions(goal)
+
+    # create environment
+    room = {'shape': Rectangle(width=60, height=30), 'position': [30, 10], 'draw': True}
+    environment = Environment(room=room)
+    rectangle = Rectangle(width=2., height=2)
+    obstacle1 = Obstacle({'position': [10, 0]}, shape=rectangle)
+    trajectories = {'velocity': {'time': [0.], 'values': [[0, -0.]]}}
+    obstacle2 = Obstacle({'position': [22.5, 12.5]}, shape=rectangle, simulation={'trajectories': trajectories})
+    environment.fill_room(room, [obstacle1, obstacle2])
+
+    # make global planner and scheduler
+    globalplanner = AStarPlanner(environment, [25, 25], start, goal, options={'veh_size': vehicle.shapes[0].radius})
+    options = {'frame_type': 'corridor', 'scale_up_fine': True, 'n_frames': 2, 'l_shape': True,
+               'prebuild': prebuild}
+    schedulerproblem = SchedulerProblem(vehicle, environment, globalplanner, options=options)
+
+    # simulate the problem
+    simulator = Simulator(schedulerproblem)
+    simulator.run()
+    # the prebuilt local problem should work on the vehicle of the user
+    if not all(veh is vehicle for veh in schedulerproblem.local_problem.vehicles):
+        raise RuntimeError('Local problem does not refer to the original vehicle.')
+    return vehicle.signals['state']
+
+print 'Build local problems when needed'
+state1 = run(False)
+print '\n'
+print 'Build next local problem beforehand'
+state2 = run(True)
+if state1.shape != state2.shape or np.max(np.abs(state1-state2)) > 1e-6:
+    raise RuntimeError('Building beforehand changed the motion.')
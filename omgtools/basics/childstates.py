@@ -0,0 +1,79 @@
+# This file is part of OMG-tools.
+#
+# OMG-tools -- Optimal Motion Generation-tools
+# Copyright (C) 2016 Ruben Van Parys & Tim Mercy, KU Leuven.
+# All rights reserved.
+#
+# OMG-tools is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+
+import copy
+
+
+class ChildStates(object):
+    # Attributes of children (vehicles, obstacles), such that a problem can be
+    # constructed for them while another problem still uses their current
+    # state: construction resets and redefines their symbolic state. Create
+    # it before the construction, call set_aside() after it to return to the
+    # current state and take_over() when the new problem replaces the current
+    # one. Attributes which were not (re)defined by the construction, e.g.
+    # signals of the simulation, are kept.
+
+    def __init__(self, children):
+        self.children = children
+        self.before = [self.get_state(child) for child in children]
+        self.built = None
+
+    def get_state(self, child):
+        # attributes of child and the contents of its dict and list attributes
+        return dict((key, (value, copy.copy(value) if isinstance(value, (dict, list)) else None))
+                    for key, value in child.__dict__.items())
+
+    def set_state(self, child, state):
+        for key in set(child.__dict__) - set(state):
+            del child.__dict__[key]
+        for key, (value, contents) in state.items():
+            child.__dict__[key] = value
+            if isinstance(value, dict):
+                value.clear()
+                value.update(contents)
+            elif isinstance(value, list):
+                value[:] = contents
+
+    def set_aside(self):
+        # keep the constructed state and return to the state before construction
+        self.built = [self.get_state(child) for child in self.children]
+        for child, state in zip(self.children, self.before):
+            self.set_state(child, state)
+
+    def take_over(self):
+        # apply the attributes which were (re)defined by the construction
+        for child, before, built in zip(self.children, self.before, self.built):
+            for key in set(before) - set(built):
+                child.__dict__.pop(key, None)
+            for key, (value, contents) in built.items():
+                if key not in before or before[key][0] is not value:
+                    child.__dict__[key] = value
+                    continue
+                # contents which were changed in place by the construction
+                initial = before[key][1]
+                if isinstance(value, dict):
+                    for k in set(initial) - set(contents):
+                        value.pop(k, None)
+                    for k in contents:
+                        if k not in initial or contents[k] is not initial[k]:
+                            value[k] = contents[k]
+                elif isinstance(value, list) and (len(contents) != len(initial) or
+                                                  any(c is not i for c, i in zip(contents, initial))):
+                    value[:] = contents
@@ -0,0 +1,71 @@
+# This file is part of OMG-tools.
+#
+# OMG-tools -- Optimal Motion Generation-tools
+# Copyright (C) 2016 Ruben Van Parys & Tim Mercy, KU Leuven.
+# All rights reserved.
+#
+# OMG-tools is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+from scipy.linalg import expm
+import numpy as np
+
+
+def discretize_zoh(A, B, sample_time):
+    # exact discretization of dx = Ax + Bu for a piecewise constant input
+    # x[k+1] = Ad*x[k] + Bd*u[k]
+    n_st, n_in = B.shape
+    M = np.zeros((n_st+n_in, n_st+n_in))
+    M[:n_st, :n_st] = A
+    M[:n_st, n_st:] = B
+    Phi = expm(M*sample_time)
+    return Phi[:n_st, :n_st], Phi[:n_st, n_st:]
+
+
+def discretize_foh(A, B, sample_time):
+    # exact discretization of dx = Ax + Bu for a piecewise linear input
+    # (linear interpolation between the samples)
+    # x[k+1] = Ad*x[k] + B0*u[k] + B1*u[k+1]
+    n_st, n_in = B.shape
+    M = np.zeros((n_st+2*n_in, n_st+2*n_in))
+    M[:n_st, :n_st] = A
+    M[:n_st, n_st:n_st+n_in] = B
+    M[n_st:n_st+n_in, n_st+n_in:] = np.eye(n_in)
+    Phi = expm(M*sample_time)
+    G1 = Phi[:n_st, n_st:n_st+n_in]
+    G2 = Phi[:n_st, n_st+n_in:]/sample_time
+    return Phi[:n_st, :n_st], G1 - G2, G2
+
+
+def simulate_discrete(Ad, state0, drive):
+    # evaluate x[k+1] = Ad*x[k] + drive[:, k] for all samples at once
+    # returns the states, including state0, as columns
+    state0 = np.array(state0, dtype=float).ravel()
+    n_samp = drive.shape[1]
+    if np.array_equal(Ad, np.eye(Ad.shape[0])):
+        # chain of integrators: the recurrence reduces to a cumulative sum
+        increments = np.c_[np.zeros(state0.shape[0]), drive]
+        return state0[:, None] + np.cumsum(increments, axis=1)
+    state = np.zeros((state0.shape[0], n_samp+1))
+    state[:, 0] = state0
+    for k in range(n_samp):
+        state[:, k+1] = Ad.dot(state[:, k]) + drive[:, k]
+    return state
+
+
+def simulate_linear_foh(A, B, state0, input, sample_time):
+    # exact simulation of dx = Ax + Bu over the samples of input, where the
+    # input is linearly interpolated between its samples
+    Ad, B0, B1 = discretize_foh(A, B, sample_time)
+    drive = B0.dot(input[:, :-1]) + B1.dot(input[:, 1:])
+    return simulate_discrete(Ad, state0, drive)
@@ -0,0 +1,55 @@
+# This file is part of OMG-tools.
+#
+# OMG-tools -- Optimal Motion Generation-tools
+# Copyright (C) 2016 Ruben Van Parys & Tim Mercy, KU Leuven.
+# All rights reserved.
+#
+# OMG-tools is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+import importlib
+
+
+class LazyImport(object):
+    # Stands in for a module (or for an object defined in a module) which is
+    # only imported when it is used for the first time. This keeps heavy
+    # parts (plotting) out of 'import omgtools'. It is not a class itself, so
+    # don't use it for classes that users check with isinstance or subclass.
+
+    def __init__(self, module, name=None, package=None, before_import=None):
+        self.__dict__.update({'_module': module, '_name': name,
+                              '_package': package,
+                              '_before_import': before_import,
+                              '_object': None})
+
+    def _load(self):
+        if self._object is None:
+            if self._before_import is not None:
+                self._before_import()
+            obj = importlib.import_module(self._module, self._package)
+            if self._name is not None:
+                obj = getattr(obj, self._name)
+            self.__dict__['_object'] = obj
+        return self._object
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __call__(self, *args, **kwargs):
+        return self._load()(*args, **kwargs)
+
+    def __repr__(self):
+        return repr(self._load())
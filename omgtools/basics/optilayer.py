@@ -23,6 +23,7 @@ except:
     from casadi import Importer
     Compiler = Importer
 from casadi import DM, MX, inf, Function, nlpsol, external
+from casadi import Callback, Sparsity, nlpsol_n_out, nlpsol_out
 from casadi import symvar, substitute
 from casadi.tools import struct, struct_MX, struct_symMX, entry
 from spline import BSpline
@@ -51,6 +52,13 @@ def create_nlp(var, par, obj, con, options, name=''):
     t0 = time.time()
     nlp = {'x': var, 'p': par, 'f': obj, 'g': con}
     slv_opt = options['solver_options'][options['solver']]
+    if 'anytime' in options and options['anytime']:
+        # the solver keeps track of its best feasible iterate and can be
+        # stopped at a deadline, see Problem.solve()
+        if codegen['build'] is not None:
+            raise ValueError('Anytime solving is not supported with codegen builds.')
+        callback = AnytimeCallback(var.size, con.size)
+        slv_opt = dict(slv_opt, iteration_callback=callback)
     opt = {}
     for key, value in slv_opt.items():
         opt[key] = value
@@ -96,12 +104,71 @@ def create_nlp(var, par, obj, con, options, name=''):
         problem = solver
     else:
         raise ValueError('Invalid build option.')
+    if 'anytime' in options and options['anytime']:
+        problem.anytime = callback
     t1 = time.time()
     if options['verbose'] >= 1:
         print 'in %5f s' % (t1-t0)
     return problem, (t1-t0)
 
 
+class AnytimeCallback(Callback):
+    # called by the nlp solver after each iteration, remembers the feasible
+    # iterate with the lowest objective and stops the solver at a deadline
+
+    def __init__(self, n_var, n_con):
+        Callback.__init__(self)
+        self.n_var, self.n_con = n_var, n_con
+        self.start()
+        self.construct('anytime', {})
+
+    def start(self, deadline=None, lb=None, ub=None, tol=0.):
+        # deadline: time.time() at which the solver should stop
+        # lb, ub, tol: constraint bounds and tolerance to check feasibility
+        self.deadline = deadline
+        self.lb, self.ub, self.tol = lb, ub, tol
+        self.initial = None
+        self.best = None
+
+    def get_n_in(self):
+        return nlpsol_n_out()
+
+    def get_n_out(self):
+        return 1
+
+    def get_name_in(self, i):
+        return nlpsol_out(i)
+
+    def get_name_out(self, i):
+        return 'ret'
+
+    def get_sparsity_in(self, i):
+        name = nlpsol_out(i)
+        if name == 'f':
+            return Sparsity.scalar()
+        elif name in ['x', 'lam_x']:
+            return Sparsity.dense(self.n_var)
+        elif name in ['g', 'lam_g']:
+            return Sparsity.dense(self.n_con)
+        else:
+            return Sparsity(0, 0)
+
+    def eval(self, arg):
+        iterate = dict(zip([nlpsol_out(i) for i in range(nlpsol_n_out())], arg))
+        iterate = {'x': DM(iterate['x']), 'f': float(iterate['f']),
+                   'g': DM(iterate['g']), 'lam_g': DM(iterate['lam_g'])}
+        if self.initial is None:
+            self.initial = iterate
+        if self.lb is not None:
+            con = np.array(iterate['g']).ravel()
+            violation = np.max(np.r_[0., self.lb-con, con-self.ub])
+            if violation <= self.tol and (self.best is None or iterate['f'] < self.best['f']):
+                self.best = iterate
+        if self.deadline is not None and time.time() >= self.deadline:
+            return [1]  # stop the solver
+        return [0]
+
+
 def create_function(name, inp, out, options):
     codegen = options['codegen']
     if options['verbose'] >= 1:
@@ -502,7 +569,8 @@ class OptiFather(object):
 
 
 class OptiChild(object):
-    _labels = []
+    _labels = set()
+    _free = {}
 
     def __init__(self, label):
         self.label = OptiChild._make_label(label)
@@ -538,14 +606,20 @@ class OptiChild(object):
         label_split = [''.join(g) for _, g in groupby(label, str.isalpha)]
         index = label_split[-1]
         rest = ''.join(label_split[:-1])
-        if index.isdigit():
-            if label in cls._labels:
-                return cls._make_label(rest+str(int(index)+1))
-            else:
-                cls._labels.append(label)
-                return label
-        else:
+        if not index.isdigit():
             return cls._make_label(label+str(0))
+        if label in cls._labels:
+            # first free index, the ones below cls._free[rest] are all taken
+            index = max(int(index)+1, cls._free.get(rest, 0))
+            while rest+str(index) in cls._labels:
+                index += 1
+            label = rest+str(index)
+        cls._labels.add(label)
+        free = cls._free.get(rest, 0)
+        while rest+str(free) in cls._labels:
+            free += 1
+        cls._free[rest] = free
+        return label
 
     # ========================================================================
     # Definition of symbols, variables, parameters, constraints, objective
@@ -403,11 +403,33 @@ def concat_splines(segments, segment_times, n_insert=None):
              for l in range(len(segments[0]))]
     return [BSpline(bases[l], coeffs[l]) for l in range(len(segments[0]))]
 
-def sample_splines(spline, time):
+def sample_splines(spline, time, derivative=0):
     if isinstance(spline, list):
-        return [splev(time, (s.basis.knots, s.coeffs, s.basis.degree)) for s in spline]
+        return [splev(time, (s.basis.knots, s.coeffs, s.basis.degree), der=derivative) for s in spline]
     else:
-        return splev(time, (spline.basis.knots, spline.coeffs, spline.basis.degree))
+        return splev(time, (spline.basis.knots, spline.coeffs, spline.basis.degree), der=derivative)
+
+
+def cumulative_integral(integrand, time, degree, breakpoints=None):
+    # Integrate a sampled function from time[0] up to each time instant.
+    # integrand maps a vector of time instants to a (n_signals x n_time) array.
+    # Gauss-Legendre quadrature is applied on every interval between time
+    # instants and breakpoints: exact for integrands which are polynomials of
+    # at most degree in between breakpoints (e.g. products of splines).
+    time = np.array(time, dtype=float).ravel()
+    grid = time
+    if breakpoints is not None:
+        breakpoints = np.array(breakpoints, dtype=float).ravel()
+        breakpoints = breakpoints[(breakpoints > time[0]) & (breakpoints < time[-1])]
+        grid = np.union1d(time, breakpoints)
+    nodes, weights = np.polynomial.legendre.leggauss(int(np.ceil((degree+1)/2.)))
+    a, b = grid[:-1], grid[1:]
+    points = (0.5*(a+b)[:, None] + 0.5*(b-a)[:, None]*nodes[None, :]).ravel()
+    values = np.atleast_2d(np.array(integrand(points), dtype=float))
+    values = values.reshape(values.shape[0], len(a), len(nodes))
+    increments = 0.5*(b-a)*np.dot(values, weights)
+    integral = np.c_[np.zeros((values.shape[0], 1)), np.cumsum(increments, axis=1)]
+    return integral[:, np.searchsorted(grid, time)]
 
 
 # def integral_sqbasis(basis):
@@ -19,8 +19,10 @@
 
 from ..basics.optilayer import OptiChild
 from ..basics.spline import BSplineBasis, BSpline
+from ..basics.shape import Rectangle, Square, Ring
 from ..execution.plotlayer import PlotLayer, mix_with_white
-from obstacle import Obstacle
+from obstacle import Obstacle, ObstacleSlot
+from obstaclegrid import ObstacleGrid
 from casadi import inf
 import numpy as np
 import warnings
@@ -28,7 +30,7 @@ import warnings
 
 class Environment(OptiChild, PlotLayer):
 
-    def __init__(self, room, obstacles=None):
+    def __init__(self, room, obstacles=None, n_slots=0, slot_checkpoints=4):
         obstacles = obstacles or []
         OptiChild.__init__(self, 'environment')
         PlotLayer.__init__(self)
@@ -55,6 +57,13 @@ class Environment(OptiChild, PlotLayer):
             if 'draw' not in room:
                 room['draw'] = False
 
+        # obstacle slots: a fixed number of places for obstacles, such that the
+        # obstacles can change without changing the optimization problem
+        self.slots = [ObstacleSlot(self.n_dim, slot_checkpoints) for k in range(n_slots)]
+
+        # spatial index over the obstacles, made when it is needed
+        self._grid = None
+
         # add obstacles
         self.obstacles, self.n_obs = [], 0
         for obstacle in obstacles:
@@ -67,7 +76,9 @@ class Environment(OptiChild, PlotLayer):
     def copy(self):
         obstacles = [Obstacle(o.initial, o.shape, o.simulation, o.options)
                      for o in self.obstacles]
-        return Environment(self.room, obstacles)
+        if not self.slots:
+            return Environment(self.room, obstacles)
+        return Environment(self.room, obstacles, len(self.slots), self.slots[0].n_checkpoints)
 
     # ========================================================================
     # Add obstacles/vehicles
@@ -89,6 +100,19 @@ class Environment(OptiChild, PlotLayer):
                                  str(self.n_dim) + 'D environment.')
             self.obstacles.append(obstacle)
             self.n_obs += 1
+            if self._grid is not None:
+                self._grid.insert(obstacle)
+            self._update_slots()
+
+    def remove_obstacle(self, obstacle):
+        self.obstacles.remove(obstacle)
+        self.n_obs -= 1
+        if self._grid is not None:
+            self._grid.remove(obstacle)
+        for room in self.room:
+            if 'obstacles' in room and obstacle in room['obstacles']:
+                room['obstacles'] = [o for o in room['obstacles'] if o is not obstacle]
+        self._update_slots()
 
     def fill_room(self, room, obstacles):
         # if key didn't exist yet, it is created
@@ -98,6 +122,83 @@ class Environment(OptiChild, PlotLayer):
         for o in obstacles:
             if not o in self.obstacles:
                 self.obstacles += [o]  # save in total list
+                self.n_obs += 1
+                if self._grid is not None:
+                    self._grid.insert(o)
+        self._update_slots()
+
+    def _update_slots(self):
+        # assign every obstacle to avoid to a slot, an obstacle keeps its slot
+        # as long as it is avoided in one of the rooms
+        if not self.slots:
+            return
+        rooms = {}
+        for obstacle in self.obstacles:
+            if obstacle.options['avoid']:
+                rooms[obstacle] = [idx for idx, room in enumerate(self.room)
+                                   if 'obstacles' not in room or obstacle in room['obstacles']]
+        for slot in self.slots:
+            if slot.obstacle is not None and not (slot.obstacle in rooms and rooms[slot.obstacle]):
+                slot.release()
+        for obstacle in self.obstacles:
+            if not (obstacle in rooms and rooms[obstacle]):
+                continue
+            slot = [s for s in self.slots if s.obstacle is obstacle]
+            if not slot:
+                slot = [s for s in self.slots if s.obstacle is None]
+                if not slot:
+                    raise ValueError('There are more obstacles to avoid than ' +
+                                     'obstacle slots (' + str(len(self.slots)) + ').')
+            slot[0].assign(obstacle, rooms[obstacle])
+
+    def get_obstacle_grid(self):
+        # spatial index to find the obstacles in a region, e.g. in a frame
+        if self._grid is None:
+            self._grid = ObstacleGrid(self.obstacles)
+        return self._grid
+
+    def get_room(self, idx):
+        # rooms with room['parametric'] = True get their geometry as parameters
+        # (in room['parameters']), such that a problem can be reused for other rooms
+        room = self.room[idx]
+        if not ('parametric' in room and room['parametric']):
+            return room
+        room = room.copy()
+        room['parameters'] = {}
+        for name, value in self._get_room_parameters(room).items():
+            label = 'room'+str(idx)+'_'+name
+            if label not in self._parameters:
+                self.define_parameter(label, value.shape[0], value.shape[1], value=value)
+            room['parameters'][name] = self._parameters[label]
+        if 'limits' in room['parameters']:
+            limits = room['parameters']['limits']
+            room['parameters']['limits'] = [[limits[k, 0], limits[k, 1]] for k in range(self.n_dim)]
+        return room
+
+    def _get_room_parameters(self, room):
+        shape = room['shape']
+        parameters = {}
+        if (isinstance(shape, (Rectangle, Square)) and shape.orientation % (np.pi/2) == 0. and
+                room['orientation'] == 0.):
+            # axis-aligned rectangle: its limits
+            lims = shape.get_canvas_limits()
+            parameters['limits'] = np.array([lims[k]+room['position'][k] for k in range(self.n_dim)])
+        elif isinstance(shape, (Rectangle, Square)) and room['orientation'] == 0.:
+            # rotated rectangle: band of width shape.height around its center line
+            normal = np.array([-np.sin(shape.orientation), np.cos(shape.orientation)])
+            parameters['normal'] = np.c_[normal]
+            parameters['offset'] = np.c_[normal.dot(room['position'][:2])]
+            parameters['tolerance'] = np.c_[0.5*shape.height]
+        elif isinstance(shape, Ring):
+            parameters['center'] = np.c_[room['position'][:2]]
+            parameters['radii'] = np.c_[[shape.radius_in, shape.radius_out]]
+        else:
+            raise ValueError('Parametric rooms should be rectangles or rings.')
+        # start and end point of a segment (e.g. of GCode)
+        for key in ['start', 'end']:
+            if key in room:
+                parameters[key] = np.c_[np.array(room[key], dtype=float)]
+        return parameters
 
     def define_collision_constraints(self, vehicle, splines, horizon_times):
         if vehicle.n_dim != self.n_dim:
@@ -113,8 +214,14 @@ class Environment(OptiChild, PlotLayer):
         for idx in range(vehicle.n_seg):
             # loop over vehicle segments, not over rooms since number of considered segments
             # may be different from total number of rooms
-            room = self.room[idx]  # select current room
+            room = self.get_room(idx)  # select current room
             hyp_veh, hyp_obs = {}, {}
+            if self.slots:
+                # all slots are present in every room, the ones which are not
+                # used in this room are deactivated by their parameters
+                self._define_slot_constraints(vehicle, idx, basis, horizon_times, hyp_veh)
+                vehicle.define_collision_constraints(hyp_veh, room, splines[idx], horizon_times[idx])
+                continue
             # add all obstacles, unless user specified it differently
             if 'obstacles' in room:
                 obs_to_add = room['obstacles']
@@ -145,6 +252,29 @@ class Environment(OptiChild, PlotLayer):
                         obstacle.define_collision_constraints(hyp_obs[obstacle])
             vehicle.define_collision_constraints(hyp_veh, room, splines[idx], horizon_times[idx])
 
+    def _define_slot_constraints(self, vehicle, idx, basis, horizon_times, hyp_veh):
+        # the vehicle is separated from an empty slot by a hyperplane which
+        # always holds, this decouples the slot's hyperplane variables
+        rad = max([max(shape.get_checkpoints()[1]) for shape in vehicle.shapes])
+        b_empty = rad + vehicle.options['safety_distance'] + 1.
+        hyp_obs = {}
+        for k, shape in enumerate(vehicle.shapes):
+            hyp_veh[shape] = []
+            for l, slot in enumerate(self.slots):
+                slot.init(horizon_times=horizon_times[:idx+1])
+                if slot not in hyp_obs:
+                    hyp_obs[slot] = []
+                a = self.define_spline_variable(
+                    'a'+'_'+vehicle.label+'_'+'seg'+str(idx)+'_'+str(k)+str(l), self.n_dim, basis=basis)
+                b = self.define_spline_variable(
+                    'b'+'_'+vehicle.label+'_'+'seg'+str(idx)+'_'+str(k)+str(l), 1, basis=basis)[0]
+                self.define_constraint(
+                    sum([a[p]*a[p] for p in range(self.n_dim)])-1, -inf, 0.)
+                hyp_veh[shape].append({'a': [slot.active*a[p] for p in range(self.n_dim)],
+                                       'b': slot.active*b + (1.-slot.active)*b_empty})
+                hyp_obs[slot].append({'a': a, 'b': b})
+                slot.define_collision_constraints(hyp_obs[slot])
+
     def define_intervehicle_collision_constraints(self, vehicles, horizon_times):
         # Todo: added for idx in range(vehicles[0].n_seg) loop, okay?
         # For now supposed that all vehicles have the same amount of segments
@@ -173,21 +303,33 @@ class Environment(OptiChild, PlotLayer):
                                 hyp_veh[veh2][shape2].append({'a': [-a_i for a_i in a], 'b': -b})
             for vehicle in vehicles:
                 splines = vehicle.splines[idx]
-                vehicle.define_collision_constraints(hyp_veh[vehicle], self.room[idx], splines, horizon_times[idx])
+                vehicle.define_collision_constraints(hyp_veh[vehicle], self.get_room(idx), splines, horizon_times[idx])
 
     # ========================================================================
     # Optimization modelling related functions
     # ========================================================================
 
     def init(self, horizon_times=None):
-        for obstacle in self.obstacles:
+        for obstacle in (self.slots or self.obstacles):
             obstacle.init(horizon_times=horizon_times)
 
+    def set_parameters(self, current_time):
+        parameters = {self: {}}
+        for idx, room in enumerate(self.room):
+            if 'parametric' in room and room['parametric']:
+                for name, value in self._get_room_parameters(room).items():
+                    parameters[self]['room'+str(idx)+'_'+name] = value
+        return parameters
+
     # ========================================================================
     # Simulate environment
     # ========================================================================
 
     def simulate(self, simulation_time, sample_time):
+        grid = self.get_obstacle_grid()
+        # obstacles may have been moved outside of simulate (e.g. set_state),
+        # afterwards the grid is kept up to date here
+        grid.refresh()
         for obstacle in self.obstacles:
             # check if obstacle moves
             if (('trajectories' in obstacle.simulation) and
@@ -195,141 +337,46 @@ class Environment(OptiChild, PlotLayer):
                 obstacle.options['bounce']):
                 # select current velocity
                 vel = obstacle.signals['velocity'][:,-1]
-                # check if it overlaps with any other obstacle
-                for obs in self.obstacles:
+                # check if it overlaps with any other obstacle, only nearby
+                # obstacles can overlap
+                for obs in grid.query(grid.boxes[obstacle], refresh=False):
                     # don't check overlap with itself
-                    if obs != obstacle:
-                        if obstacle.overlaps_with(obs):
-                            # bounce straight off other obstacle
-                            if any(v == 0 for v in vel):
-                                vel_new = -vel
-                            # bounce diagonally off other obstacle
-                            else:
-                                old_pos = np.copy(obstacle.signals['position'][:,-1])
-                                if (vel[0] > 0 and vel[1] > 0):
-                                    # direction = up_right
-                                    # new direction may be down_right or up_left
-                                    # test new direction down_right by shifting obstacle
-                                    obstacle.signals['position'][:,-1] += [0.15,-0.15]
-                                    if not obstacle.overlaps_with(obs):
-                                        # no overlap so move down_right
-                                        # new_direction = down_right
-                                        vel_new = [vel[0], -vel[1]]
-                                    else:
-                                        # there was overlap so move up_left
-                                        # new_direction = up_left
-                                        vel_new = [-vel[0],vel[1]]
-                                elif vel[0] < 0 and vel[1] > 0:
-                                    # direction = up_left
-                                    # new direction may be down_left or up_right
-                                    # test new direction down_left by shifting obstacle
-                                    obstacle.signals['position'][:,-1] += [-0.15,-0.15]
-                                    if not obstacle.overlaps_with(obs):
-                                        # no overlap so move down_left
-                                        # new_direction = down_left
-                                        vel_new = [vel[0], -vel[1]]
-                                    else:
-                                        # there was overlap so move up_right
-                                        # new_direction = up_right
-                                        vel_new = [-vel[0],vel[1]]
-                                elif vel[0] > 0 and vel[1] < 0:
-                                    # direction = down_right
-                                    # new direction may be down_left or up_right
-                                    # test new direction down_left by shifting obstacle
-                                    obstacle.signals['position'][:,-1] += [-0.15,-0.15]
-                                    if not obstacle.overlaps_with(obs):
-                                        # no overlap so move down_left
-                                        # new_direction = down_left
-                                        vel_new = [-vel[0], vel[1]]
-                                    else:
-                                        # there was overlap so move up_right
-                                        # new_direction = up_right
-                                        vel_new = [vel[0],-vel[1]]
-                                elif vel[0] < 0 and vel[1] < 0:
-                                    # direction = down_left
-                                    # new direction may be down_right or up_left
-                                    # test new direction down_right by shifting obstacle
-                                    obstacle.signals['position'][:,-1] += [0.15,-0.15]
-                                    if not obstacle.overlaps_with(obs):
-                                        # no overlap so move down_right
-                                        # new_direction = down_right
-                                        vel_new = [-vel[0], vel[1]]
-                                    else:
-                                        # there was overlap so move up_left
-                                        # new_direction = up_left
-                                        vel_new = [vel[0],-vel[1]]
-
-                                # reset position
-                                obstacle.signals['position'][:,-1] = old_pos
-                            obstacle.signals['velocity'][:,-1] = vel_new
+                    if obs != obstacle and obstacle.overlaps_with(obs):
+                        obstacle.signals['velocity'][:,-1] = self._bounce(
+                            obstacle, vel, lambda: obstacle.overlaps_with(obs))
                 # check if the obstacle doesn't hit the borders
                 # Todo: supposed that self.room[0] is the total room, containing outer border
                 if obstacle.is_outside_of(self.room[0]):
-                    # bounce straight off border
-                    if any(v == 0 for v in vel):
-                        vel_new = -vel
-                    # bounce diagonally off border
-                    else:
-                        old_pos = np.copy(obstacle.signals['position'][:,-1])
-                        if (vel[0] > 0 and vel[1] > 0):
-                            # direction = up_right
-                            # new direction may be down_right or up_left
-                            # test new direction down_right by shifting obstacle
-                            obstacle.signals['position'][:,-1] += [0.15,-0.15]
-                            if not obstacle.is_outside_of(self.room[0]):
-                                # no overlap so move down_right
-                                # new_direction = down_right
-                                vel_new = [vel[0], -vel[1]]
-                            else:
-                                # there was overlap so move up_left
-                                # new_direction = up_left
-                                vel_new = [-vel[0],vel[1]]
-                        elif vel[0] < 0 and vel[1] > 0:
-                            # direction = up_left
-                            # new direction may be down_left or up_right
-                            # test new direction down_left by shifting obstacle
-                            obstacle.signals['position'][:,-1] += [-0.15,-0.15]
-                            if not obstacle.is_outside_of(self.room[0]):
-                                # no overlap so move down_left
-                                # new_direction = down_left
-                                vel_new = [vel[0], -vel[1]]
-                            else:
-                                # there was overlap so move up_right
-                                # new_direction = up_right
-                                vel_new = [-vel[0],vel[1]]
-                        elif vel[0] > 0 and vel[1] < 0:
-                            # direction = down_right
-                            # new direction may be down_left or up_right
-                            # test new direction down_left by shifting obstacle
-                            obstacle.signals['position'][:,-1] += [-0.15,-0.15]
-                            if not obstacle.is_outside_of(self.room[0]):
-                                # no overlap so move down_left
-                                # new_direction = down_left
-                                vel_new = [-vel[0], vel[1]]
-                            else:
-                                # there was overlap so move up_right
-                                # new_direction = up_right
-                                vel_new = [vel[0],-vel[1]]
-                        elif vel[0] < 0 and vel[1] < 0:
-                            # direction = down_left
-                            # new direction may be down_right or up_left
-                            # test new direction down_right by shifting obstacle
-                            obstacle.signals['position'][:,-1] += [0.15,-0.15]
-                            if not obstacle.is_outside_of(self.room[0]):
-                                # no overlap so move down_right
-                                # new_direction = down_right
-                                vel_new = [-vel[0], vel[1]]
-                            else:
-                                # there was overlap so move up_left
-                                # new_direction = up_left
-                                vel_new = [vel[0],-vel[1]]
-                        # reset position
-                        obstacle.signals['position'][:,-1] = old_pos
                     print 'setting new velocity'
-                    obstacle.signals['velocity'][:,-1] = vel_new
+                    obstacle.signals['velocity'][:,-1] = self._bounce(
+                        obstacle, vel, lambda: obstacle.is_outside_of(self.room[0]))
             obstacle.simulate(simulation_time, sample_time)
+            grid.update(obstacle)
         self.update_plots()
 
+    def _bounce(self, obstacle, vel, collides):
+        # velocity after bouncing, collides() checks for a collision at the
+        # current position of obstacle
+        # bounce straight
+        if any(v == 0 for v in vel):
+            return -vel
+        # bounce diagonally: shift the obstacle to test a new direction, i.e.
+        # down_right when moving up_right or down_left and down_left when
+        # moving up_left or down_right
+        old_pos = np.copy(obstacle.signals['position'][:,-1])
+        if vel[0]*vel[1] > 0:
+            obstacle.signals['position'][:,-1] += [0.15,-0.15]
+        else:
+            obstacle.signals['position'][:,-1] += [-0.15,-0.15]
+        free = not collides()
+        # reset position
+        obstacle.signals['position'][:,-1] = old_pos
+        if free == (vel[1] > 0):
+            # flip vertical direction
+            return [vel[0], -vel[1]]
+        # flip horizontal direction
+        return [-vel[0], vel[1]]
+
     def draw(self, t=-1):
         surfaces, lines = [], []
         for room in self.room:
@@ -55,7 +55,8 @@ class Frame(object):
         # Note: these checkpoints already include pos
         checkpoints = [[xmin, ymin],[xmin, ymax],[xmax, ymax],[xmax, ymin]]
 
-        for obstacle in frame.environment.obstacles:
+        # only check the obstacles which are near the frame
+        for obstacle in frame.environment.get_obstacle_grid().query([xmin, ymin, xmax, ymax]):
             # check if obstacle is stationary, this is when:
             # there is no entry trajectories or there are trajectories but no velocity or
             # all velocities are 0.
@@ -119,8 +120,12 @@ class Frame(object):
 
         start_time = time.time()
 
-        moving_obstacles = []
-        for obstacle in self.environment.obstacles:
+        # check the motion until the last sample time of the sampled check,
+        # i.e. N*check_moving_obs_ts, see point_in_frame()
+        horizon = (int(round(motion_time/self.check_moving_obs_ts))+1)*self.check_moving_obs_ts
+        # collect the checkpoints of all moving obstacles which can reach the frame
+        candidates, points, velocities, owners = [], [], [], []
+        for obstacle in self.environment.get_obstacle_grid().query_moving(self.border['limits'], horizon):
             # check if obstacle is moving, this is when:
             # not all velocities, saved in signals, are 0
             if not all(obstacle.signals['velocity'][:,-1] == [0.]*obstacle.n_dim):
@@ -145,18 +150,24 @@ class Frame(object):
                     if hasattr(obstacle.shape, 'orientation'):
                         vertex = obstacle.shape.rotate(obstacle.shape.orientation, chck)
                     else:
-                        vertex = chck
+                        vertex = np.array(chck, dtype=float)
                     # move to correct position
-                    vertex += obs_pos
-                    # check if vertex is in frame during movement
-                    if self.point_in_frame(vertex, time=motion_time,
-                                           sample_time=self.check_moving_obs_ts, velocity=obs_vel):
-                        # avoid corresponding obstacle
-                        obstacle.set_options({'avoid': True})
-                        moving_obstacles.append(obstacle)
-                        # break from for chck in obs_chck, move on to next obstacle, since
-                        # obstacle is added to the frame if any of its vertices is in the frame
-                        break
+                    points.append(vertex + obs_pos)
+                    velocities.append(obs_vel)
+                    owners.append(len(candidates))
+                candidates.append(obstacle)
+
+        moving_obstacles = []
+        if candidates:
+            # an obstacle is added to the frame if any of its vertices is in
+            # the frame during the movement
+            in_frame = np.zeros(len(candidates), dtype=bool)
+            in_frame[np.array(owners)[self.moving_points_in_frame(points, velocities, horizon)]] = True
+            for obstacle, inside in zip(candidates, in_frame):
+                if inside:
+                    # avoid corresponding obstacle
+                    obstacle.set_options({'avoid': True})
+                    moving_obstacles.append(obstacle)
 
         end_time = time.time()
         if self.options['verbose'] >= 3:
@@ -342,6 +353,28 @@ class Frame(object):
         else:
             raise RuntimeError('Argument time was of the wrong type, not None, float or int')
 
+    def moving_points_in_frame(self, points, velocities, time):
+        # check which points, moving with a constant velocity, are inside the
+        # frame at some moment in [0, time]
+        # the segment travelled by each point is intersected with the slabs
+        # xmin <= x <= xmax and ymin <= y <= ymax, this is more accurate than
+        # sampling point_in_frame() and vectorized over all points
+        points = np.array(points, dtype=float)
+        velocities = np.array(velocities, dtype=float)
+        xmin, ymin, xmax, ymax = self.border['limits']
+        t_enter = np.zeros(points.shape[0])
+        t_exit = np.ones(points.shape[0])*time
+        for k, (low, high) in enumerate([(xmin, xmax), (ymin, ymax)]):
+            pos, vel = points[:, k], velocities[:, k]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                t_low, t_high = (low-pos)/vel, (high-pos)/vel
+            # without velocity in this direction, the point is inside the slab
+            # at all times or never
+            inside = np.where((low <= pos) & (pos <= high), np.inf, -np.inf)
+            t_enter = np.maximum(t_enter, np.where(vel != 0., np.minimum(t_low, t_high), -inside))
+            t_exit = np.minimum(t_exit, np.where(vel != 0., np.maximum(t_low, t_high), inside))
+        return t_enter <= t_exit
+
     def find_closest_waypoint(self, position=None, waypoints=None):
         # if no specific arguments provided, use default arguments
         if position is None:
@@ -523,6 +556,8 @@ class CorridorFrame(Frame):
         Frame.__init__(self, environment, start_pos, global_path, veh_size, margin, options)
         self.type = 'corridor'  # default value
         self.scale_up_fine = options['scale_up_fine']
+        # end the frame halfway along a segment of the global path, if the whole segment does not fit
+        self.split_segments = options['split_segments'] if 'split_segments' in options else False
 
         self.create_corridor_base_frame()
 
@@ -562,6 +597,15 @@ class CorridorFrame(Frame):
         self.border = self.make_border(xmin,ymin,xmax,ymax)
 
         _, index = self.find_closest_waypoint()
+        first_points = []
+        if self.split_segments and index < len(self.global_path)-1:
+            # start_pos can lie on a segment of the global path, e.g. when the previous
+            # frame ended in the middle of it, then start from there instead of going
+            # back to the closest waypoint
+            closest, next_point = np.array(self.global_path[index:index+2], dtype=float)
+            if np.dot(np.array(self.start_pos[:2]) - closest, next_point - closest) > 0:
+                first_points = [list(self.start_pos[:2])]
+                index += 1
         points_in_frame = []  # holds all waypoints in the frame
 
         # run over all waypoints, starting from the waypoint closest to start_pos
@@ -607,6 +651,14 @@ class CorridorFrame(Frame):
                             # there is an obstacle inside the frame after enlarging
                             # don't add point and keep old frame
                             self.border = self.make_border(xmin,ymin,xmax,ymax)
+                            if self.split_segments:
+                                # a long segment, e.g. of an any-angle path, may still fit
+                                # partly: add the furthest point along it instead
+                                point = self.find_furthest_point_on_segment(prev_point, point)
+                                if point is not None:
+                                    points_in_frame.append(point)
+                                    # index of the waypoint at the end of this segment
+                                    self.segment_index = index + idx
                             # frame is finished
                             break
                         else:
@@ -627,7 +679,7 @@ class CorridorFrame(Frame):
         if not points_in_frame:
             raise RuntimeError('No waypoint was found inside corridor frame, something wrong with frame')
         else:
-            self.waypoints = points_in_frame
+            self.waypoints = first_points + points_in_frame
 
         end_time = time.time()
         print 'time in CorridorFrame', end_time-start_time
@@ -651,6 +703,28 @@ class CorridorFrame(Frame):
 
         self.border = self.make_border(xmin_new,ymin_new,xmax_new,ymax_new)
 
+    def find_furthest_point_on_segment(self, prev_point, point, n_iter=10):
+        # bisect along the segment from prev_point to point for the furthest
+        # point that can be added without stationary obstacles in the frame,
+        # returns None if that point is not further than the vehicle size
+        border = self.border
+        prev_point, point = np.array(prev_point[:2], dtype=float), np.array(point[:2], dtype=float)
+        lower, upper = 0., 1.
+        for k in range(n_iter):
+            middle = 0.5*(lower + upper)
+            self.update_frame_with_waypoint(prev_point, prev_point + middle*(point - prev_point))
+            if self.get_stationary_obstacles():
+                upper = middle
+            else:
+                lower = middle
+            self.border = border
+        if lower*np.linalg.norm(point - prev_point) <= self.veh_size:
+            return None
+        point = (prev_point + lower*(point - prev_point)).tolist()
+        self.update_frame_with_waypoint(prev_point, point)
+        self.stationary_obstacles = []
+        return point
+
     def scale_up_frame(self):
         # scale up the current frame in all directions, until it hits the borders
         # or it contains an obstacle
@@ -758,7 +832,11 @@ class CorridorFrame(Frame):
         # update waypoints
         # starting from the last waypoint that was already in the frame
         # vehicle size was already taken into account above, when shifting borders
-        index = self.global_path.index(self.waypoints[-1])
+        if self.waypoints[-1] in self.global_path:
+            index = self.global_path.index(self.waypoints[-1])
+        else:
+            # last waypoint was put on a segment of the global path
+            index = self.segment_index
         for idx, point in enumerate(self.global_path[index:]):
             if self.point_in_frame(point):
                 if not point in self.waypoints:
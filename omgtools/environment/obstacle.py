@@ -25,9 +25,9 @@ from ..basics.geometry import distance_between_points, point_in_polyhedron
 from ..basics.geometry import circle_polyhedron_intersection
 from ..basics.geometry import rectangles_overlap
 from ..basics.shape import Circle, Polyhedron, Rectangle, Square
+from ..basics.discretization import discretize_foh, discretize_zoh, simulate_discrete
 from casadi import inf, vertcat, cos, sin
 from scipy.interpolate import interp1d
-from scipy.integrate import odeint
 import numpy as np
 
 
@@ -220,6 +220,7 @@ class ObstaclexD(OptiChild):
         ind_sorted = np.argsort(time_state)
         state_incr = np.cumsum(state[:, ind_sorted], axis=1)
         time_state = time_state[ind_sorted]
+        self.state_incr = {'time': time_state, 'values': state_incr}
         self.state_incr_interp = interp1d(time_state, state_incr, kind='zero',
                                           bounds_error=False,
                                           fill_value=state_incr[:, -1])
@@ -243,6 +244,19 @@ class ObstaclexD(OptiChild):
         B = self.simulation_model['B']
         return A.dot(state) + B.dot(input)
 
+    def _discretize(self, sample_time):
+        if not hasattr(self, '_discretizations'):
+            self._discretizations = {}
+        A = self.simulation_model['A']
+        B = self.simulation_model['B']
+        key = (A.tostring(), B.tostring(), A.shape, B.shape, sample_time)
+        if key not in self._discretizations:
+            Ad, B0, B1 = discretize_foh(A, B, sample_time)
+            # state increments only act on position and velocity derivatives
+            E = discretize_zoh(A, np.eye(A.shape[0])[:, :2*self.n_dim], sample_time)[1]
+            self._discretizations[key] = (Ad, B0, B1, E)
+        return self._discretizations[key]
+
     def simulate(self, simulation_time, sample_time):
         n_samp = int(np.round(simulation_time/sample_time, 6))+1
         time0 = self.signals['time'][-1]
@@ -252,7 +266,23 @@ class ObstaclexD(OptiChild):
                        self.signals['acceleration'][:, -1]].T
         if time0 != 0.0:
             state0 -= self.state_incr_interp(time0)
-        state = odeint(self._ode, state0, time_axis).T
+        # exact discretization of the linear model: the input is linearly
+        # interpolated between samples and the state increments are piecewise
+        # constant, so all samples follow from one recurrence
+        Ad, B0, B1, E = self._discretize(sample_time)
+        input = self.input_interp(time_axis)
+        state_incr = self.state_incr_interp(time_axis[:-1])
+        drive = (B0.dot(input[:, :-1]) + B1.dot(input[:, 1:]) +
+                 E.dot(state_incr[self.n_dim:]))
+        # an increment within a sample interval only acts from its time on
+        times, values = self.state_incr['time'], self.state_incr['values']
+        for k in np.nonzero((times > time_axis[0]) & (times < time_axis[-1]))[0]:
+            interval = np.searchsorted(time_axis, times[k], side='right') - 1
+            if times[k] > time_axis[interval]:
+                E_rest = discretize_zoh(self.simulation_model['A'], np.eye(Ad.shape[0])[:, :2*self.n_dim],
+                                        time_axis[interval+1] - times[k])[1]
+                drive[:, interval] += E_rest.dot(values[self.n_dim:, k] - values[self.n_dim:, k-1])
+        state = simulate_discrete(Ad, state0, drive)
         state += self.state_incr_interp(time_axis)
         self.signals['position'] = np.c_[self.signals['position'],
                                          state[:self.n_dim, 1:n_samp+1]]
@@ -375,15 +405,15 @@ class Obstacle2D(ObstaclexD):
     def simulate(self, simulation_time, sample_time):
         ObstaclexD.simulate(self, simulation_time, sample_time)
         n_samp = int(np.round(simulation_time/sample_time, 6))
-        for _ in range(n_samp):
-            theta0 = self.signals['orientation'][:, -1][0]
-            omega0 = self.signals['angular_velocity'][:, -1][0]
-            theta = theta0 + sample_time*omega0
-            omega = omega0
-            self.signals['orientation'] = np.c_[
-                self.signals['orientation'], theta]
-            self.signals['angular_velocity'] = np.c_[
-                self.signals['angular_velocity'], omega]
+        # constant angular velocity: orientation grows linearly over the samples
+        theta0 = self.signals['orientation'][:, -1][0]
+        omega0 = self.signals['angular_velocity'][:, -1][0]
+        theta = theta0 + sample_time*omega0*np.arange(1, n_samp+1)
+        omega = omega0*np.ones(n_samp)
+        self.signals['orientation'] = np.c_[
+            self.signals['orientation'], theta[None, :]]
+        self.signals['angular_velocity'] = np.c_[
+            self.signals['angular_velocity'], omega[None, :]]
 
     def overlaps_with(self, obstacle):
         # check if self overlaps with obstacle
@@ -531,3 +561,105 @@ class Obstacle3D(ObstaclexD):
             for l in range(self.checkpoints.shape[0]/self.n_dim):
                 self.define_constraint(-sum([a[k]*(self.checkpoints[l*self.shape.n_dim+k]+self.pos_spline[k])
                                              for k in range(self.n_dim)]) + b + self.rad[l], -inf, 0.)
+
+
+class ObstacleSlot(OptiChild):
+    # place for an obstacle in a problem of which the obstacles change at runtime:
+    # the state and shape of the assigned obstacle are parameters, and the
+    # collision constraints are switched off while the slot is empty, such that
+    # the problem doesn't need to be rebuilt
+
+    def __init__(self, n_dim, n_checkpoints=4):
+        OptiChild.__init__(self, 'slot')
+        self.n_dim = n_dim
+        self.n_checkpoints = n_checkpoints
+        self.basis = BSplineBasis([0, 0, 0, 1, 1, 1], 2)
+        self.obstacle = None
+        self.rooms = []  # indices of the rooms in which the obstacle is avoided
+
+    def assign(self, obstacle, rooms):
+        if obstacle.n_dim != self.n_dim:
+            raise ValueError('Not possible to assign a ' + str(obstacle.n_dim) +
+                             'D obstacle to a ' + str(self.n_dim) + 'D slot.')
+        if obstacle.options['spline_traj']:
+            raise ValueError('Obstacles with a spline trajectory can not be assigned to a slot.')
+        if self.n_dim == 2 and obstacle.signals['angular_velocity'][:, -1] != 0.:
+            raise ValueError('Rotating obstacles can not be assigned to a slot.')
+        checkpoints, _ = obstacle.shape.get_checkpoints()
+        if len(checkpoints) > self.n_checkpoints:
+            raise ValueError('Obstacle has more checkpoints than its slot, ' +
+                             'increase the amount of checkpoints per slot.')
+        self.obstacle, self.rooms = obstacle, rooms
+
+    def release(self):
+        self.obstacle, self.rooms = None, []
+
+    # ========================================================================
+    # Optimization modelling related functions
+    # ========================================================================
+
+    def init(self, horizon_times=None):
+        # same motion model as ObstaclexD
+        x = self.define_parameter('x', self.n_dim)
+        v = self.define_parameter('v', self.n_dim)
+        a = self.define_parameter('a', self.n_dim)
+        self.t = self.define_symbol('t')
+        if horizon_times is None:
+            self.T = self.define_symbol('T')
+            horizon_times = [self.T]
+        elif not isinstance(horizon_times, list):
+            horizon_times = [horizon_times]
+        v0 = v - self.t*a
+        x0 = x - self.t*v0 - 0.5*(self.t**2)*a
+        pos0 = x0
+        self.pos_spline = [0]*self.n_dim
+        for horizon_time in horizon_times:
+            for k in range(self.n_dim):
+                self.pos_spline[k] = BSpline(self.basis, vertcat(pos0[k], 0.5*v0[k]*horizon_time + pos0[k], pos0[k] + v0[k]*horizon_time + 0.5*a[k]*(horizon_time**2)))
+            pos0 = [self.pos_spline[k](1) for k in range(self.n_dim)]
+        self.checkpoints = self.define_parameter('checkpoints', self.n_checkpoints*self.n_dim)
+        self.rad = self.define_parameter('rad', self.n_checkpoints)
+        if self.n_dim == 2:
+            theta = self.define_parameter('theta', 1)
+            self.cos, self.sin = cos(theta), sin(theta)
+        # activation of the slot in the current room (segment)
+        self.active = self.define_parameter('active'+str(len(horizon_times)-1), 1)
+
+    def define_collision_constraints(self, hyperplanes):
+        for hyperplane in hyperplanes:
+            a, b = hyperplane['a'], hyperplane['b']
+            for l in range(self.n_checkpoints):
+                if self.n_dim == 2:
+                    pos = [self.pos_spline[0] + self.checkpoints[l*2+0]*self.cos - self.checkpoints[l*2+1]*self.sin,
+                           self.pos_spline[1] + self.checkpoints[l*2+0]*self.sin + self.checkpoints[l*2+1]*self.cos]
+                else:
+                    pos = [self.checkpoints[l*3+k] + self.pos_spline[k] for k in range(3)]
+                # an empty slot gives a constraint which holds strictly
+                self.define_constraint(self.active*(-sum([a[k]*pos[k] for k in range(self.n_dim)]) + b + self.rad[l]) + self.active - 1., -inf, 0.)
+
+    def set_parameters(self, current_time):
+        parameters = {self: {}}
+        for name in self._parameters:
+            if name.startswith('active'):
+                parameters[self][name] = float(self.obstacle is not None and int(name[6:]) in self.rooms)
+        if self.obstacle is None:
+            for name in ['x', 'v', 'a']:
+                parameters[self][name] = np.zeros(self.n_dim)
+            parameters[self]['checkpoints'] = np.zeros(self.n_checkpoints*self.n_dim)
+            parameters[self]['rad'] = np.zeros(self.n_checkpoints)
+            if self.n_dim == 2:
+                parameters[self]['theta'] = 0.
+            return parameters
+        signals = self.obstacle.signals
+        parameters[self]['x'] = signals['position'][:, -1]
+        parameters[self]['v'] = signals['velocity'][:, -1]
+        parameters[self]['a'] = signals['acceleration'][:, -1]
+        # fill up the slot by repeating the last checkpoint
+        checkpoints, rad = self.obstacle.shape.get_checkpoints()
+        checkpoints = list(checkpoints) + [checkpoints[-1]]*(self.n_checkpoints-len(checkpoints))
+        rad = list(rad) + [rad[-1]]*(self.n_checkpoints-len(rad))
+        parameters[self]['checkpoints'] = np.reshape(checkpoints, (self.n_checkpoints*self.n_dim, ))
+        parameters[self]['rad'] = rad
+        if self.n_dim == 2:
+            parameters[self]['theta'] = signals['orientation'][:, -1]
+        return parameters
@@ -0,0 +1,158 @@
+# This file is part of OMG-tools.
+#
+# OMG-tools -- Optimal Motion Generation-tools
+# Copyright (C) 2016 Ruben Van Parys & Tim Mercy, KU Leuven.
+# All rights reserved.
+#
+# OMG-tools is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+import numpy as np
+
+
+class ObstacleGrid(object):
+    # Uniform grid hash over the (x, y) bounding boxes of the obstacles. It
+    # gives the obstacles near a region, such that exact intersection tests
+    # are only done for those. The boxes are conservative: they contain the
+    # obstacle for any orientation. Obstacles moved from outside (e.g. with
+    # set_state) are picked up by the queries, which compare the positions
+    # and velocities with the ones the grid was made for.
+
+    def __init__(self, obstacles, cell_size=None):
+        self.cells = {}  # (i, j): set of obstacles
+        self.boxes = {}  # obstacle: box [xmin, ymin, xmax, ymax]
+        self.ranges = {}  # obstacle: covered cells (i0, j0, i1, j1)
+        self.order = {}  # obstacle: insertion index, to return obstacles in a fixed order
+        self.moving = set()  # obstacles with a non-zero velocity
+        self.states = {}  # obstacle: position and velocity used for the grid
+        self._count = 0
+        self._radius = {}
+        if cell_size is None:
+            # a few obstacles per cell
+            sizes = [2*self._get_radius(obstacle) for obstacle in obstacles]
+            cell_size = 2*np.median(sizes) if sizes else 1.
+        self.cell_size = float(cell_size)
+        for obstacle in obstacles:
+            self.insert(obstacle)
+
+    def _get_radius(self, obstacle):
+        # distance from the position to the farthest point of the obstacle,
+        # including the corners of its canvas (e.g. the square around a circle)
+        if obstacle not in self._radius:
+            checkpoints, rad = obstacle.shape.get_checkpoints()
+            limits = obstacle.shape.get_canvas_limits()
+            corners = [[x, y] for x in limits[0] for y in limits[1]]
+            self._radius[obstacle] = max([np.linalg.norm(chck[:2]) + r for chck, r in zip(checkpoints, rad)] +
+                                         [np.linalg.norm(corner) for corner in corners])
+        return self._radius[obstacle]
+
+    def _get_box(self, obstacle):
+        x, y = obstacle.signals['position'][:2, -1]
+        r = self._get_radius(obstacle)
+        return [x-r, y-r, x+r, y+r]
+
+    def _get_state(self, obstacle):
+        return (tuple(obstacle.signals['position'][:, -1]) +
+                tuple(obstacle.signals['velocity'][:, -1]))
+
+    def _get_range(self, box):
+        return (int(np.floor(box[0]/self.cell_size)), int(np.floor(box[1]/self.cell_size)),
+                int(np.floor(box[2]/self.cell_size)), int(np.floor(box[3]/self.cell_size)))
+
+    def _hash(self, obstacle, add=True):
+        i0, j0, i1, j1 = self.ranges[obstacle]
+        for i in range(i0, i1+1):
+            for j in range(j0, j1+1):
+                if add:
+                    self.cells.setdefault((i, j), set()).add(obstacle)
+                else:
+                    self.cells[(i, j)].discard(obstacle)
+                    if not self.cells[(i, j)]:
+                        del self.cells[(i, j)]
+
+    def insert(self, obstacle):
+        if obstacle in self.order:
+            return self.update(obstacle)
+        self.order[obstacle] = self._count
+        self._count += 1
+        self.states[obstacle] = self._get_state(obstacle)
+        self.boxes[obstacle] = self._get_box(obstacle)
+        self.ranges[obstacle] = self._get_range(self.boxes[obstacle])
+        self._hash(obstacle)
+        if np.any(obstacle.signals['velocity'][:, -1] != 0.):
+            self.moving.add(obstacle)
+
+    def remove(self, obstacle):
+        if obstacle not in self.order:
+            return
+        self._hash(obstacle, add=False)
+        for dictionary in [self.order, self.states, self.boxes, self.ranges, self._radius]:
+            dictionary.pop(obstacle, None)
+        self.moving.discard(obstacle)
+
+    def update(self, obstacle):
+        # to call after the obstacle moved
+        self.states[obstacle] = self._get_state(obstacle)
+        self.boxes[obstacle] = self._get_box(obstacle)
+        cells = self._get_range(self.boxes[obstacle])
+        if cells != self.ranges[obstacle]:
+            self._hash(obstacle, add=False)
+            self.ranges[obstacle] = cells
+            self._hash(obstacle)
+        if np.any(obstacle.signals['velocity'][:, -1] != 0.):
+            self.moving.add(obstacle)
+        else:
+            self.moving.discard(obstacle)
+
+    def refresh(self):
+        # update the obstacles which moved since they were put in the grid
+        for obstacle in self.order.keys():
+            if self._get_state(obstacle) != self.states[obstacle]:
+                self.update(obstacle)
+
+    def query(self, limits, refresh=True):
+        # obstacles of which the box overlaps with limits [xmin, ymin, xmax, ymax],
+        # use refresh=False only if the grid is known to be up to date
+        if refresh:
+            self.refresh()
+        i0, j0, i1, j1 = self._get_range(limits)
+        candidates = set()
+        if (i1-i0+1)*(j1-j0+1) > len(self.cells):
+            # large region: visit the occupied cells only
+            for (i, j), obstacles in self.cells.items():
+                if i0 <= i <= i1 and j0 <= j <= j1:
+                    candidates.update(obstacles)
+        else:
+            for i in range(i0, i1+1):
+                for j in range(j0, j1+1):
+                    candidates.update(self.cells.get((i, j), ()))
+        obstacles = [obstacle for obstacle in candidates if self._overlaps(self.boxes[obstacle], limits)]
+        return sorted(obstacles, key=self.order.get)
+
+    def query_moving(self, limits, horizon, refresh=True):
+        # moving obstacles of which the box overlaps with limits during [0, horizon],
+        # when moving with their current velocity
+        if refresh:
+            self.refresh()
+        obstacles = []
+        for obstacle in list(self.moving):
+            box = self._get_box(obstacle)
+            vx, vy = obstacle.signals['velocity'][:2, -1]*horizon
+            swept = [box[0]+min(vx, 0.), box[1]+min(vy, 0.), box[2]+max(vx, 0.), box[3]+max(vy, 0.)]
+            if self._overlaps(swept, limits):
+                obstacles.append(obstacle)
+        return sorted(obstacles, key=self.order.get)
+
+    def _overlaps(self, box1, box2):
+        return (box1[0] <= box2[2] and box2[0] <= box1[2] and
+                box1[1] <= box2[3] and box2[1] <= box1[3])
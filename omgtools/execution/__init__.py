@@ -1,3 +1,5 @@
 from plotlayer import PlotLayer
 from deployer import Deployer
 from simulator import Simulator
+from campaign import Campaign
+from gcodebatchplanner import GCodeBatchPlanner
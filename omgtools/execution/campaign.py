@@ -0,0 +1,155 @@
+# This file is part of OMG-tools.
+#
+# OMG-tools -- Optimal Motion Generation-tools
+# Copyright (C) 2016 Ruben Van Parys & Tim Mercy, KU Leuven.
+# All rights reserved.
+#
+# OMG-tools is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+from simulator import Simulator
+from multiprocessing import Pool
+import numpy as np
+import traceback
+import inspect
+
+
+# solvers built in this (worker) process, reused by the next runs of the same
+# scenario such that every worker builds each nlp only once
+_solvers = {}
+
+
+def _scenario_key(scenario):
+    return (getattr(scenario, '__module__', None), getattr(scenario, '__name__', str(scenario)))
+
+
+def run_scenario(scenario, seed, disturbance=None, options=None):
+    # one disturbed simulation, returns the data of which campaign statistics
+    # are computed
+    options = options or {}
+    result = {'seed': seed, 'reached': False, 'motion_time': np.nan,
+              'solve_times': [], 'constraint_violations': [],
+              'solve_status': [], 'error': None}
+    try:
+        np.random.seed(seed)
+        problem = scenario()
+        if 'verbose' in options:
+            problem.set_options({'verbose': options['verbose']})
+        for vehicle in problem.vehicles:
+            vehicle.set_options({'input_disturbance': disturbance})
+        key = _scenario_key(scenario)
+        if options.get('reuse_solver', True) and key in _solvers:
+            problem.init(_solvers[key])
+        else:
+            problem.init()
+            _solvers[key] = problem.problem
+        simulator = Simulator(problem, options.get('sample_time', 0.01),
+                              options.get('update_time', 0.1))
+        simulator.run(options.get('max_time', None))
+        result['reached'] = bool(problem.stop_criterium(
+            simulator.current_time, simulator.update_time))
+        result['motion_time'] = simulator.current_time
+        result['solve_times'] = list(problem.update_times)
+        result['constraint_violations'] = list(problem.constraint_violations)
+        result['solve_status'] = list(problem.solve_status)
+    except Exception:
+        result['error'] = traceback.format_exc()
+    return result
+
+
+def _run_scenario(args):
+    return run_scenario(*args)
+
+
+def _distribution(values):
+    values = np.array(values, dtype=float)
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return None
+    return {'mean': np.mean(values), 'std': np.std(values),
+            'min': np.min(values), 'median': np.median(values),
+            'p95': np.percentile(values, 95), 'max': np.max(values)}
+
+
+class Campaign:
+
+    def __init__(self, scenario, seeds, disturbances=None, options=None):
+        # scenario: module level function which returns a new problem, which
+        # is not yet initialized (problem.init() is called by the campaign)
+        # seeds: seeds of the random disturbances, one run per seed
+        # disturbances: list of input_disturbance settings (see Vehicle), every
+        # setting is run for all seeds
+        self.scenario = scenario
+        self.seeds = seeds
+        self.disturbances = disturbances if disturbances is not None else [None]
+        self.set_default_options()
+        self.set_options(options or {})
+
+    def set_default_options(self):
+        self.options = {'processes': None, 'chunksize': 1, 'sample_time': 0.01,
+                        'update_time': 0.1, 'max_time': None,
+                        'reuse_solver': True, 'verbose': 0,
+                        'violation_tol': 1e-6}
+
+    def set_options(self, options):
+        self.options.update(options)
+
+    def check_scenario(self):
+        # the runs reuse the solver of the first run by passing it to
+        # problem.init(), problems which build several nlps (e.g. schedulers
+        # or distributed problems) don't accept this and are not supported
+        problem = self.scenario()
+        if 'problem' not in inspect.getargspec(problem.init).args:
+            raise ValueError('Campaign does not support problems of type ' +
+                             problem.__class__.__name__ + ', only problems ' +
+                             'which solve a single nlp, e.g. Point2point.')
+
+    def run(self):
+        self.check_scenario()
+        runs = [(self.scenario, seed, disturbance, self.options)
+                for disturbance in self.disturbances for seed in self.seeds]
+        if self.options['processes'] == 1:
+            results = map(_run_scenario, runs)
+        else:
+            pool = Pool(self.options['processes'])
+            try:
+                results = pool.map(_run_scenario, runs, self.options['chunksize'])
+            finally:
+                pool.close()
+                pool.join()
+        n_seeds = len(self.seeds)
+        self.results = [results[k*n_seeds:(k+1)*n_seeds]
+                        for k in range(len(self.disturbances))]
+        return self.get_statistics()
+
+    def get_statistics(self):
+        # aggregated statistics, one dictionary per disturbance setting
+        statistics = []
+        for disturbance, results in zip(self.disturbances, self.results):
+            done = [r for r in results if r['error'] is None]
+            solve_times = sum([r['solve_times'] for r in done], [])
+            violations = sum([r['constraint_violations'] for r in done], [])
+            status = sum([r['solve_status'] for r in done], [])
+            stats = {'disturbance': disturbance, 'runs': len(results),
+                     'errors': len(results) - len(done),
+                     'reached': sum([r['reached'] for r in done]),
+                     'motion_time': _distribution(
+                        [r['motion_time'] for r in done if r['reached']]),
+                     'solve_time': _distribution(solve_times),
+                     'max_violation': _distribution(
+                        [max(r['constraint_violations'] or [0.]) for r in done]),
+                     'violations': sum([v > self.options['violation_tol'] for v in violations]),
+                     'failed_solves': sum([s != 'Solve_Succeeded' for s in status]),
+                     'solves': len(status)}
+            statistics.append(stats)
+        return statistics
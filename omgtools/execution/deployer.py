@@ -18,7 +18,7 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
 
 import numpy as np
-from matplotlib import pyplot as plt
+from plotlayer import PlotLayer, plt
 
 
 class Deployer:
@@ -78,7 +78,10 @@ class Deployer:
                 trajectories[str(vehicle)] = vehicle.trajectories
         return trajectories
 
-    def update_segment(self):
+    def update_segment(self, max_segments=None, initial_inputs=None):
+        # max_segments: stop after computing the trajectory over this many segments,
+        # instead of continuing until the goal is reached
+        # initial_inputs: [input, dinput] to start from, instead of standstill
         self.reset()
 
         # boolean to select if we want to go to next segment
@@ -86,13 +89,21 @@ class Deployer:
         self.problem.no_update = False
 
         # initialize the figures
-        self.init_plot()
+        if not PlotLayer.headless:
+            self.init_plot()
 
         # initialize trajectories
         self.state_traj = np.c_[self.problem.curr_state]
-        self.input_traj = np.c_[[0.,0.,0.]]
-        self.dinput_traj = np.c_[[0.,0.,0.]]
+        if initial_inputs is None:
+            self.input_traj = np.c_[[0.,0.,0.]]
+            self.dinput_traj = np.c_[[0.,0.,0.]]
+        else:
+            self.input_traj = np.c_[initial_inputs[0]]
+            self.dinput_traj = np.c_[initial_inputs[1]]
         self.ddinput_traj = np.c_[[0.,0.,0.]]
+        goal_input = getattr(self.problem, 'goal_input', None)
+        if goal_input is None:
+            goal_input = np.zeros(3)
 
         current_time = 0.
         target_reached = False
@@ -103,10 +114,14 @@ class Deployer:
                 update_time = 0.
                 current_time = 0.
                 states = self.problem.curr_state
-                inputs = None
-                dinputs = None
+                if initial_inputs is None:
+                    inputs = None
+                    dinputs = None
+                    enforce_inputs = False  # since there are no inputs yet
+                else:
+                    inputs, dinputs = initial_inputs
+                    enforce_inputs = True
                 ddinputs = None
-                enforce_inputs = False  # since there are no inputs yet
                 trajectories = self.update(current_time, states=states, inputs=inputs, dinputs=dinputs,
                                            update_time=update_time, enforce_states=True, enforce_inputs=enforce_inputs)
             else:
@@ -161,7 +176,8 @@ class Deployer:
                 self.ddinput_traj = np.c_[self.ddinput_traj, trajectories['ddinput'][:, 1:n_samp+1], self.ddinputs_end]
 
                 # update plot of trajectories of state, input,...
-                self.update_plot(current_time, update_time)
+                if not PlotLayer.headless:
+                    self.update_plot(current_time, update_time)
 
                 # check if problem was solved successfully
                 self.check_results(states, inputs, dinputs, ddinputs, current_time,
@@ -170,9 +186,12 @@ class Deployer:
                 # check if target is reached
                 # if self.problem.stop_criterium(current_time, update_time):
                 #     target_reached = True
-                if ((np.linalg.norm(self.problem.goal_state-self.state_traj[:, -1]) < 1e-2 and np.linalg.norm(self.input_traj[:, -1]) < 1e-2) and
+                if ((np.linalg.norm(self.problem.goal_state-self.state_traj[:, -1]) < 1e-2 and np.linalg.norm(self.input_traj[:, -1]-goal_input) < 1e-2) and
                      (not hasattr(self.problem, 'next_segment') or self.problem.next_segment is None)):
                     target_reached = True
+                if (max_segments is not None and not self.problem.no_update and
+                        self.problem.n_current_block+1 >= max_segments):
+                    target_reached = True
 
         # target reached, print final information
         self.problem.final()
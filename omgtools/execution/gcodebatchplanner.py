@@ -0,0 +1,151 @@
+# This file is part of OMG-tools.
+#
+# OMG-tools -- Optimal Motion Generation-tools
+# Copyright (C) 2016 Ruben Van Parys & Tim Mercy, KU Leuven.
+# All rights reserved.
+#
+# OMG-tools is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+from deployer import Deployer
+from plotlayer import PlotLayer
+from multiprocessing import Pool
+import numpy as np
+import pickle
+
+
+def plan_blocks(tool, GCode, start=None, goal=None, n_blocks=None, kwargs=None, options=None):
+    # compute the trajectory over the GCode blocks, as deployer.update_segment() does
+    # start, goal: [state, input, dinput] at the start of the first block and at the
+    # end of the last block, by default the tool stands still at the GCode end points
+    # n_blocks: stop after the trajectory over the first n_blocks blocks is computed
+    # the conditions of the tool are changed
+    # imported here, since the problems import the execution package
+    from ..problems.gcodeschedulerproblem import GCodeSchedulerProblem
+    kwargs = kwargs or {}
+    options = options or {}
+    if start is None:
+        tool.set_initial_conditions(GCode[0].start)
+    else:
+        tool.set_initial_conditions(list(start[0]), np.array(start[1]), np.array(start[2]))
+    if goal is None:
+        tool.set_terminal_conditions(GCode[-1].end)
+    else:
+        tool.set_terminal_conditions(list(goal[0]), np.array(goal[1]), np.array(goal[2]))
+    problem = GCodeSchedulerProblem(tool, GCode, **kwargs)
+    # the trajectory starts and ends at the given states,
+    # which lie inside the first and last room, but not necessarily at their end points
+    problem.environment.room[0]['start'] = tool.prediction['state']
+    problem.environment.room[-1]['end'] = tool.poseT
+    if 'solver_options' in options:
+        problem.set_options({'solver_options': options['solver_options']})
+    if 'verbose' in options:
+        problem.set_options({'verbose': options['verbose']})
+    max_segments = None
+    if n_blocks is not None:
+        max_segments = len(problem.get_environment(GCode[:n_blocks], tool).room)
+    headless = PlotLayer.headless
+    PlotLayer.headless = True
+    try:
+        deployer = Deployer(problem, sample_time=options.get('sample_time', 0.01))
+        # the tool starts moving when it starts at a connection
+        deployer.update_segment(max_segments, None if start is None else [np.array(start[1]), np.array(start[2])])
+    finally:
+        PlotLayer.headless = headless
+    return {'state_traj': deployer.state_traj, 'input_traj': deployer.input_traj,
+            'dinput_traj': deployer.dinput_traj, 'ddinput_traj': deployer.ddinput_traj,
+            'motion_time_log': list(problem.motion_time_log),
+            'update_times': list(problem.update_times)}
+
+
+def _plan_blocks(args):
+    # the tool is pickled with the default protocol, since its splines can't be
+    # pickled with the protocol used by multiprocessing
+    return plan_blocks(pickle.loads(args[0]), *args[1:])
+
+
+class GCodeBatchPlanner:
+
+    def __init__(self, tool, GCode, options=None, **kwargs):
+        # tool: Tool with its bounds and knots, the initial and terminal conditions
+        # are set by the planner
+        # GCode: list of GCode blocks, e.g. obtained from a GCodeReader
+        # kwargs: passed on to the GCodeSchedulerProblem of each window, e.g. n_segments
+        self.tool = tool
+        self.GCode = GCode
+        self.kwargs = kwargs
+        self.set_default_options()
+        self.set_options(options or {})
+
+    def set_default_options(self):
+        # window: amount of GCode blocks per window
+        # overlap: amount of GCode blocks before and after the connection between two
+        # windows which are planned to find the state at this connection
+        self.options = {'window': 10, 'overlap': 2, 'processes': None,
+                        'chunksize': 1, 'sample_time': 0.01, 'verbose': 1}
+
+    def set_options(self, options):
+        self.options.update(options)
+
+    def _map(self, tasks):
+        if self.options['processes'] == 1:
+            return map(_plan_blocks, tasks)
+        pool = Pool(self.options['processes'])
+        try:
+            return pool.map(_plan_blocks, tasks, self.options['chunksize'])
+        finally:
+            pool.close()
+            pool.join()
+
+    def run(self):
+        # plan the complete GCode in independent windows, which are solved in parallel:
+        # 1) fix the connection states between windows, by planning the blocks around
+        #    each connection and keeping the state at the end of the block before it
+        # 2) plan each window from its start to its end connection state
+        # 3) concatenate the trajectories of all windows
+        n_blocks = len(self.GCode)
+        window, overlap = self.options['window'], self.options['overlap']
+        bounds = range(0, n_blocks, window) + [n_blocks]
+        tool = pickle.dumps(self.tool)
+        tasks = []
+        for k in bounds[1:-1]:
+            start = max(0, k-overlap)
+            tasks.append((tool, self.GCode[start:min(n_blocks, k+overlap)], None, None,
+                          k-start, self.kwargs, self.options))
+        self.connections = [None]
+        for k, result in zip(bounds[1:-1], self._map(tasks)):
+            state = result['state_traj'][:, -1]
+            # no z-movement at the end of this block, remove numerical noise on z
+            if abs(state[2]-self.GCode[k-1].end[2]) < self.tool.tolerance:
+                state[2] = self.GCode[k-1].end[2]
+            self.connections.append([state, result['input_traj'][:, -1], result['dinput_traj'][:, -1]])
+        self.connections.append(None)
+        tasks = [(tool, self.GCode[a:b], self.connections[k], self.connections[k+1],
+                  None, self.kwargs, self.options) for k, (a, b) in enumerate(zip(bounds[:-1], bounds[1:]))]
+        self.results = self._map(tasks)
+        # the first sample of each window equals the last one of the previous window
+        for key in ['state_traj', 'input_traj', 'dinput_traj', 'ddinput_traj']:
+            trajs = [self.results[0][key]] + [result[key][:, 1:] for result in self.results[1:]]
+            setattr(self, key, np.hstack(trajs))
+        self.motion_time_log = sum([result['motion_time_log'] for result in self.results], [])
+        if self.options['verbose'] >= 1:
+            print 'Planned ', n_blocks, ' GCode blocks in ', len(self.results), ' windows.'
+            print 'Total machining time for computed trajectories: ', np.round(sum(self.motion_time_log),3), ' s'
+        return self.state_traj, self.input_traj, self.dinput_traj, self.ddinput_traj
+
+    def save_results(self, count=0):
+        # write results to file, in the same format as the Deployer
+        data = np.c_[self.state_traj[0,:], self.input_traj[0,:], self.dinput_traj[0,:],
+                     self.state_traj[1,:], self.input_traj[1,:], self.dinput_traj[1,:],
+                     self.state_traj[2,:], self.input_traj[2,:], self.dinput_traj[2,:]]  # pos, vel, acc in xyz
+        np.savetxt('trajectories_'+str(count)+'.csv', data , delimiter=',')
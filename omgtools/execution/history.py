@@ -0,0 +1,79 @@
+# This file is part of OMG-tools.
+#
+# OMG-tools -- Optimal Motion Generation-tools
+# Copyright (C) 2016 Ruben Van Parys & Tim Mercy, KU Leuven.
+# All rights reserved.
+#
+# OMG-tools is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+from bisect import bisect_right
+
+
+class History(object):
+    # Sample-indexed memory of data that stays constant during one update.
+    # Every update is stored once, together with its start and end time and
+    # the number of samples it covers. Indexing with a sample index returns
+    # the entry that was active at that sample, as if the entry was repeated
+    # for every sample, but memory and append cost scale with the number of
+    # updates instead of with the number of samples.
+
+    def __init__(self):
+        self.entries = []
+        self.start_times = []
+        self.end_times = []
+        self._ends = []  # cumulative number of samples at the end of each entry
+        self._t_ends = []  # end times used to look up entries by time
+
+    def append(self, entry, n_samp=1, start_time=None, end_time=None):
+        if n_samp <= 0:
+            return
+        if self._t_ends and self.end_times[-1] is None:
+            # an entry without end time is active until the next entry starts
+            if start_time is not None:
+                self._t_ends[-1] = start_time
+            else:
+                self._t_ends[-1] = self._t_ends[-2] if len(self._t_ends) > 1 else -float('inf')
+        self._t_ends.append(end_time if end_time is not None else float('inf'))
+        self.entries.append(entry)
+        self.start_times.append(start_time)
+        self.end_times.append(end_time)
+        self._ends.append(len(self) + n_samp)
+
+    def index(self, sample):
+        # index of the entry that was active at sample
+        if sample < 0:
+            sample += len(self)
+        if sample < 0 or sample >= len(self):
+            raise IndexError('History index out of range.')
+        return bisect_right(self._ends, sample)
+
+    def at_time(self, time):
+        # entry that was active at a certain time
+        k = bisect_right(self._t_ends, time)
+        return self.entries[min(k, len(self.entries)-1)]
+
+    def __len__(self):
+        return self._ends[-1] if self._ends else 0
+
+    def __getitem__(self, sample):
+        if isinstance(sample, slice):
+            return [self[k] for k in range(*sample.indices(len(self)))]
+        return self.entries[self.index(sample)]
+
+    def __iter__(self):
+        start = 0
+        for entry, end in zip(self.entries, self._ends):
+            for _ in range(end - start):
+                yield entry
+            start = end
@@ -20,14 +20,20 @@
 import warnings
 import os
 import shutil
-import matplotlib
-matplotlib.use('TKAgg')
-import matplotlib.pyplot as plt
-from matplotlib import animation
-from mpl_toolkits.mplot3d import Axes3D, proj3d
 import numpy as np
-from matplotlib.collections import PolyCollection
-from mpl_toolkits.mplot3d.art3d import Poly3DCollection
+from ..basics.lazy import LazyImport
+
+# headless mode (environment variable OMGTOOLS_HEADLESS=1): no gui backend,
+# nothing is plotted or stored for plotting while simulating
+headless = os.environ.get('OMGTOOLS_HEADLESS', '0') not in ['', '0']
+
+
+def _select_backend():
+    import matplotlib
+    matplotlib.use('Agg' if headless else 'TKAgg')
+
+# matplotlib is only loaded once something is plotted
+plt = LazyImport('matplotlib.pyplot', before_import=_select_backend)
 
 # def orthogonal_proj(zfront, zback):
 #     a = (zfront+zback)/(zfront-zback)
@@ -58,6 +64,7 @@ def _init_axis_2d(axis, info):
         for line in info['lines']:
             axis.plot([], [], zorder=0, **line)[0]
     if 'surfaces' in info:
+        from matplotlib.collections import PolyCollection
         for surf in info['surfaces']:
             col = PolyCollection([], **surf)
             col.set_zorder(1)
@@ -81,6 +88,7 @@ def _init_axis_3d(axis, info, view=None):
         for line in info['lines']:
             axis.plot([], [], **line)[0]
     if 'surfaces' in info:
+        from mpl_toolkits.mplot3d.art3d import Poly3DCollection
         for surf in info['surfaces']:
             col = Poly3DCollection([], **surf)
             axis.add_collection3d(col)
@@ -178,6 +186,7 @@ def _cleanup_rubbish(path, info, root=None):
 
 class PlotLayer(object):
     simulator = 0
+    headless = headless
 
     def __init__(self):
         # default colors
@@ -187,7 +196,6 @@ class PlotLayer(object):
         lightblue = [106., 194., 238.]
         self.set_color_template([blue, red, green, lightblue])
         self.plots = []
-        plt.ion()
 
     def set_color_template(self, colors):
         self.colors = [[c/255. for c in color] for color in colors]
@@ -221,12 +229,15 @@ class PlotLayer(object):
             view = kwargs['view']
         else:
             view = None
+        if not PlotLayer.headless:
+            plt.ion()
         figure = plt.figure()
         plot['figure'] = figure
         for k in range(ax_r):
             for l in range(ax_c):
                 if ('projection' in info[k][l] and
                         info[k][l]['projection'] == '3d'):
+                    from mpl_toolkits.mplot3d import Axes3D
                     axis = figure.add_subplot(
                         ax_r, ax_c, k*ax_c+l+1, projection='3d')
                     _init_axis_3d(axis, info[k][l], view)
@@ -242,6 +253,9 @@ class PlotLayer(object):
     # ========================================================================
 
     def update_plots(self, plots=None, t=-1):
+        if plots is None and PlotLayer.headless:
+            # only plots which are explicitly asked for are drawn
+            return
         plots = plots or self.plots
         plots = plots if isinstance(plots, list) else [plots]
         for plot in plots:
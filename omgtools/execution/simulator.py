@@ -36,10 +36,12 @@ class Simulator:
         self.deployer.set_problem(problem)
         self.problem = problem
 
-    def run(self):
+    def run(self, max_time=None):
         self.deployer.reset()
         stop = False
         while not stop:
+            if max_time is not None and self.current_time >= max_time:
+                break
             stop = self.update()
             ### adapted ###
             if (stop or self.update_time - float(self.problem.vehicles[0].signals['time'][:, -1] - self.current_time)) > self.sample_time:
@@ -1,8 +1,7 @@
 import Tkinter as tk
 import tkFileDialog as tkfiledialog
 import numpy as np
-from matplotlib import pyplot as plt
-from mpl_toolkits.mplot3d import Axes3D
+from ..execution.plotlayer import plt
 
 from gcode_block import generate_gcodeblock
 
@@ -222,6 +221,8 @@ class GCodeReader(object):
 
         self.get_connections()
 
+        # registers the 3d projection, imported here since it loads matplotlib
+        from mpl_toolkits.mplot3d import Axes3D
         fig = plt.figure()
         ax = fig.gca(projection='3d')
         ax.scatter(self.connections[:,0], self.connections[:,1], self.connections[:,2], color='red', marker='x', label='GCode')
@@ -1,7 +1,7 @@
 import numpy as np
 from xml.etree.ElementTree import ElementTree
 import re
-from matplotlib import pyplot as plt
+from ..execution.plotlayer import plt
 
 class SVGReader(object):
     def __init__(self):
@@ -204,8 +204,17 @@ class DistributedProblem(Problem):
     # ========================================================================
 
     def simulate(self, current_time, simulation_time, sample_time):
+        batch = []
         for problem in self.problems:
-            problem.simulate(current_time, simulation_time, sample_time)
+            problem.simulate(current_time, simulation_time, sample_time, batch)
+        # integrate vehicles with equal simulation time together
+        simulation_times = {}
+        for problem, sim_time in batch:
+            simulation_times.setdefault(sim_time, []).extend(problem.vehicles)
+        for sim_time, vehicles in simulation_times.items():
+            self.fleet.simulate(sim_time, sample_time, vehicles)
+        for problem, sim_time in batch:
+            problem.finish_simulation(sim_time, sample_time)
         horizon_time = self.problems[0].options['horizon_time']
         if horizon_time < simulation_time:
             simulation_time = horizon_time
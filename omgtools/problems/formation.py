@@ -19,7 +19,6 @@
 
 from admm import ADMMProblem
 from point2point import Point2point
-from ..export.export_formation import ExportFormation
 import numpy as np
 
 
@@ -109,4 +108,5 @@ class FormationPoint2point(ADMMProblem):
         options = options or {}
         if not hasattr(self, 'father'):
             self.init()
+        from ..export.export_formation import ExportFormation
         ExportFormation(self, options)
@@ -78,7 +78,7 @@ class GCodeProblem(Problem):
             else:
                 self.vehicles[0].define_trajectory_constraints(total_splines[idx], self.motion_times[idx], skip=[])
             # set up room constraints
-            self.vehicles[0].define_collision_constraints(self.environment.room[idx], total_splines[idx], self.motion_times[idx])
+            self.vehicles[0].define_collision_constraints(self.environment.get_room(idx), total_splines[idx], self.motion_times[idx])
 
         # constrain spline segments
         self.define_init_constraints()
@@ -97,7 +97,7 @@ class GCodeProblem(Problem):
     def define_terminal_constraints(self):
         # place final constraints only on last spline segment
         term_con, term_con_der = self.vehicles[0].get_terminal_constraints(
-            self.vehicles[0].splines[-1])  # select last spline segment
+            self.vehicles[0].splines[-1], self.motion_times[-1])  # select last spline segment
         if ('no_term_con_der' in self.options and self.options['no_term_con_der']):
             term_con_der = []
         for con in (term_con + term_con_der):
@@ -26,6 +26,7 @@ from ..basics.shape import Rectangle, Ring
 from ..basics.geometry import distance_between_points, point_in_polyhedron
 from ..basics.spline import BSplineBasis, BSpline
 from ..basics.spline_extra import concat_splines, running_integral, definite_integral
+from ..basics.childstates import ChildStates
 
 from casadi import MX, Function, nlpsol, vertcat
 from scipy.interpolate import interp1d
@@ -51,14 +52,25 @@ class GCodeSchedulerProblem(Problem):
         # amount of segments to combine
         self.n_segments = kwargs['n_segments'] if 'n_segments' in kwargs else 1
         self._n_segments = self.n_segments  # save original value (for plotting)
+        # reuse the solver of a previous local problem with the same sequence of segment types
+        self.reuse_problems = kwargs['reuse_problems'] if 'reuse_problems' in kwargs else True
+        self._solvers = {}
+        # construct the next local problem while the control loop is idle, see build_next_problem()
+        self.prebuild = kwargs['prebuild'] if 'prebuild' in kwargs else False
+        self._next_problem = None
 
         environment = self.get_environment(GCode, tool)
+        # there can't be more segments combined than there are rooms
+        self.n_segments = self._n_segments = min(self.n_segments, len(environment.room))
         # pass on environment and tool to Problem constructor,
         # generates self.vehicles and self.environment
         # self.vehicles[0] = tool
         Problem.__init__(self, tool, environment, options, label='schedulerproblem')
         self.curr_state = self.vehicles[0].prediction['state'] # initial vehicle position
         self.goal_state = self.vehicles[0].poseT # overall goal
+        # velocity and acceleration at the goal, None means standstill
+        self.goal_input = self.vehicles[0].inputT
+        self.goal_dinput = self.vehicles[0].dinputT
         self.problem_options = options  # e.g. selection of problem type (freeT, fixedT)
         self.problem_options['freeT'] = True  # only this one is available
 
@@ -104,6 +116,8 @@ class GCodeSchedulerProblem(Problem):
         self.local_problem = self.generate_problem()
         # pass on init_guess
         self.local_problem.reset_init_guess(init_guess)
+        # allow constructing the problem for the next segments
+        self.prebuild_problem()
 
     def solve(self, current_time, update_time):
         # solve the local problem with a receding horizon,
@@ -132,13 +146,19 @@ class GCodeSchedulerProblem(Problem):
                 self.n_current_block += 1
                 self.update_segments()
 
-                # transform segments into local_problem
-                self.local_problem = self.generate_problem()
+                # transform segments into local_problem,
+                # preferably using the problem that was constructed beforehand
+                self.local_problem = self.get_prebuilt_problem()
+                if self.local_problem is None:
+                    self.local_problem = self.generate_problem()
                 # self.init_guess is filled in by update_segments()
                 # this also updates self.motion_time
                 self.local_problem.reset_init_guess(self.init_guess)
+                # allow constructing the problem for the next segments
+                self.prebuild_problem()
 
         # solve local problem
+        self.local_problem.delay_time = self.delay_time
         self.local_problem.solve(current_time, update_time)
 
         # update motion time variables (remaining time)
@@ -159,8 +179,10 @@ class GCodeSchedulerProblem(Problem):
         # call store of local problem
         self.local_problem.store(current_time, update_time, sample_time)
 
-    def _add_to_memory(self, memory, data_to_add, repeat=1):
-        memory.extend([data_to_add for k in range(repeat)])
+    def simulate(self, current_time, simulation_time, sample_time):
+        Problem.simulate(self, current_time, simulation_time, sample_time)
+        # the control loop is idle until the next update
+        self.build_next_problem()
 
     def stop_criterium(self, current_time, update_time):
         # check if the current segment is the last one
@@ -549,7 +571,7 @@ class GCodeSchedulerProblem(Problem):
             # make a single ring segment
             shape = Ring(radius_in = radius_in, radius_out = radius_out,
                          start = start, end = end, direction = direction)
-            pose = block.center
+            pose = list(block.center)
             pose.extend([0.,0.,0.])  # [x,y,z,orientation], ring always has orientation 0
             new_room = [{'shape': shape, 'pose': pose, 'position': pose[:2], 'draw':True,
                         'start': block.start, 'end': block.end, 'number':number}]
@@ -739,16 +761,75 @@ class GCodeSchedulerProblem(Problem):
     def generate_problem(self):
 
         local_rooms = self.environment.room[self.n_current_block:self.n_current_block+self.n_segments]
-        local_environment = Environment(room=local_rooms)
-        problem = GCodeProblem(self.vehicles[0], local_environment, self.n_segments, motion_time_guess=self.motion_times)
-
-        problem.set_options({'solver_options': self.options['solver_options']})
-        problem.init()
+        problem = self.build_problem(local_rooms, self.vehicles[0])
         # reset the current_time, to ensure that predict uses the provided
         # last input of previous problem and vehicle velocity is kept from one frame to another
         problem.initialize(current_time=0.)
         return problem
 
+    def build_problem(self, local_rooms, tool):
+        if self.reuse_problems:
+            # segment geometry becomes a parameter of the local problem
+            local_rooms = [dict(room, parametric=True) for room in local_rooms]
+        local_environment = Environment(room=local_rooms)
+        problem = GCodeProblem(tool, local_environment, len(local_rooms), motion_time_guess=self.motion_times)
+
+        problem.set_options({'solver_options': self.options['solver_options'],
+                             'anytime': self.options['anytime']})
+        key = self.get_problem_key(local_rooms)
+        if self.reuse_problems and key in self._solvers:
+            problem.init(problem=self._solvers[key])
+        else:
+            problem.init()
+            if self.reuse_problems:
+                self._solvers[key] = problem.problem
+        return problem
+
+    def prebuild_problem(self):
+        # the next segments are known beforehand: drop the current segment and
+        # add the next block, build_next_problem() constructs their problem
+        self._next_problem = None
+
+    def build_next_problem(self):
+        # construct the problem for the next segments, such that the segment
+        # switch doesn't have to wait for it: call it when the control loop is
+        # idle, the simulation does so after each update. The current problem
+        # keeps using the tool as it was before.
+        next_block = self.n_current_block+1
+        if not self.prebuild or self._next_problem is not None or next_block > self.cnt:
+            return
+        local_rooms = self.environment.room[next_block:next_block+self.n_segments]
+        states = ChildStates([self.vehicles[0]])
+        try:
+            problem = self.build_problem(local_rooms, self.vehicles[0])
+        finally:
+            states.set_aside()
+        self._next_problem = (problem, local_rooms, states)
+
+    def get_prebuilt_problem(self):
+        # problem that was constructed beforehand, if it fits the current segments
+        next_problem, self._next_problem = self._next_problem, None
+        if next_problem is None:
+            return None
+        problem, local_rooms, states = next_problem
+        current_rooms = self.environment.room[self.n_current_block:self.n_current_block+self.n_segments]
+        if len(local_rooms) != len(current_rooms) or any(r1 is not r2 for r1, r2 in zip(local_rooms, current_rooms)):
+            return None
+        states.take_over()
+        problem.motion_time_guess = self.motion_times
+        problem.initialize(current_time=0.)
+        return problem
+
+    def get_problem_key(self, rooms):
+        # local problems with the same sequence of segment types only differ in
+        # their parameters and can share a solver
+        key = []
+        for room in rooms:
+            shape = room['shape']
+            aligned = (isinstance(shape, (Rectangle, Square)) and shape.orientation % (np.pi/2) == 0)
+            key.append((shape.__class__.__name__, aligned, room['start'][2] != room['end'][2]))
+        return tuple(key)
+
     def get_init_guess(self, **kwargs):
         # if first iteration, compute init_guess based on center line (i.e. connection between start and end) for all segments
         # else, use previous solutions to build a new initial guess:
@@ -812,7 +893,13 @@ class GCodeSchedulerProblem(Problem):
         # deployer.run_segment() calls vehicle.predict(), which calls problem.predict(),
         # and sets the initial conditions,
         # so don't repeat here since this would erase the input and dinput values
-        self.vehicles[0].set_terminal_conditions(self.segments[-1]['end'])
+        if self.goal_input is None:
+            self.vehicles[0].set_terminal_conditions(self.segments[-1]['end'])
+        elif self.segments[-1] is self.environment.room[-1]:
+            # only the last segment ends with the goal velocity and acceleration
+            self.vehicles[0].set_terminal_conditions(self.segments[-1]['end'], self.goal_input, self.goal_dinput)
+        else:
+            self.vehicles[0].set_terminal_conditions(self.segments[-1]['end'], np.zeros(3), np.zeros(3))
 
         end_time = time.time()
         if self.options['verbose'] >= 2:
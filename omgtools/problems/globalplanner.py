@@ -17,10 +17,12 @@
 # License along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
 
-from ..basics.shape import Rectangle, Square, Circle
+from ..basics.shape import Rectangle, Square, Circle, Polyhedron
 
+import os
 import time
-from matplotlib import pyplot as plt
+import heapq
+from ..execution.plotlayer import plt
 import numpy as np
 
 class GlobalPlanner(object):
@@ -35,14 +37,9 @@ class GlobalPlanner(object):
         # move a point in world coordinates to the closest grid point
         pass
 
-class QuadmapPlanner(GlobalPlanner):
-    # global planner using a quadmap
-    def __init__(self,environment):
-        GlobalPlanner.__init__(self, environment)
-        raise NotImplementedError('Please implement this method!')
-
-    def get_path(self, environment, curr_state, goal_state):
-        raise NotImplementedError('Please implement this method!')
+    def draw(self):
+        # Implement this in the child classes
+        pass
 
 class AStarPlanner(GlobalPlanner):
     # global planner using the A*-algorithm
@@ -62,12 +59,17 @@ class AStarPlanner(GlobalPlanner):
             if not isinstance(options['veh_size'], list):
                 options['veh_size'] = [options['veh_size']]
             if len(options['veh_size']) == 1:
-                self.veh_size = 2*[options['veh_size']]
+                self.veh_size = 2*options['veh_size']
             else:
                 self.veh_size = options['veh_size']
         else:
             # must consist of an offset in x- and y-direction
             self.veh_size = [0.,0.]
+        # any-angle paths: only keep the waypoints where the path has to turn
+        self.any_angle = options['any_angle'] if 'any_angle' in options else False
+        # clearance cost: moving through a cell closer than clearance_range [m]
+        # to an obstacle costs up to clearance_weight times the length of the move extra
+        self.clearance_weight = options['clearance_weight'] if 'clearance_weight' in options else 0.
 
         # make grid
         if ((grid_width == grid_height) and (n_cells[0] == n_cells[1])):
@@ -76,8 +78,12 @@ class AStarPlanner(GlobalPlanner):
             self.grid = Grid(width=grid_width, height=grid_height, position=grid_position, n_cells=n_cells, offset=self.veh_size)
 
         # occupy grid cells based on environment
-        blocked = self.grid.get_occupied_cells(environment)
-        self.grid.block(blocked)
+        self.grid.occupied |= self.grid.get_occupancy(environment)
+        if 'clearance_range' in options:
+            self.clearance_range = options['clearance_range']
+        else:
+            self.clearance_range = 3*max(self.grid.cell_width, self.grid.cell_height)
+        self.update_costmap()
 
         # only grid points are reachable so move start and goal for global planner
         self.start = self.grid.move_to_gridpoint(start)
@@ -87,6 +93,30 @@ class AStarPlanner(GlobalPlanner):
         theta = np.arctan(float(self.grid.cell_height)/self.grid.cell_width)
         self.diag_cost = self.grid.cell_width / np.cos(theta)
 
+    def update_grid(self, environment):
+        # occupy grid cells based on the current environment, e.g. after
+        # obstacles were added, removed or moved
+        self.grid.occupied = self.grid.get_occupancy(environment)
+        self.update_costmap()
+
+    def update_costmap(self):
+        # penalty of each cell, which decreases linearly with the clearance
+        # of the cell and vanishes beyond clearance_range
+        if self.clearance_weight > 0.:
+            self.grid.update_clearance()
+            self.costmap = self.clearance_weight*np.maximum(1. - self.grid.clearance/self.clearance_range, 0.)
+        else:
+            # no clearance cost: only compute the clearance when it is asked for
+            self.grid.clearance = None
+            self.costmap = np.zeros(self.grid.occupied.shape)
+
+    def get_clearance(self, point):
+        return self.grid.get_clearance(point)
+
+    def clearance_cost(self, point1, point2, length):
+        # additive cost of a move, the mean penalty of both cells times the length of the move
+        return 0.5*(self.costmap[point1[0], point1[1]] + self.costmap[point2[0], point2[1]])*length
+
     def set_start(self, start):
         self.start = start
 
@@ -109,6 +139,8 @@ class AStarPlanner(GlobalPlanner):
             elif x != par_x and y != par_y:
                 # diagonal movement
                 g_cost = self.diag_cost
+            if self.clearance_weight > 0.:
+                g_cost += self.clearance_cost(node.pos, node.parent.pos, g_cost)
             g_cost += node.parent.g_cost
         return g_cost
 
@@ -124,20 +156,16 @@ class AStarPlanner(GlobalPlanner):
         return node.g_cost + node.h_cost
 
     def get_lowest_f_cost_node(self):
-        # find the cheapest node to go to
-        cost = np.inf
-        cheapest_node = None
-        for node in self.open_list:
-            if node.f_cost < cost:
-                cost = node.f_cost
-                cheapest_node = node
-        return cheapest_node
+        # find the cheapest node to go to, skip heap entries of nodes which
+        # were closed or got a lower cost afterwards
+        while self.open_heap:
+            f_cost, _, node = heapq.heappop(self.open_heap)
+            if tuple(node.pos) in self.open_list and f_cost == node.f_cost:
+                return node
+        return None
 
     def remove_from_open_list(self, node):
-        for n in self.open_list:
-            if n == node:
-                self.open_list.remove(n)
-                break
+        self.open_list.pop(tuple(node.pos), None)
 
     def create_node(self, point, parent=None):
         # creates a node on the location of point
@@ -154,8 +182,13 @@ class AStarPlanner(GlobalPlanner):
 
         # initialize A*-algorithm
         self.current_node = self.create_node(self.start)
-        self.open_list = []
+        # the open list is a binary heap of (f_cost, index, node), with index
+        # the order in which nodes were added, such that equal costs are
+        # resolved first come first served
+        self.open_heap = []
+        self.open_list = {}  # position: (index, node)
         self.closed_list = [self.current_node]
+        closed = set([tuple(self.current_node.pos)])
 
         while self.current_node.pos != self.goal:
             # get positions of current node neighbours
@@ -164,51 +197,44 @@ class AStarPlanner(GlobalPlanner):
                 raise RuntimeError('The current node has no free neighbors! ' +
                         'Consider using more grid points.')
             for point in neighbors:
-                # suppose that the gridpoint is not yet seen
-                new_point = True
-                for n in self.closed_list:
-                    if point == n.pos:
-                        # point is already in closed list
-                        new_point = False
-                        break
-                for n in self.open_list:
-                    if point == n.pos:
-                        # point is already in open list
-                        dummy_node = Node(point, parent=self.current_node)
-                        new_g_cost = self.calculate_g_cost(dummy_node)
-                        if new_g_cost <= n.g_cost:
-                            n.parent = self.current_node
-                            n.g_cost = new_g_cost
-                            n.h_cost = self.calculate_h_cost(n)
-                            n.f_cost = self.calculate_f_cost(n)
-                        new_point = False
-                        break
-                if new_point:
+                if tuple(point) in closed:
+                    # point is already in closed list
+                    continue
+                if tuple(point) in self.open_list:
+                    # point is already in open list
+                    index, n = self.open_list[tuple(point)]
+                    dummy_node = Node(point, parent=self.current_node)
+                    new_g_cost = self.calculate_g_cost(dummy_node)
+                    if new_g_cost <= n.g_cost:
+                        f_cost = n.f_cost
+                        n.parent = self.current_node
+                        n.g_cost = new_g_cost
+                        n.h_cost = self.calculate_h_cost(n)
+                        n.f_cost = self.calculate_f_cost(n)
+                        if n.f_cost < f_cost:
+                            # the old heap entry is skipped later on
+                            heapq.heappush(self.open_heap, (n.f_cost, index, n))
+                else:
                     # make a node for the point
                     new_node = self.create_node(point)
                     new_node.parent = self.current_node
                     new_node.g_cost = self.calculate_g_cost(new_node)
                     new_node.h_cost = self.calculate_h_cost(new_node)
                     new_node.f_cost = self.calculate_f_cost(new_node)
-                    self.open_list.append(new_node)
+                    index = len(self.open_list) + len(self.closed_list)
+                    self.open_list[tuple(point)] = (index, new_node)
+                    heapq.heappush(self.open_heap, (new_node.f_cost, index, new_node))
 
             self.current_node = self.get_lowest_f_cost_node()
+            if self.current_node is None:
+                # current node is not the goal, and all reachable nodes are visited,
+                # meaning that no path could be found
+                raise RuntimeError('There is no path from the desired start to the desired end node! ' +
+                    'Consider using more grid points.')
 
             self.remove_from_open_list(self.current_node)
             self.closed_list.append(self.current_node)
-
-            if not self.open_list:
-                # current node is not the goal, and open list is empty
-                # check if there are neigbors left which you can reach and are not yet visited
-                neighbors = self.grid.get_neighbors(self.current_node.pos)
-                closed_list_pos = []
-                for node in self.closed_list:
-                    closed_list_pos.append(node.pos)
-                if not neighbors or all([item in closed_list_pos for item in neighbors]):
-                    # there are no neighbors which are accessible or they are all in the closed list,
-                    # meaning that no path could be found
-                    raise RuntimeError('There is no path from the desired start to the desired end node! ' +
-                        'Consider using more grid points.')
+            closed.add(tuple(self.current_node.pos))
 
         t2 = time.time()
         print 'Elapsed time to find a global path: ', t2-t1
@@ -222,6 +248,8 @@ class AStarPlanner(GlobalPlanner):
 
         # convert node positions (indices) to waypoint positions (physical values)
         path = self.convert_node_to_waypoint(nodes_pos)
+        if self.any_angle:
+            path = self.smooth_path(path)
 
         return path
 
@@ -247,6 +275,123 @@ class AStarPlanner(GlobalPlanner):
             waypoints.append(waypoint)
         return waypoints
 
+    def smooth_path(self, path):
+        # shortcut the path: from each kept waypoint, go straight to the last
+        # waypoint of the path which is still in line of sight
+        smooth_path = [path[0]]
+        if self.clearance_weight > 0.:
+            # a shortcut may not come closer to the obstacles than the part of the path it replaces
+            clearance = [self.grid.clearance[tuple(self.grid.get_cell(point))] for point in path]
+        k = 0
+        while k < len(path)-1:
+            l = k + 1
+            while l < len(path)-1 and self.line_of_sight(path[k], path[l+1],
+                    min(clearance[k:l+2]) if self.clearance_weight > 0. else 0.):
+                l += 1
+            smooth_path.append(path[l])
+            k = l
+        return smooth_path
+
+    def line_of_sight(self, point1, point2, clearance=0.):
+        # check if the straight line between two waypoints only crosses free
+        # cells, of which the clearance is at least clearance
+        # work in grid coordinates, in which cell [i, j] is [i, i+1] x [j, j+1]
+        origin = [self.grid.position[0] - 0.5*self.grid.width, self.grid.position[1] - 0.5*self.grid.height]
+        size = [self.grid.cell_width, self.grid.cell_height]
+        point1 = np.array([(point1[k] - origin[k])/size[k] for k in range(2)])
+        point2 = np.array([(point2[k] - origin[k])/size[k] for k in range(2)])
+        direction = point2 - point1
+        # fractions of the line at which it crosses a grid line
+        fractions = [[0., 1.]]
+        for k in range(2):
+            if direction[k] != 0.:
+                lines = np.arange(np.ceil(min(point1[k], point2[k])), np.floor(max(point1[k], point2[k])) + 1)
+                fractions.append((lines - point1[k])/direction[k])
+        fractions = np.unique(np.clip(np.hstack(fractions), 0., 1.))
+        # the line crosses the cells between two crossings
+        middles = point1 + np.outer(0.5*(fractions[:-1] + fractions[1:]), direction)
+        cells = np.floor(middles).astype(int)
+        # crossing a grid point is a diagonal move, its four cells should be free
+        crossings = point1 + np.outer(fractions, direction)
+        corners = np.round(crossings[np.all(np.abs(crossings - np.round(crossings)) < 1e-9, axis=1)]).astype(int)
+        for shift in [[0, 0], [-1, 0], [0, -1], [-1, -1]]:
+            cells = np.vstack((cells, corners + shift))
+        if (np.any(cells < 0) or np.any(cells[:, 0] >= self.grid.n_cells[0]) or
+           np.any(cells[:, 1] >= self.grid.n_cells[1])):
+            return False
+        if clearance > 0.:
+            return not np.any(self.grid.clearance[cells[:, 0], cells[:, 1]] < clearance - 1e-9)
+        return not np.any(self.grid.occupied[cells[:, 0], cells[:, 1]])
+
+    def lines_of_sight(self, points1, points2):
+        # line_of_sight for many pairs of points at once, returns a boolean array
+        origin = np.array([self.grid.position[0] - 0.5*self.grid.width, self.grid.position[1] - 0.5*self.grid.height])
+        size = np.array([self.grid.cell_width, self.grid.cell_height])
+        points1 = (np.array(points1, dtype=float).reshape(-1, 2) - origin)/size
+        points2 = (np.array(points2, dtype=float).reshape(-1, 2) - origin)/size
+        visible = np.ones(len(points1), dtype=bool)
+        # cheap rejection first: a line is blocked if a point on it lies in an
+        # occupied cell, the remaining lines are checked cell by cell
+        for n_samples in [8, 64]:
+            for k in range(0, len(points1), 100000//n_samples):
+                lines = np.nonzero(visible[k:k+100000//n_samples])[0] + k
+                fractions = (np.arange(n_samples) + 0.5)/n_samples
+                samples = points1[lines, None, :] + fractions[None, :, None]*(points2 - points1)[lines, None, :]
+                cells = np.floor(samples).astype(int)
+                inside = ((cells[:, :, 0] >= 0) & (cells[:, :, 1] >= 0) &
+                          (cells[:, :, 0] < self.grid.n_cells[0]) & (cells[:, :, 1] < self.grid.n_cells[1]))
+                blocked = np.zeros(inside.shape, dtype=bool)
+                blocked[inside] = self.grid.occupied[cells[inside][:, 0], cells[inside][:, 1]]
+                visible[lines[np.any(blocked, axis=1)]] = False
+        lines = np.nonzero(visible)[0]
+        visible[lines] = self.crossed_cells_free(points1[lines], points2[lines])
+        return visible
+
+    def crossed_cells_free(self, points1, points2, max_crossings=1000000):
+        # exact check of lines_of_sight, in grid coordinates
+        direction = points2 - points1
+        # grid lines crossed by each line, per direction
+        lower = np.ceil(np.minimum(points1, points2))
+        n_lines = np.where(direction != 0., np.floor(np.maximum(points1, points2)) - lower + 1, 0).astype(int)
+        n_lines = np.maximum(n_lines, 0)
+        n_crossings = n_lines.sum(axis=1) + 2
+        if n_crossings.sum() > max_crossings and len(points1) > 1:
+            # limit the memory use
+            split = max(1, np.searchsorted(np.cumsum(n_crossings), max_crossings))
+            return np.r_[self.crossed_cells_free(points1[:split], points2[:split], max_crossings),
+                         self.crossed_cells_free(points1[split:], points2[split:], max_crossings)]
+        # fractions of the lines at which they cross a grid line, with the line index
+        lines, fractions = [np.arange(len(points1))]*2, [np.zeros(len(points1)), np.ones(len(points1))]
+        for k in range(2):
+            line = np.repeat(np.arange(len(points1)), n_lines[:, k])
+            first = np.repeat(np.cumsum(n_lines[:, k]) - n_lines[:, k], n_lines[:, k])
+            grid_line = lower[line, k] + np.arange(len(line)) - first
+            lines.append(line)
+            fractions.append((grid_line - points1[line, k])/direction[line, k])
+        lines, fractions = np.hstack(lines), np.clip(np.hstack(fractions), 0., 1.)
+        order = np.lexsort((fractions, lines))
+        lines, fractions = lines[order], fractions[order]
+        # the lines cross the cells between two crossings
+        between = (lines[1:] == lines[:-1]) & (fractions[1:] > fractions[:-1])
+        cell_lines = lines[1:][between]
+        middles = points1[cell_lines] + 0.5*(fractions[1:] + fractions[:-1])[between, None]*direction[cell_lines]
+        cells = np.floor(middles).astype(int)
+        # crossing a grid point is a diagonal move, its four cells should be free
+        crossings = points1[lines] + fractions[:, None]*direction[lines]
+        at_corner = np.all(np.abs(crossings - np.round(crossings)) < 1e-9, axis=1)
+        corners = np.round(crossings[at_corner]).astype(int)
+        for shift in [[0, 0], [-1, 0], [0, -1], [-1, -1]]:
+            cells = np.vstack((cells, corners + shift))
+            cell_lines = np.r_[cell_lines, lines[at_corner]]
+        outside = ((cells[:, 0] < 0) | (cells[:, 1] < 0) |
+                   (cells[:, 0] >= self.grid.n_cells[0]) | (cells[:, 1] >= self.grid.n_cells[1]))
+        blocked = outside.copy()
+        blocked[~outside] = self.grid.occupied[cells[~outside, 0], cells[~outside, 1]]
+        return np.bincount(cell_lines, weights=blocked, minlength=len(points1)) == 0
+
+    def draw(self):
+        self.grid.draw()
+
     def plot_path(self, path):
         # plot the computed path
         posx = []
@@ -257,6 +402,523 @@ class AStarPlanner(GlobalPlanner):
         plt.plot(posx,posy)
         plt.show()
 
+class DStarLitePlanner(AStarPlanner):
+    # global planner using the D* Lite algorithm: it searches from the goal to
+    # the start and keeps its search state, such that a new call of get_path
+    # only repairs the part of the search that is affected by a moved start
+    # or by cells of which the occupancy changed
+    # based on: Koenig and Likhachev, D* Lite, AAAI 2002
+    def __init__(self, environment, n_cells, start, goal, options={}):
+        AStarPlanner.__init__(self, environment, n_cells, start, goal, options)
+        # costs are integer multiples of resolution: the keys of the search are
+        # sums of costs, with floats their rounding errors break the ordering
+        # of (almost) equal keys and the repaired search can be wrong
+        self.resolution = 1e-6*min(self.grid.cell_width, self.grid.cell_height)
+        self.step_costs = [self.to_cost(self.grid.cell_width), self.to_cost(self.grid.cell_height),
+                           self.to_cost(self.diag_cost)]
+        self.initialize_search()
+
+    def set_goal(self, goal):
+        self.goal = goal
+        self.initialize_search()
+
+    def to_cost(self, value):
+        return int(round(value/self.resolution))
+
+    def initialize_search(self):
+        self.g = {}  # cost-to-goal, missing means infinite
+        self.rhs = {tuple(self.goal): 0}  # one-step lookahead of g
+        self.open_heap = []  # binary heap of (key, position)
+        self.open_list = {}  # position: key
+        self.km = 0  # key modifier, accounts for the movement of the start
+        self.last_start = tuple(self.start)
+        self.occupied = self.grid.occupied.copy()  # occupancy used by the search
+        self.costs = self.costmap.copy()  # clearance penalties used by the search
+        self.n_expanded = 0
+        self.push(tuple(self.goal))
+
+    def heuristic(self, point1, point2):
+        # octile distance, i.e. the cost of moving without obstacles
+        dx = abs(point1[0] - point2[0])
+        dy = abs(point1[1] - point2[1])
+        width, height, diag = self.step_costs
+        return min(dx, dy)*diag + max(dx - dy, 0)*width + max(dy - dx, 0)*height
+
+    def calculate_cost(self, point1, point2):
+        if point1[0] != point2[0] and point1[1] != point2[1]:
+            cost, length = self.step_costs[2], self.diag_cost
+        elif point1[0] != point2[0]:
+            cost, length = self.step_costs[0], self.grid.cell_width
+        else:
+            cost, length = self.step_costs[1], self.grid.cell_height
+        if self.clearance_weight > 0.:
+            cost += self.to_cost(self.clearance_cost(point1, point2, length))
+        return cost
+
+    def get_neighbors(self, point):
+        if not self.grid.free(point):
+            return []
+        return [tuple(p) for p in self.grid.get_neighbors(point)]
+
+    def calculate_key(self, point):
+        cost = min(self.g.get(point, np.inf), self.rhs.get(point, np.inf))
+        return (cost + self.heuristic(self.last_start, point) + self.km, cost)
+
+    def push(self, point):
+        key = self.calculate_key(point)
+        self.open_list[point] = key
+        heapq.heappush(self.open_heap, (key, point))
+
+    def get_top_key(self):
+        # skip heap entries of nodes which were removed or got a new key afterwards
+        while self.open_heap:
+            key, point = self.open_heap[0]
+            if self.open_list.get(point) == key:
+                return key
+            heapq.heappop(self.open_heap)
+        return (np.inf, np.inf)
+
+    def update_vertex(self, point):
+        if point != tuple(self.goal):
+            self.rhs[point] = min([self.calculate_cost(point, p) + self.g.get(p, np.inf)
+                                   for p in self.get_neighbors(point)] + [np.inf])
+        self.open_list.pop(point, None)
+        if self.g.get(point, np.inf) != self.rhs.get(point, np.inf):
+            self.push(point)
+
+    def compute_shortest_path(self):
+        start = self.last_start
+        while self.open_list:
+            if (self.get_top_key() >= self.calculate_key(start) and
+               self.rhs.get(start, np.inf) == self.g.get(start, np.inf)):
+                break
+            key, point = heapq.heappop(self.open_heap)
+            del self.open_list[point]
+            self.n_expanded += 1
+            new_key = self.calculate_key(point)
+            if key < new_key:
+                self.push(point)
+            elif self.g.get(point, np.inf) > self.rhs.get(point, np.inf):
+                self.g[point] = self.rhs[point]
+                for p in self.get_neighbors(point):
+                    self.update_vertex(p)
+            else:
+                self.g[point] = np.inf
+                for p in self.get_neighbors(point) + [point]:
+                    self.update_vertex(p)
+
+    def update_occupancy(self):
+        # repair the search around the cells of which the occupancy or the
+        # clearance penalty changed, this changes the cost of all edges in
+        # the 3x3 block around a cell
+        changed = np.nonzero((self.grid.occupied != self.occupied) | (self.costmap != self.costs))
+        self.occupied = self.grid.occupied.copy()
+        self.costs = self.costmap.copy()
+        points = set()
+        for i, j in zip(*changed):
+            for x in range(i-1, i+2):
+                for y in range(j-1, j+2):
+                    if self.grid.in_bounds([x, y]):
+                        points.add((x, y))
+        for point in points:
+            self.update_vertex(point)
+
+    def get_path(self, start=None, goal=None):
+        t1 = time.time()
+        if goal is not None and self.grid.move_to_gridpoint(goal) != self.goal:
+            # the search is rooted at the goal, so start over
+            self.goal = self.grid.move_to_gridpoint(goal)
+            self.initialize_search()
+        if start is not None:
+            # only grid points are reachable
+            self.start = self.grid.move_to_gridpoint(start)
+        if tuple(self.start) != self.last_start:
+            self.km += self.heuristic(self.last_start, self.start)
+            self.last_start = tuple(self.start)
+        if np.any(self.grid.occupied != self.occupied) or np.any(self.costmap != self.costs):
+            self.update_occupancy()
+        self.compute_shortest_path()
+        if self.g.get(self.last_start, np.inf) == np.inf:
+            raise RuntimeError('There is no path from the desired start to the desired end node! ' +
+                'Consider using more grid points.')
+
+        # follow the cheapest neighbors from start to goal, the cost-to-goal
+        # decreases along the way
+        point = self.last_start
+        nodes_pos = [list(point)]
+        while point != tuple(self.goal):
+            g = self.g[point]
+            point = min(self.get_neighbors(point),
+                        key=lambda p: self.calculate_cost(point, p) + self.g.get(p, np.inf))
+            if not self.g.get(point, np.inf) < g:
+                raise RuntimeError('Inconsistent search state, the path from ' + str(nodes_pos[0]) +
+                                   ' does not lead to the goal.')
+            nodes_pos.append(list(point))
+
+        t2 = time.time()
+        print 'Elapsed time to find a global path: ', t2-t1
+
+        # convert node positions (indices) to waypoint positions (physical values)
+        path = self.convert_node_to_waypoint(nodes_pos)
+        if self.any_angle:
+            path = self.smooth_path(path)
+        return path
+
+class QuadmapPlanner(AStarPlanner):
+    # global planner using a quadmap: the grid is divided in blocks, which are
+    # only subdivided if they are partly occupied, such that the search has
+    # few large cells in open areas and small cells near obstacles
+    # n_cells is the finest resolution
+    def __init__(self, environment, n_cells, start, goal, options={}):
+        if 'clearance_weight' in options and options['clearance_weight'] > 0.:
+            raise ValueError('QuadmapPlanner does not support a clearance cost, use AStarPlanner instead.')
+        AStarPlanner.__init__(self, environment, n_cells, start, goal, options)
+        self.build_quadmap()
+
+    def build_quadmap(self):
+        occupied = self.grid.occupied
+        self.occupied = occupied.copy()  # occupancy used by the quadmap
+        # summed area table, to count the occupied cells in a block
+        n_occ = np.zeros((occupied.shape[0]+1, occupied.shape[1]+1), dtype=int)
+        n_occ[1:, 1:] = occupied.cumsum(axis=0).cumsum(axis=1)
+        self.cells = []  # free blocks [i0, j0, i1, j1], in grid indices
+        self.labels = -np.ones(occupied.shape, dtype=int)  # block of each grid cell, -1 if occupied
+        blocks = [[0, 0, occupied.shape[0], occupied.shape[1]]]
+        while blocks:
+            i0, j0, i1, j1 = blocks.pop()
+            count = n_occ[i1, j1] - n_occ[i0, j1] - n_occ[i1, j0] + n_occ[i0, j0]
+            if count == 0:
+                self.labels[i0:i1, j0:j1] = len(self.cells)
+                self.cells.append([i0, j0, i1, j1])
+            elif count < (i1-i0)*(j1-j0):
+                # partly occupied, split in four
+                im, jm = (i0+i1)//2, (j0+j1)//2
+                for block in [[i0, j0, im, jm], [im, j0, i1, jm], [i0, jm, im, j1], [im, jm, i1, j1]]:
+                    if block[0] < block[2] and block[1] < block[3]:
+                        blocks.append(block)
+        # neighboring blocks share an edge, the search moves through its middle
+        self.neighbors = [[] for cell in self.cells]
+        x0 = self.grid.position[0] - 0.5*self.grid.width
+        y0 = self.grid.position[1] - 0.5*self.grid.height
+        for labels1, labels2, horizontal in [(self.labels[:-1, :], self.labels[1:, :], True),
+                                             (self.labels[:, :-1], self.labels[:, 1:], False)]:
+            border = (labels1 != labels2) & (labels1 >= 0) & (labels2 >= 0)
+            pairs = np.unique(labels1[border]*len(self.cells) + labels2[border])
+            for a, b in zip(pairs//len(self.cells), pairs % len(self.cells)):
+                cell1, cell2 = self.cells[a], self.cells[b]
+                if horizontal:
+                    # cell2 is right of cell1
+                    middle = [x0 + cell1[2]*self.grid.cell_width,
+                              y0 + 0.5*(max(cell1[1], cell2[1]) + min(cell1[3], cell2[3]))*self.grid.cell_height]
+                else:
+                    # cell2 is above cell1
+                    middle = [x0 + 0.5*(max(cell1[0], cell2[0]) + min(cell1[2], cell2[2]))*self.grid.cell_width,
+                              y0 + cell1[3]*self.grid.cell_height]
+                self.neighbors[a].append((b, middle))
+                self.neighbors[b].append((a, middle))
+        self.centers = [[x0 + 0.5*(i0+i1)*self.grid.cell_width, y0 + 0.5*(j0+j1)*self.grid.cell_height]
+                        for i0, j0, i1, j1 in self.cells]
+
+    def update_grid(self, environment):
+        AStarPlanner.update_grid(self, environment)
+        self.build_quadmap()
+
+    def get_path(self, start=None, goal=None):
+        t1 = time.time()
+        if start is not None:
+            # only grid points are reachable
+            self.start = self.grid.move_to_gridpoint(start)
+        if goal is not None:
+            self.goal = self.grid.move_to_gridpoint(goal)
+        if np.any(self.grid.occupied != self.occupied):
+            # grid was changed
+            self.build_quadmap()
+        start, goal = self.labels[tuple(self.start)], self.labels[tuple(self.goal)]
+        if start < 0 or goal < 0:
+            raise RuntimeError('Start or goal is inside an obstacle! ' +
+                'Consider using more grid points.')
+
+        # A* over the blocks, moving between the centers of the blocks via the middle of their common edge
+        distance = lambda p1, p2: np.sqrt((p1[0]-p2[0])**2 + (p1[1]-p2[1])**2)
+        g_cost = {start: 0.}
+        parents = {start: None}
+        open_heap = [(distance(self.centers[start], self.centers[goal]), start)]
+        closed = set()
+        while open_heap:
+            f_cost, cell = heapq.heappop(open_heap)
+            if cell == goal:
+                break
+            if cell in closed:
+                continue
+            closed.add(cell)
+            for neighbor, middle in self.neighbors[cell]:
+                cost = (g_cost[cell] + distance(self.centers[cell], middle) +
+                        distance(middle, self.centers[neighbor]))
+                if neighbor not in closed and cost < g_cost.get(neighbor, np.inf):
+                    g_cost[neighbor] = cost
+                    parents[neighbor] = (cell, middle)
+                    heapq.heappush(open_heap, (cost + distance(self.centers[neighbor], self.centers[goal]), neighbor))
+        else:
+            raise RuntimeError('There is no path from the desired start to the desired end node! ' +
+                'Consider using more grid points.')
+
+        # the path goes from start to goal via the middles of the crossed edges,
+        # each part of the path stays inside one free block
+        middles = []
+        cell = goal
+        while parents[cell] is not None:
+            cell, middle = parents[cell]
+            middles.append(middle)
+        middles.reverse()
+        path = self.convert_node_to_waypoint(self.start) + middles + self.convert_node_to_waypoint(self.goal)
+        if self.any_angle:
+            path = self.smooth_path(path)
+
+        t2 = time.time()
+        print 'Elapsed time to find a global path: ', t2-t1
+
+        return path
+
+    def draw(self):
+        # draw the blocks of the quadmap
+        plt.figure()
+        x0 = self.grid.position[0] - 0.5*self.grid.width
+        y0 = self.grid.position[1] - 0.5*self.grid.height
+        # one line for all blocks, the outlines are separated by nan
+        cells = np.array(self.cells, dtype=float).reshape(-1, 4)
+        i0, j0, i1, j1 = cells.T
+        nan = np.nan*i0
+        x = x0 + np.c_[i0, i1, i1, i0, i0, nan].ravel()*self.grid.cell_width
+        y = y0 + np.c_[j0, j0, j1, j1, j0, nan].ravel()*self.grid.cell_height
+        plt.plot(x, y, 'r-')
+        plt.draw()
+
+class RoadmapPlanner(AStarPlanner):
+    # global planner using a visibility graph: its nodes are the free cells at
+    # the convex corners of the occupied cells, its edges connect the nodes
+    # which see each other and pass by the corners at both ends, other edges
+    # are not part of shortest paths. The graph only depends on the
+    # stationary obstacles, so it is computed once and, with the option
+    # roadmap_file, saved to answer the queries on the same map later on
+    def __init__(self, environment, n_cells, start, goal, options={}):
+        if 'clearance_weight' in options and options['clearance_weight'] > 0.:
+            raise ValueError('RoadmapPlanner does not support a clearance cost, use AStarPlanner instead.')
+        AStarPlanner.__init__(self, environment, n_cells, start, goal, options)
+        self.roadmap_file = options['roadmap_file'] if 'roadmap_file' in options else None
+        if self.roadmap_file is not None and not self.roadmap_file.endswith('.npz'):
+            self.roadmap_file += '.npz'
+        if self.roadmap_file is None or not self.load_roadmap(self.roadmap_file):
+            self.build_roadmap()
+            if self.roadmap_file is not None:
+                self.save_roadmap(self.roadmap_file)
+
+    def get_grid_settings(self):
+        return np.array([self.grid.width, self.grid.height, self.grid.position[0], self.grid.position[1],
+                         self.grid.n_cells[0], self.grid.n_cells[1]], dtype=float)
+
+    def get_turns(self):
+        # a free cell is a corner if its diagonal neighbor is occupied, while
+        # the cells in between are free, turns[i, j] tells if cell [i, j] is a
+        # corner with its occupied neighbor at [1, 1] or [-1, -1] (element 0),
+        # or at [1, -1] or [-1, 1] (element 1)
+        occupied = np.pad(self.occupied, 1, mode='constant')
+        n0, n1 = self.occupied.shape
+        shifted = lambda dx, dy: occupied[1+dx:n0+1+dx, 1+dy:n1+1+dy]
+        turns = np.zeros((n0, n1, 2), dtype=bool)
+        for dx in [-1, 1]:
+            for dy in [-1, 1]:
+                turns[:, :, int(dx != dy)] |= (~shifted(0, 0) & shifted(dx, dy) & ~shifted(dx, 0) & ~shifted(0, dy))
+        return turns
+
+    def is_tangent(self, turns, direction):
+        # a line through a corner in direction [dx, dy] passes by the occupied
+        # neighbor without crossing the quadrant behind it, if dx*dy <= 0 for a
+        # neighbor at [1, 1] or [-1, -1], and if dx*dy >= 0 for a neighbor at
+        # [1, -1] or [-1, 1]
+        product = direction[:, 0]*direction[:, 1]
+        return (turns[:, 0] & (product <= 0.)) | (turns[:, 1] & (product >= 0.))
+
+    def build_roadmap(self):
+        self.occupied = self.grid.occupied.copy()  # occupancy used by the roadmap
+        cells = np.argwhere(np.any(self.get_turns(), axis=2))
+        self.nodes = np.array(self.convert_node_to_waypoint(cells.tolist()) if len(cells) else np.zeros((0, 2)))
+        self.index_nodes()
+        # only check the line of sight of the edges which pass by both corners,
+        # in batches
+        edges, pairs, n_pairs = [], [[], []], 0
+        for k in range(len(self.nodes)):
+            others = np.r_[0:k, k+1:len(self.nodes)]
+            direction = cells[others] - cells[k]
+            tangent = self.is_tangent(self.turns[others], direction) & self.is_tangent(self.turns[[k]], direction)
+            others, direction = others[tangent], direction[tangent]
+            # an edge through another corner is replaced by the edges to and
+            # from that corner, so only keep the nearest corner per direction
+            steps = np.gcd(direction[:, 0], direction[:, 1])
+            units = direction//steps[:, None]
+            order = np.lexsort((steps, units[:, 1], units[:, 0]))
+            first = np.ones(len(others), dtype=bool)
+            first[1:] = np.any(units[order][1:] != units[order][:-1], axis=1)
+            nearest = others[order][first]
+            nearest = nearest[nearest > k]
+            pairs[0].append(np.ones(len(nearest), dtype=int)*k)
+            pairs[1].append(nearest)
+            n_pairs += len(nearest)
+            if n_pairs > 100000 or k == len(self.nodes)-1:
+                pairs = [np.hstack(p) for p in pairs]
+                visible = self.lines_of_sight(self.nodes[pairs[0]], self.nodes[pairs[1]])
+                edges.append(np.c_[pairs[0][visible], pairs[1][visible]])
+                pairs, n_pairs = [[], []], 0
+        self.edges = np.vstack(edges).astype(int) if edges else np.zeros((0, 2), dtype=int)
+        self.make_neighbors()
+
+    def index_nodes(self):
+        # corner directions of the nodes
+        origin = [self.grid.position[0] - 0.5*self.grid.width, self.grid.position[1] - 0.5*self.grid.height]
+        cells = np.floor((self.nodes - origin)/[self.grid.cell_width, self.grid.cell_height]).astype(int)
+        self.turns = self.get_turns()[cells[:, 0], cells[:, 1]]
+        # buckets of a few nodes, to find the nodes around a point
+        self.bucket_size = max(np.sqrt(4*self.grid.width*self.grid.height/max(len(self.nodes), 1)),
+                               self.grid.cell_width, self.grid.cell_height)
+        self.buckets = {}
+        for k, node in enumerate(self.nodes):
+            self.buckets.setdefault(self.get_bucket(node), []).append(k)
+
+    def make_neighbors(self):
+        self.neighbors = [[] for node in self.nodes]
+        for k, l in self.edges:
+            cost = np.linalg.norm(self.nodes[k] - self.nodes[l])
+            self.neighbors[k].append((l, cost))
+            self.neighbors[l].append((k, cost))
+
+    def get_bucket(self, point):
+        return (int(np.floor((point[0] - self.grid.position[0] + 0.5*self.grid.width)/self.bucket_size)),
+                int(np.floor((point[1] - self.grid.position[1] + 0.5*self.grid.height)/self.bucket_size)))
+
+    def get_ring(self, point, ring):
+        # the nodes in the buckets at distance ring (in buckets) around point
+        nodes = []
+        i, j = self.get_bucket(point)
+        for x in range(i-ring, i+ring+1):
+            for y in (range(j-ring, j+ring+1) if abs(x-i) == ring else [j-ring, j+ring]):
+                nodes.extend(self.buckets.get((x, y), []))
+        return nodes
+
+    def link(self, point, candidates):
+        candidates = np.array(candidates, dtype=int)
+        if not len(candidates):
+            return []
+        candidates = candidates[self.is_tangent(self.turns[candidates], point - self.nodes[candidates])]
+        nodes = self.nodes[candidates]
+        visible = self.lines_of_sight(nodes, np.tile(point, (len(candidates), 1)))
+        return zip(candidates[visible], np.linalg.norm(nodes[visible] - point, axis=1))
+
+    def save_roadmap(self, filename):
+        np.savez(filename, grid=self.get_grid_settings(), occupied=self.occupied,
+                 nodes=self.nodes, edges=self.edges)
+
+    def load_roadmap(self, filename):
+        # only use a saved roadmap if it was made for the same grid and obstacles
+        if not os.path.isfile(filename):
+            return False
+        data = np.load(filename)
+        try:
+            if (not np.array_equal(data['grid'], self.get_grid_settings()) or
+               not np.array_equal(data['occupied'], self.grid.occupied)):
+                return False
+            self.occupied = data['occupied']
+            self.nodes, self.edges = data['nodes'], data['edges']
+        finally:
+            data.close()
+        self.index_nodes()
+        self.make_neighbors()
+        return True
+
+    def update_grid(self, environment):
+        AStarPlanner.update_grid(self, environment)
+        if np.any(self.grid.occupied != self.occupied):
+            # only rebuild the roadmap if the obstacles changed
+            self.build_roadmap()
+            if self.roadmap_file is not None:
+                self.save_roadmap(self.roadmap_file)
+
+    def get_path(self, start=None, goal=None):
+        # the roadmap is made for the occupancy of the last update_grid
+        t1 = time.time()
+        if start is not None:
+            # only grid points are reachable
+            self.start = self.grid.move_to_gridpoint(start)
+        if goal is not None:
+            self.goal = self.grid.move_to_gridpoint(goal)
+        start = np.array(self.convert_node_to_waypoint(self.start)[0])
+        goal = np.array(self.convert_node_to_waypoint(self.goal)[0])
+
+        if self.line_of_sight(start, goal):
+            path = [start.tolist(), goal.tolist()]
+        else:
+            path = self.search_roadmap(start, goal)
+            if path is None:
+                raise RuntimeError('There is no path from the desired start to the desired end node! ' +
+                    'Consider using more grid points.')
+            # the roadmap only keeps the edges which pass by corners, this
+            # misses some shortcuts between cells
+            path = self.smooth_path(path)
+
+        t2 = time.time()
+        print 'Elapsed time to find a global path: ', t2-t1
+
+        return path
+
+    def search_roadmap(self, start, goal):
+        # A* over the roadmap, start and goal get index -1 and -2. The start is
+        # linked to the nodes it sees ring by ring of buckets around it: the
+        # heap holds the next ring with a lower bound on the cost of a path
+        # through its nodes. The goal is linked to the nodes when they are
+        # expanded. Like this, the cost of a query depends on the length of
+        # the path and not on the size of the room.
+        distance = np.linalg.norm(goal - start)
+        n_rings = int(np.ceil(max(self.grid.width, self.grid.height)/self.bucket_size)) + 2
+        # a node in ring r is at least (r-1)*bucket_size away from start
+        bound = lambda ring: max(distance, 2*(ring-1)*self.bucket_size - distance)
+        position = lambda k: start if k == -1 else (goal if k == -2 else self.nodes[k])
+        g_cost = {-1: 0.}
+        parents = {-1: None}
+        open_heap = [(bound(0), 0, 0)]  # (f_cost, 0, ring) or (f_cost, 1, node)
+        closed = set()
+        while open_heap:
+            f_cost, is_node, node = heapq.heappop(open_heap)
+            if not is_node:
+                # link start to the nodes in this ring
+                links = self.link(start, self.get_ring(start, node))
+                if node+1 < n_rings:
+                    heapq.heappush(open_heap, (bound(node+1), 0, node+1))
+                parent = -1
+            elif node == -2:
+                break
+            elif node in closed:
+                continue
+            else:
+                closed.add(node)
+                links = self.neighbors[node]
+                direction = np.array([goal - self.nodes[node]])
+                if self.is_tangent(self.turns[[node]], direction)[0] and self.line_of_sight(self.nodes[node], goal):
+                    links = links + [(-2, np.linalg.norm(direction))]
+                parent = node
+            for neighbor, cost in links:
+                cost += g_cost[parent]
+                if neighbor not in closed and cost < g_cost.get(neighbor, np.inf):
+                    g_cost[neighbor] = cost
+                    parents[neighbor] = parent
+                    heapq.heappush(open_heap, (cost + np.linalg.norm(goal - position(neighbor)), 1, neighbor))
+        else:
+            return None
+        path = []
+        node = -2
+        while node is not None:
+            path.append(position(node).tolist())
+            node = parents[node]
+        path.reverse()
+        return path
+
 class Node(object):
     def __init__(self, position, parent=None):
         self.pos = position  # index of the point in the grid
@@ -283,11 +945,12 @@ class Node(object):
 class Grid(object):
     # based on: http://www.redblobgames.com/pathfinding/a-star/implementation.html
     def __init__(self, width, height, position, n_cells, offset=[0.,0.]):
-        self.occupied = []  # initialize grid as empty
         self.width = width
         self.height = height
         self.position = position
         self.n_cells = n_cells  # number of cells in horizontal and vertical direction
+        self.occupied = np.zeros(self.n_cells, dtype=bool)  # initialize grid as empty
+        self.clearance = None  # distance to the closest occupied cell, see update_clearance()
         self.cell_width = self.width*1./self.n_cells[0]
         self.cell_height = self.height*1./self.n_cells[1]
 
@@ -305,15 +968,12 @@ class Grid(object):
         for point in points:
             if self.in_bounds(point):
                 # only add points which are in the bounds
-                self.occupied.append(point)
+                self.occupied[point[0], point[1]] = True
 
     def free(self, point):
         # check if a gridpoint is free
         # i.e.: not occupied and in bounds
-        free = False
-        if ((not point in self.occupied) and (self.in_bounds(point))):
-           free = True
-        return free
+        return self.in_bounds(point) and not self.occupied[point[0], point[1]]
 
     def is_accessible(self, point1, point2):
         # Check if you can reach point2 from point1. Diagonal movement along
@@ -345,7 +1005,7 @@ class Grid(object):
                     accessible = True
             # diagonal down left
             elif (point1[0] - 1 == point2[0] and point1[1] - 1 == point2[1]):
-                if (self.free([point1[0], point1[1] - self.cell_height]) and self.free([point1[0] - 1,point1[1]])):
+                if (self.free([point1[0], point1[1] - 1]) and self.free([point1[0] - 1,point1[1]])):
                     accessible = True
 
         return accessible
@@ -373,7 +1033,7 @@ class Grid(object):
             moved_point[0] = min(moved_point[0], self.n_cells[0]-1)
             moved_point[1] = min(moved_point[1], self.n_cells[1]-1)
 
-        if moved_point in self.occupied:
+        if self.occupied[moved_point[0], moved_point[1]]:
             # closest grid point is occupied, check all neighbours of this point
             points_to_check = [[moved_point[0]+1, moved_point[1]],
                                [moved_point[0]-1, moved_point[1]],
@@ -402,6 +1062,29 @@ class Grid(object):
         # convert position of moved_point to indices
         return moved_point
 
+    def get_cell(self, point):
+        # indices of the cell which contains a certain point [m]
+        i = int(np.floor((point[0] - self.position[0] + 0.5*self.width)/self.cell_width))
+        j = int(np.floor((point[1] - self.position[1] + 0.5*self.height)/self.cell_height))
+        return [min(max(i, 0), self.n_cells[0]-1), min(max(j, 0), self.n_cells[1]-1)]
+
+    def update_clearance(self):
+        # distance transform of the occupancy: distance from each cell center
+        # to the center of the closest occupied cell, the cells around the
+        # grid count as occupied, call this after changing self.occupied
+        from scipy.ndimage import distance_transform_edt
+        occupied = np.pad(self.occupied, 1, mode='constant', constant_values=True)
+        self.clearance = distance_transform_edt(~occupied, sampling=[self.cell_width, self.cell_height])[1:-1, 1:-1]
+
+    def get_clearance(self, point):
+        # lower bound on the distance from a point [m] to the closest blown up
+        # stationary obstacle or border of the grid: the point and the obstacle
+        # both lie within half a cell diagonal of their cell center
+        if self.clearance is None:
+            self.update_clearance()
+        i, j = self.get_cell(point)
+        return max(self.clearance[i, j] - np.sqrt(self.cell_width**2 + self.cell_height**2), 0.)
+
     def distance_between_cells(self, cell1, cell2):
         if cell1 == cell2:
             return 0
@@ -419,106 +1102,82 @@ class Grid(object):
                    [x, y+1],[x, y-1],
                    [x-1, y+1], [x+1, y+1],
                    [x-1, y-1], [x+1, y-1]]
-        results = filter(self.in_bounds, results)
-        results = filter(self.free, results)
-        results = filter(lambda x: self.is_accessible(point, x), results)
-        return results
+        free = [self.free(p) for p in results]
+        # diagonal movement along an edge of an occupied point is not allowed,
+        # see is_accessible()
+        accessible = free[:4] + [free[4] and free[2] and free[1], free[5] and free[2] and free[0],
+                                 free[6] and free[3] and free[1], free[7] and free[3] and free[0]]
+        return [p for p, a in zip(results, accessible) if a]
 
     def get_occupied_cells(self, environment):
-        # blank out the grid points which are occupied by a certain obstacle
-        occupied_cells = []
-        cells = []
-        centers_x = np.arange(self.position[0]-self.width*0.5 + 0.5*self.cell_width,
-                              self.position[0]+self.width*0.5 + 0.5*self.cell_width,self.cell_width)
-        centers_y = np.arange(self.position[1]-self.height*0.5 + 0.5*self.cell_height,
-                              self.position[1]+self.height*0.5 + 0.5*self.cell_height, self.cell_height)
-        i, j = 0, 0
-        for x in centers_x:
-            for y in centers_y:
-                cells.append({'pos': [x,y], 'index': [i, j]})
-                j += 1
-            i += 1
-            j = 0
+        # indices of the grid points which are occupied by a certain obstacle
+        return [[int(i), int(j)] for i, j in zip(*np.nonzero(self.get_occupancy(environment)))]
 
+    def get_occupancy(self, environment):
+        # boolean array which indicates the cells that are (partly) covered by
+        # a stationary obstacle, blown up by offset
+        occupied = np.zeros(self.n_cells, dtype=bool)
         for obstacle in environment.obstacles:
             # only look at stationary obstacles
             if ((not 'trajectories' in obstacle.simulation) or (not 'velocity' in obstacle.simulation['trajectories'])
                or (all(vel == [0.]*obstacle.n_dim for vel in obstacle.simulation['trajectories']['velocity']['values']))):
-                pos = obstacle.signals['position'][:,-1]
-                if isinstance(obstacle.shape, (Rectangle, Square)):
-                    vertices = []
-                    vertex_x = obstacle.shape.vertices[0]
-                    vertex_y = obstacle.shape.vertices[1]
-                    for k in range(len(vertex_x)):
-                        if vertex_x[k] == min(vertex_x):
-                            # take into account offset to avoid waypoints which are so close
-                            # to obstacles that they are not reachable
-                            v_x = vertex_x[k] + pos[0] - self.offset[0]
-                        else:
-                            # take into account offset to avoid waypoints which are so close
-                            # to obstacles that they are not reachable
-                            v_x = vertex_x[k] + pos[0] + self.offset[0]
-                        if vertex_y[k] == min(vertex_y):
-                            v_y = vertex_y[k] + pos[1] - self.offset[1]
-                        else:
-                            v_y = vertex_y[k] + pos[1] + self.offset[1]
-                        vertices.append([v_x, v_y])
-                if isinstance(obstacle.shape, Circle):
-                    r = obstacle.shape.radius
-                    # approximate circle by a square and add these vertices
-                    # take into account offset, e.g. to avoid waypoints which
-                    # are closer to obstacles than the vehicle can reach
-                    vertices = [[pos[0] + r + self.offset[0], pos[1] + r + self.offset[1]],
-                                [pos[0] + r + self.offset[0], pos[1] - r - self.offset[1]],
-                                [pos[0] - r - self.offset[0], pos[1] + r + self.offset[1]],
-                                [pos[0] - r - self.offset[0], pos[1] - r - self.offset[1]]]
-                vertices = np.array(vertices)
-                vertices = np.round(vertices, 4)  # rounding off vertex positions, for easier comparison below
-
-                occ_cells = []
-                for cell in cells:
-                    blocked = False  # boolean to indicate if cell is blocked
-                    # calculate cell vertices
-                    cell_vertices = []
-                    cell_vertices.append([cell['pos'][0] - 0.5*self.cell_width, cell['pos'][1] - 0.5*self.cell_height])
-                    cell_vertices.append([cell['pos'][0] + 0.5*self.cell_width, cell['pos'][1] - 0.5*self.cell_height])
-                    cell_vertices.append([cell['pos'][0] - 0.5*self.cell_width, cell['pos'][1] + 0.5*self.cell_height])
-                    cell_vertices.append([cell['pos'][0] + 0.5*self.cell_width, cell['pos'][1] + 0.5*self.cell_height])
-                    cell_vertices = np.array(cell_vertices)
-                    # cell center is inside the convex hull of the vertices of an obstacle
-                    if (min(vertices[:,0]) < cell['pos'][0] < max(vertices[:,0]) and
-                        min(vertices[:,1]) < cell['pos'][1] < max(vertices[:,1])):
-                        occ_cells.append(cell)
-                    else:
-                        # check if any of the cell vertices are inside the convex hull of the obstacle vertices
-                        for cell_v in cell_vertices:
-                            if (min(vertices[:,0]) < cell_v[0] < max(vertices[:,0]) and
-                                min(vertices[:,1]) < cell_v[1] < max(vertices[:,1])):
-                                    # avoid adding the same cell multiple times
-                                    if cell not in occ_cells:
-                                        occ_cells.append(cell)
-                                    blocked = True  # cell is blocked, go to next cell
-                                    break
-                        # check if any of the obstacle vertices are inside the convex hull of the cell vertices
-                        if not blocked:  # cell was not detected as blocked yet
-                            for v in vertices:
-                                if (min(cell_vertices[:,0]) < v[0] < max(cell_vertices[:,0]) and
-                                    min(cell_vertices[:,1]) < v[1] < max(cell_vertices[:,1])):
-                                        # avoid adding the same cell multiple times
-                                        if cell not in occ_cells:
-                                            occ_cells.append(cell)
-                                        break  # one obstacle vertex is inside the cell, go to next cell
-                # if cell is found to be occupied, remove it, i.e. don't check again for next obstacle
-                for cell in occ_cells:
-                    cells.remove(cell)
-                # add cells which are occupied by the obstacle to the collection of occupied cells
-                occupied_cells.extend(occ_cells)
-
-        # only return the indices of the occupied cells
-        occ_cells = []
-        for cell in occupied_cells:
-            occ_cells.append(cell['index'])
-        return occ_cells
+                orientation = obstacle.signals['orientation'][:,-1] if 'orientation' in obstacle.signals else 0.
+                self.rasterize(obstacle.shape, obstacle.signals['position'][:2,-1], orientation, occupied)
+        return occupied
+
+    def rasterize(self, shape, position, orientation=0., occupied=None):
+        # mark the cells which overlap with shape, placed at position. Blowing
+        # up the shape with offset (a dilation) is the same as blowing up the
+        # cells, so each cell is tested as a box of half size
+        # cell size/2 + offset around its center
+        if occupied is None:
+            occupied = np.zeros(self.n_cells, dtype=bool)
+        tol = 1e-4  # shapes which only touch a cell don't occupy it
+        if isinstance(shape, Circle):
+            vertices = None
+            r = shape.radius
+            [[xmin, xmax], [ymin, ymax]] = [[position[0]-r, position[0]+r], [position[1]-r, position[1]+r]]
+        else:
+            if isinstance(shape, Polyhedron):
+                vertices = shape.rotate(orientation, shape.vertices)
+            else:
+                # e.g. a Ring, use its bounding box
+                [[xmin, xmax], [ymin, ymax]] = shape.get_canvas_limits()
+                vertices = np.array([[xmin, xmax, xmax, xmin], [ymin, ymin, ymax, ymax]])
+            vertices = vertices + np.c_[position]
+            [[xmin, xmax], [ymin, ymax]] = [[min(vertices[0]), max(vertices[0])],
+                                            [min(vertices[1]), max(vertices[1])]]
+        # only look at the cells which overlap with the bounding box of the blown up shape
+        x0 = self.position[0] - 0.5*self.width
+        y0 = self.position[1] - 0.5*self.height
+        i0 = max(int(np.floor((xmin - self.offset[0] - x0)/self.cell_width)), 0)
+        i1 = min(int(np.ceil((xmax + self.offset[0] - x0)/self.cell_width)), self.n_cells[0])
+        j0 = max(int(np.floor((ymin - self.offset[1] - y0)/self.cell_height)), 0)
+        j1 = min(int(np.ceil((ymax + self.offset[1] - y0)/self.cell_height)), self.n_cells[1])
+        if i0 >= i1 or j0 >= j1:
+            return occupied
+        centers_x = (x0 + (np.arange(i0, i1) + 0.5)*self.cell_width)[:, None]
+        centers_y = (y0 + (np.arange(j0, j1) + 0.5)*self.cell_height)[None, :]
+        half_w = 0.5*self.cell_width + self.offset[0]
+        half_h = 0.5*self.cell_height + self.offset[1]
+        if vertices is None:
+            # distance from circle center to the cells
+            dx = np.maximum(np.abs(centers_x - position[0]) - half_w, 0.)
+            dy = np.maximum(np.abs(centers_y - position[1]) - half_h, 0.)
+            overlap = dx**2 + dy**2 < (r - tol)**2
+        else:
+            # separating axis test of convex shape and cells: axes are the
+            # grid directions and the normals of the shape edges
+            edges = np.roll(vertices, -1, axis=1) - vertices
+            axes = [[1., 0.], [0., 1.]] + [[-e[1], e[0]]/np.linalg.norm(e) for e in edges.T if np.linalg.norm(e) > 0.]
+            overlap = np.ones((i1-i0, j1-j0), dtype=bool)
+            for ax in axes:
+                proj = ax[0]*vertices[0] + ax[1]*vertices[1]
+                center = ax[0]*centers_x + ax[1]*centers_y
+                half = half_w*abs(ax[0]) + half_h*abs(ax[1])
+                overlap &= (center - half < max(proj) - tol) & (center + half > min(proj) + tol)
+        occupied[i0:i1, j0:j1] |= overlap
+        return occupied
 
     def draw(self):
         # draw the grid
@@ -531,7 +1190,7 @@ class Grid(object):
         i, j = 0, 0
         for x in centers_x:
             for y in centers_y:
-                if [i,j] not in self.occupied:
+                if not (self.in_bounds([i,j]) and self.occupied[i,j]):
                     plt.plot(x,y,'ro')
                 j += 1
             i += 1
@@ -196,11 +196,8 @@ class MultiFrameProblem(Problem):
         if horizon_time - rel_current_time < simulation_time:
             simulation_time = horizon_time - rel_current_time
         self.compute_partial_objective(current_time+simulation_time-self.start_time)
-        for vehicle in self.vehicles:
-            vehicle.simulate(simulation_time, sample_time)
-        self.environment.simulate(simulation_time, sample_time)
-        self.fleet.update_plots()
-        self.update_plots()
+        self.fleet.simulate(simulation_time, sample_time, self.vehicles)
+        self.finish_simulation(simulation_time, sample_time)
 
     def stop_criterium(self, current_time, update_time):
         T_tot = 0
@@ -20,7 +20,6 @@
 from problem import Problem
 from ..basics.spline_extra import definite_integral
 from ..basics.spline_extra import shiftoverknot_T, shift_spline, evalspline
-from ..export.export_p2p import ExportP2P
 from casadi import inf
 import numpy as np
 
@@ -120,6 +119,7 @@ class Point2pointProblem(Problem):
         options = options or {}
         if not hasattr(self, 'father'):
             self.init()
+        from ..export.export_p2p import ExportP2P
         ExportP2P(self, options)
 
 
@@ -232,7 +232,7 @@ class FixedTPoint2point(Point2pointProblem):
     # Simulation related functions
     # ========================================================================
 
-    def simulate(self, current_time, simulation_time, sample_time):
+    def simulate(self, current_time, simulation_time, sample_time, batch=None):
         horizon_time = self.options['horizon_time']
         if self.init_time is None:
             rel_current_time = np.round(current_time-self.start_time, 6) % self.knot_time
@@ -241,7 +241,7 @@ class FixedTPoint2point(Point2pointProblem):
         if horizon_time - rel_current_time < simulation_time:
             simulation_time = horizon_time - rel_current_time
         self.compute_partial_objective(current_time, simulation_time)
-        Problem.simulate(self, current_time, simulation_time, sample_time)
+        Problem.simulate(self, current_time, simulation_time, sample_time, batch)
 
     def compute_partial_objective(self, current_time, update_time):
         rel_current_time = np.round(current_time-self.start_time, 6) % self.knot_time
@@ -330,7 +330,7 @@ class FreeTPoint2point(Point2pointProblem):
     # Simulation related functions
     # ========================================================================
 
-    def simulate(self, current_time, simulation_time, sample_time):
+    def simulate(self, current_time, simulation_time, sample_time, batch=None):
         horizon_time = self.father.get_variables(self, 'T')[0][0]
         if self.init_time is None:
             rel_current_time = 0.0
@@ -343,7 +343,7 @@ class FreeTPoint2point(Point2pointProblem):
         if horizon_time - rel_current_time < simulation_time:
             simulation_time = horizon_time - rel_current_time
         self.compute_partial_objective(current_time+simulation_time-self.start_time)
-        Problem.simulate(self, current_time, simulation_time, sample_time)
+        Problem.simulate(self, current_time, simulation_time, sample_time, batch)
 
     def stop_criterium(self, current_time, update_time):
         T = self.father.get_variables(self, 'T')[0][0]
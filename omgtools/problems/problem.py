@@ -37,13 +37,17 @@ class Problem(OptiChild, PlotLayer):
         self.set_options(options)
         self.iteration = 0
         self.update_times = []
+        self.solve_status = []
+        self.constraint_violations = []
+        self.delay_time = 0.
 
         # first add children and construct father, this allows making a
         # difference between the simulated and the processed vehicles,
         # e.g. when passing on a trailer + leading vehicle to problem, but
         # only the trailer to the simulator
         children = [vehicle for vehicle in self.vehicles]
-        children += [obstacle for obstacle in self.environment.obstacles]
+        # with obstacle slots, the obstacles enter the problem via their slot
+        children += [obstacle for obstacle in (self.environment.slots or self.environment.obstacles)]
         children += [self, self.environment]
         self.father = OptiFather(children)
 
@@ -60,6 +64,9 @@ class Problem(OptiChild, PlotLayer):
                          'ipopt.fixed_variable_treatment':'make_constraint'}
         self.options['solver_options'] = {'ipopt': ipopt_options}
         self.options['codegen'] = {'build': None, 'flags': '-O0'}
+        # stop solving when the update time is over and use the best feasible
+        # iterate, or the previous solution when there is none
+        self.options['anytime'] = False
 
     def set_options(self, options):
         if 'solver_options' in options:
@@ -82,10 +89,11 @@ class Problem(OptiChild, PlotLayer):
         for vehicle in self.vehicles:
             vehicle.init()
 
-    def init(self):
+    def init(self, problem=None):
+        # problem: solver of a structurally identical problem, to skip its build
         self.father.reset()
         self.construct()
-        self.problem, buildtime = self.father.construct_problem(self.options)
+        self.problem, buildtime = self.father.construct_problem(self.options, problem=problem)
         self.father.init_transformations(self.init_primal_transform,
                                          self.init_dual_transform)
         return buildtime
@@ -108,17 +116,36 @@ class Problem(OptiChild, PlotLayer):
         dual_var = self.father.get_dual_variables()
         par = self.father.set_parameters(current_time)
         lb, ub = self.father.update_bounds(current_time)
+        callback = getattr(self.problem, 'anytime', None)
         # solve!
         t0 = time.time()
+        if callback is not None:
+            budget = self.get_time_budget(current_time, update_time)
+            solver_options = self.options['solver_options'][self.options['solver']]
+            tol = solver_options.get('ipopt.constr_viol_tol', 1e-4)
+            callback.start(None if budget is None else t0+budget,
+                           np.array(lb.cat).ravel(), np.array(ub.cat).ravel(), tol)
         result = self.problem(x0=var, p=par, lbg=lb, ubg=ub)
         # result = self.problem(x0=var, lam_g0= dual_var, p=par, lbg=lb, ubg=ub)
         t1 = time.time()
         t_upd = t1-t0
+        stats = self.problem.stats()
+        if callback is not None and stats['return_status'] != 'Solve_Succeeded':
+            if callback.best is not None:
+                print 'Solver stopped, using best feasible iterate'
+                result = callback.best
+            elif callback.initial is not None:
+                # keep the previous solution, shifted by init_step
+                print 'Solver stopped without feasible iterate, using previous solution'
+                result = {'x': var, 'g': callback.initial['g'], 'lam_g': dual_var}
         self.father.set_variables(result['x'])
         self.father.set_dual_variables(result['lam_g'])
-        stats = self.problem.stats()
+        self.solve_status.append(stats['return_status'])
+        con = np.array(result['g']).ravel()
+        violation = np.r_[0., np.array(lb.cat).ravel()-con, con-np.array(ub.cat).ravel()]
+        self.constraint_violations.append(np.max(violation))
         if stats['return_status'] != 'Solve_Succeeded':
-            if stats['return_status'] == 'Maximum_CpuTime_Exceeded':
+            if stats['return_status'] == 'Maximum_CpuTime_Exceeded' and callback is None:
                 if current_time != 0.0:  # first iteration can be slow, neglect time here
                     print 'Maximum solving time exceeded, resetting initial guess'
                     self.reset_init_guess()
@@ -159,9 +186,19 @@ class Problem(OptiChild, PlotLayer):
                 dinputs = [dinputs]
         if current_time == self.start_time:
             enforce_states = True
+        # the solution is needed sooner when this update is late
+        self.delay_time = delay*sample_time
         for k, vehicle in enumerate(self.vehicles):
             vehicle.predict(current_time, predict_time, sample_time, states[k], inputs[k], dinputs[k], delay, enforce_states, enforce_inputs)
 
+    def get_time_budget(self, current_time, update_time):
+        # time available to solve in anytime mode, None is unlimited
+        if not hasattr(self.vehicles[0], 'trajectories') or not update_time:
+            # the motion did not start yet or there is no update time,
+            # e.g. when planning segments offline
+            return None
+        return max(update_time - self.delay_time, 0.)
+
     def reset_init_guess(self, init_guess=None):
             if init_guess is None:  # no user provided initial guess
                 init_guess = []
@@ -184,9 +221,19 @@ class Problem(OptiChild, PlotLayer):
     # Simulation related functions
     # ========================================================================
 
-    def simulate(self, current_time, simulation_time, sample_time):
-        for vehicle in self.vehicles:
-            vehicle.simulate(simulation_time, sample_time)
+    def simulate(self, current_time, simulation_time, sample_time, batch=None):
+        # batch: list which collects the problems of which the vehicles are
+        # simulated together instead, such that the vehicles of several
+        # problems are simulated at once. The collector calls
+        # finish_simulation() once they are simulated.
+        if batch is None:
+            self.fleet.simulate(simulation_time, sample_time, self.vehicles)
+            self.finish_simulation(simulation_time, sample_time)
+        else:
+            batch.append((self, simulation_time))
+
+    def finish_simulation(self, simulation_time, sample_time):
+        # rest of the simulation step, after the vehicles are simulated
         self.environment.simulate(simulation_time, sample_time)
         self.fleet.update_plots()
         self.update_plots()
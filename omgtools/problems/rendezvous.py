@@ -19,7 +19,6 @@
 
 from admm import ADMMProblem
 from point2point import FreeEndPoint2point
-from ..export.export_rendezvous import ExportRendezVous
 import numpy as np
 
 
@@ -86,4 +85,5 @@ class RendezVous(ADMMProblem):
         options = options or {}
         if not hasattr(self, 'father'):
             self.init()
+        from ..export.export_rendezvous import ExportRendezVous
         ExportRendezVous(self, options)
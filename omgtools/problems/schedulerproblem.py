@@ -26,6 +26,8 @@ from ..environment.frame import ShiftFrame, CorridorFrame
 from ..basics.shape import Rectangle, Circle
 from ..basics.spline import BSplineBasis
 from ..basics.spline_extra import concat_splines
+from ..basics.childstates import ChildStates
+from ..execution.history import History
 
 from scipy.interpolate import interp1d
 import scipy.linalg as la
@@ -76,6 +78,20 @@ class SchedulerProblem(Problem):
 
         if (self.n_frames > 1 and not self.problem_options['freeT']):
             raise ValueError('Fixed time problems are only supported for n_frames = 1')
+        # reuse solvers of local problems with the same structure
+        self.reuse_problems = options['reuse_problems'] if 'reuse_problems' in options else True
+        self._solvers = {}
+        # construct the next local problem while the control loop is idle, see build_next_problem()
+        self.prebuild = options['prebuild'] if 'prebuild' in options else False
+        self._next_frames = None
+        self._next_problem = None
+        # obstacle slots: local problems with a fixed number of places for obstacles,
+        # such that appearing or disappearing obstacles don't require a new problem
+        self.n_slots = options['n_slots'] if 'n_slots' in options else 0
+        self.slot_checkpoints = options['slot_checkpoints'] if 'slot_checkpoints' in options else 4
+        # update the grid of the global planner with the environment before each new global path,
+        # e.g. when obstacles are added or removed, a DStarLitePlanner only repairs its search
+        self.update_grid = options['update_grid'] if 'update_grid' in options else False
         self._n_frames = self.n_frames  # save original value
         self.frame_type = options['frame_type'] if 'frame_type' in options else 'shift'
         # set frame size for frame_type shift
@@ -88,6 +104,10 @@ class SchedulerProblem(Problem):
             # scale up frame with small steps or not
             self.scale_up_fine = options['scale_up_fine'] if 'scale_up_fine' in options else True
             self.l_shape = options['l_shape'] if 'l_shape' in options else False
+            # let frames end halfway long segments of the global path, by default
+            # only for any-angle paths, which consist of a few long segments
+            if 'split_segments' not in options:
+                self.options['split_segments'] = getattr(self.global_planner, 'any_angle', False)
         # check if vehicle size is larger than the cell size
         n_cells = self.global_planner.grid.n_cells
         if (size_to_check >= (min(environment.room[0]['shape'].width/float(n_cells[0]), \
@@ -109,7 +129,7 @@ class SchedulerProblem(Problem):
 
         self.global_path = self.global_planner.get_path()
         # plot grid and global path
-        self.global_planner.grid.draw()
+        self.global_planner.draw()
         self.global_planner.plot_path(self.global_path)
         # append goal state to waypoints of global path,
         # since desired goal is not necessarily a waypoint
@@ -132,6 +152,8 @@ class SchedulerProblem(Problem):
         self.local_problem = self.generate_problem()
         # pass on initial guess
         self.local_problem.reset_init_guess(init_guess)
+        # predict the frames for the next problem
+        self.prebuild_problem()
 
     def solve(self, current_time, update_time):
         # solve the local problem with a receding horizon,
@@ -158,10 +180,15 @@ class SchedulerProblem(Problem):
             else:
                 self.update_frames()
 
-            # transform frames into local_problem and simulate
-            self.local_problem = self.generate_problem()
+            # transform frames into local_problem and simulate,
+            # preferably using the problem that was constructed beforehand
+            self.local_problem = self.get_prebuilt_problem()
+            if self.local_problem is None:
+                self.local_problem = self.generate_problem()
             # update_frames() updates self.motion_times and self.init_guess
             self.local_problem.reset_init_guess(self.init_guess)
+            # predict the frames for the next problem
+            self.prebuild_problem()
         else:
             # update remaining motion time
             if self.problem_options['freeT']:
@@ -187,7 +214,12 @@ class SchedulerProblem(Problem):
                     frame.moving_obstacles = moving_obs_in_frame
                 else:
                     new_problem = False
-            if new_problem:
+            if new_problem and self.n_slots:
+                # the obstacles are parameters of the problem, so only redistribute them over the slots
+                rooms, obstacles = self.get_rooms(self.frames)
+                for room, room_obstacles in zip(self.local_problem.environment.room, obstacles):
+                    self.local_problem.environment.fill_room(room, room_obstacles)
+            elif new_problem:
                 # new moving obstacle in one of the frames or obstacle disappeared from frame
                 # np.array converts DM to array
                 # save previous solution
@@ -201,6 +233,7 @@ class SchedulerProblem(Problem):
                 self.local_problem.reset_init_guess(init_guess)
 
         # solve local problem
+        self.local_problem.delay_time = self.delay_time
         self.local_problem.solve(current_time, update_time)
 
         # save solving time
@@ -218,23 +251,25 @@ class SchedulerProblem(Problem):
         # save global path and frame border
         # store trajectories
         if not hasattr(self, 'frame_storage'):
-            self.frame_storage = []
-            self.global_path_storage = []
+            self.frame_storage = History()
+            self.global_path_storage = History()
         if simulation_time == np.inf:
             # using simulator.run_once()
             simulation_time = sum(self.motion_times)
         repeat = int(simulation_time/sample_time)
+        end_time = current_time + repeat*sample_time
         # copy frames, to avoid problems when removing elements from self.frames
         frames_to_save = self.frames[:]
-        for k in range(repeat):
-            self._add_to_memory(self.frame_storage, frames_to_save)
-        self._add_to_memory(self.global_path_storage, self.global_path, repeat)
+        self._add_to_memory(self.frame_storage, frames_to_save, repeat, current_time, end_time)
+        self._add_to_memory(self.global_path_storage, self.global_path, repeat, current_time, end_time)
 
         # simulate the multiframe problem
         Problem.simulate(self, current_time, simulation_time, sample_time)
+        # the control loop is idle until the next update
+        self.build_next_problem()
 
-    def _add_to_memory(self, memory, data_to_add, repeat=1):
-        memory.extend([data_to_add for k in range(repeat)])
+    def _add_to_memory(self, memory, data_to_add, repeat=1, start_time=None, end_time=None):
+        memory.append(data_to_add, repeat, start_time, end_time)
 
     def stop_criterium(self, current_time, update_time):
         # check if the current frame is the last one
@@ -344,14 +379,7 @@ class SchedulerProblem(Problem):
                 # there were no frames yet, so compute self.n_frames, starting from current state
                 # remove orientation from state (if using e.g. differential drive)
                 start_pos = self.curr_state[:2]
-            if self.frame_type == 'shift':
-                frame = ShiftFrame(self.environment, start_pos, self.frame_size, self.move_limit,
-                                   self.global_path, self.veh_size, self.margin, self.options)
-            elif self.frame_type == 'corridor':
-                frame = CorridorFrame(self.environment, start_pos, self.global_path,
-                                      self.veh_size, self.margin, self.options)
-            else:
-                raise RuntimeError('Invalid frame type: ', self.frame_type)
+            frame = self.create_frame(start_pos, self.global_path)
             # append new frame to the frame list
             self.frames.append(frame)
 
@@ -380,6 +408,17 @@ class SchedulerProblem(Problem):
         if self.options['verbose'] >= 2:
             print 'elapsed time while creating new ' + self.frame_type + ' frame: ', end_time-start_time
 
+    def create_frame(self, start_pos, global_path):
+        if self.frame_type == 'shift':
+            frame = ShiftFrame(self.environment, start_pos, self.frame_size, self.move_limit,
+                               global_path, self.veh_size, self.margin, self.options)
+        elif self.frame_type == 'corridor':
+            frame = CorridorFrame(self.environment, start_pos, global_path,
+                                  self.veh_size, self.margin, self.options)
+        else:
+            raise RuntimeError('Invalid frame type: ', self.frame_type)
+        return frame
+
     def create_next_frame(self, frame=None):
         # only used if self.n_frames = 1
 
@@ -435,6 +474,8 @@ class SchedulerProblem(Problem):
 
         start_time = time.time()
 
+        if self.update_grid:
+            self.global_planner.update_grid(self.environment)
         self.global_path = self.global_planner.get_path(start=self.curr_state, goal=self.goal_state)
         self.global_path.append(self.goal_state[:2])  # append goal state to path, remove orientation info
 
@@ -697,19 +738,35 @@ class SchedulerProblem(Problem):
 
     def generate_problem(self):
         # transform frames into a multiframe problem
+        rooms, obstacles = self.get_rooms(self.frames)
+        problem = self.build_problem(rooms, obstacles, self.vehicles)
+        # reset the current_time, to ensure that predict uses the provided
+        # last input of previous problem and vehicle velocity is kept from one frame to another
+        problem.initialize(current_time=0.)
+        return problem
 
-        room = []
-        for k in range(self.n_frames):
+    def get_rooms(self, frames, motion_times=None):
+        # rooms and obstacles of the local problem for the given frames
+        rooms, obstacles = [], []
+        for k, frame in enumerate(frames):
             new_room = {}
-            new_room['shape'] = self.frames[k].border['shape']
-            new_room['position'] = self.frames[k].border['position']
+            new_room['shape'] = frame.border['shape']
+            new_room['position'] = frame.border['position']
             new_room['draw'] = True
-            room.append(new_room)
-        environment = Environment(room=room)
+            # room limits become parameters, which allows reusing the problem for other frames
+            new_room['parametric'] = self.reuse_problems
+            rooms.append(new_room)
+            if motion_times is None:
+                moving_obstacles = frame.moving_obstacles
+            else:
+                moving_obstacles = frame.get_moving_obstacles(motion_times[k])
+            obstacles.append(frame.stationary_obstacles+moving_obstacles)
+        return rooms, obstacles
 
-        for k in range(self.n_frames):
-            obstacles = self.frames[k].stationary_obstacles+self.frames[k].moving_obstacles
-            environment.fill_room(room[k], obstacles)
+    def build_problem(self, rooms, obstacles, vehicles):
+        environment = Environment(room=rooms, n_slots=self.n_slots, slot_checkpoints=self.slot_checkpoints)
+        for room, room_obstacles in zip(rooms, obstacles):
+            environment.fill_room(room, room_obstacles)
 
         # create problem
         problem_options = {}
@@ -717,16 +774,110 @@ class SchedulerProblem(Problem):
             problem_options[key] = value
         if not self.problem_options['freeT']:
             # fixedT problem, only possible with Point2point problem
-            problem = Point2point(self.vehicles, environment, freeT=self.problem_options['freeT'], options=problem_options)
+            problem = Point2point(vehicles, environment, freeT=self.problem_options['freeT'], options=problem_options)
         else:
-            problem = MultiFrameProblem(self.vehicles, environment, n_frames=self.n_frames)
-        problem.set_options({'solver_options': self.options['solver_options']})
-        problem.init()
-        # reset the current_time, to ensure that predict uses the provided
-        # last input of previous problem and vehicle velocity is kept from one frame to another
+            problem = MultiFrameProblem(vehicles, environment, n_frames=len(rooms))
+        problem.set_options({'solver_options': self.options['solver_options'],
+                             'anytime': self.options['anytime']})
+        if self.reuse_problems:
+            # a problem with the same structure only differs in its parameters
+            # (room limits, obstacle states and shapes, initial and terminal
+            # conditions), so its solver can be reused
+            key = self.get_problem_key(environment)
+            if key in self._solvers:
+                problem.init(problem=self._solvers[key])
+            else:
+                problem.init()
+                self._solvers[key] = problem.problem
+        else:
+            problem.init()
+        return problem
+
+    def predict_frames(self, frames, global_path, motion_times):
+        # frames after the next frame switch, as update_frames() will most likely make them
+        if self.n_frames == 1:
+            return frames, motion_times
+        if frames[-1].waypoints[-1] != self.goal_state[:2]:
+            start_pos = frames[-1].waypoints[-1]
+            return frames[1:] + [self.create_frame(start_pos, global_path)], motion_times[1:] + motion_times[-1:]
+        return frames[1:], motion_times[1:]
+
+    def prebuild_problem(self):
+        # predict the frames after the next frame switch, build_next_problem()
+        # constructs their problem
+        self._next_frames, self._next_problem = None, None
+        if not self.prebuild:
+            return
+        if self.n_frames == 1:
+            if getattr(self, 'next_frame', None) is None:
+                return
+            frames = [self.next_frame]
+        else:
+            frames = self.frames[:]
+        frames_next, times_next = self.predict_frames(frames, self.global_path, self.motion_times[:])
+        self._next_frames = self.get_rooms(frames_next, times_next)
+
+    def build_next_problem(self):
+        # construct the problem for the predicted frames, such that the frame
+        # switch doesn't have to wait for it: call it when the control loop is
+        # idle, the simulation does so after each update. The current problem
+        # keeps using the vehicles and obstacles as they were before.
+        if self._next_frames is None or self._next_problem is not None:
+            return
+        rooms, obstacles = self._next_frames
+        states = ChildStates(self.vehicles + list(set(o for obs in obstacles for o in obs)))
+        try:
+            problem = self.build_problem(rooms, obstacles, self.vehicles)
+        finally:
+            states.set_aside()
+        self._next_problem = (problem, obstacles, states)
+
+    def get_prebuilt_problem(self):
+        # problem that was constructed beforehand, if it fits the current frames
+        next_problem, self._next_frames, self._next_problem = self._next_problem, None, None
+        if next_problem is None:
+            return None
+        problem, obstacles, states = next_problem
+        rooms, current_obstacles = self.get_rooms(self.frames)
+        if obstacles != current_obstacles and not self.n_slots:
+            return None
+        for room, new_room in zip(problem.environment.room, rooms):
+            if not (self.reuse_problems or (room['shape'] is new_room['shape'] and
+                                            room['position'] is new_room['position'])):
+                # the room limits are not parameters of the problem
+                return None
+        states.take_over()
+        for room, new_room in zip(problem.environment.room, rooms):
+            room['shape'], room['position'] = new_room['shape'], new_room['position']
+        if obstacles != current_obstacles:
+            for room, room_obstacles in zip(problem.environment.room, current_obstacles):
+                problem.environment.fill_room(room, room_obstacles)
         problem.initialize(current_time=0.)
         return problem
 
+    def get_problem_key(self, environment):
+        # structural signature of a local problem: the obstacle types and shapes
+        # and their distribution over the frames
+        if environment.slots:
+            # the obstacles are parameters of the slots
+            return len(environment.room)
+        obstacles = []
+        for obstacle in environment.obstacles:
+            checkpoints, _ = obstacle.shape.get_checkpoints()
+            signature = [obstacle.__class__.__name__, obstacle.shape.__class__.__name__,
+                         len(checkpoints), obstacle.options['avoid'], obstacle.options['spline_traj']]
+            if obstacle.options['spline_traj']:
+                signature += [tuple(obstacle.options['spline_params']['knots']),
+                              obstacle.options['spline_params']['degree']]
+            if 'orientation' in obstacle.signals:
+                # orientation of non-rotating 2D obstacles is not a parameter
+                signature += [tuple(obstacle.signals['orientation'][:, -1]),
+                              tuple(obstacle.signals['angular_velocity'][:, -1])]
+            obstacles.append(tuple(signature))
+        rooms = [tuple(environment.obstacles.index(obstacle) for obstacle in room['obstacles'])
+                 for room in environment.room]
+        return (tuple(obstacles), tuple(rooms))
+
     # def find_intersection_line_segment_frame(self, frame, line):
     #     # find intersection point of the provided line with frame
     #     x3, y3, x4, y4 = frame['border']['limits']
@@ -20,8 +20,8 @@
 from vehicle import Vehicle
 from ..basics.shape import Rectangle, Circle
 from ..basics.spline_extra import sample_splines, evalspline
-from ..basics.spline_extra import running_integral
-from casadi import inf
+from ..basics.spline_extra import running_integral, cumulative_integral
+from casadi import inf, vertcat, cos, sin, tan
 import numpy as np
 
 # Elaboration of the vehicle model:
@@ -244,24 +244,23 @@ class AGV(Vehicle):
         # note: here the splines are not dimensionless anymore
         signals = {}
         v_til, tg_ha = splines[0], splines[1]
-        dv_til, dtg_ha = v_til.derivative(), tg_ha.derivative()
-        ddtg_ha = tg_ha.derivative(2)
-        dx = v_til*(1-tg_ha**2)
-        dy = v_til*(2*tg_ha)
         if not hasattr(self, 'signals'):  # first iteration
-            dx_int, dy_int = running_integral(dx), running_integral(dy)
-            x = dx_int - dx_int(time[0]) + self.pose0[0]
-            y = dy_int - dy_int(time[0]) + self.pose0[1]
+            pos0 = np.array(self.pose0[:2], dtype=float)
         else:
-            dx_int, dy_int = running_integral(dx), running_integral(dy)  # current state
-            x = dx_int - dx_int(time[0]) + self.signals['state'][0, -1]
-            y = dy_int - dy_int(time[0]) + self.signals['state'][1, -1]
+            pos0 = self.signals['state'][:2, -1]
+        # integrate velocity, sampled from the primitive splines
+        def dpos(t):
+            v_til_t, tg_ha_t = sample_splines([v_til, tg_ha], t)
+            return np.array([v_til_t*(1-tg_ha_t**2), v_til_t*(2*tg_ha_t)])
+        degree = v_til.basis.degree + 2*tg_ha.basis.degree
+        knots = np.union1d(v_til.basis.knots, tg_ha.basis.knots)
+        x_s, y_s = pos0[:, None] + cumulative_integral(dpos, time, degree, knots)
         # sample splines
+        dtg_ha = np.array(sample_splines([tg_ha], time, 1))
+        dv_til = np.array(sample_splines([v_til], time, 1))
+        ddtg_ha = np.array(sample_splines([tg_ha], time, 2))
         tg_ha = np.array(sample_splines([tg_ha], time))
         v_til = np.array(sample_splines([v_til], time))
-        dtg_ha = np.array(sample_splines([dtg_ha], time))
-        dv_til = np.array(sample_splines([dv_til], time))
-        ddtg_ha = np.array(sample_splines([ddtg_ha], time))
         theta = 2*np.arctan2(tg_ha, 1)
         delta = np.arctan2(-2*dtg_ha*self.length, v_til*(1+tg_ha**2)**2)
         ddelta = -(2*ddtg_ha*self.length*(v_til*(1+tg_ha**2)**2)-2*dtg_ha*self.length*(dv_til*(1+tg_ha**2)**2 + v_til*(4*tg_ha+4*tg_ha**3)*dtg_ha))/(v_til**2*(1+tg_ha**2)**4+(2*dtg_ha*self.length)**2)
@@ -284,8 +283,7 @@ class AGV(Vehicle):
             ddelta[0, -1] = ddelta[0, -2]
         input = np.c_[v_til*(1+tg_ha**2)]  # V
         input = np.r_[input, ddelta]
-        signals['state'] = np.c_[sample_splines([x, y], time)]
-        signals['state'] = np.r_[signals['state'], theta, delta]
+        signals['state'] = np.r_[np.c_[x_s, y_s].T, theta, delta]
         signals['input'] = input
         signals['pose'] = signals['state'][:3]
         signals['delta'] = delta
@@ -300,9 +298,19 @@ class AGV(Vehicle):
         u1, u2 = input[0], input[1]
         return np.r_[u1*np.cos(state[2]), u1*np.sin(state[2]), -u1/self.length*np.tan(state[3]) , u2].T
 
+    def ode_parameters(self):
+        return (self.length,)
+
+    def symbolic_ode(self, state, input):
+        u1, u2 = input[0], input[1]
+        return vertcat(u1*cos(state[2]), u1*sin(state[2]), -u1/self.length*tan(state[3]), u2)
+
     def state2pose(self, state):
         return state[:3]
 
+    def states2poses(self, states):
+        return np.array(states[:3, :])
+
     def draw(self, t=-1):
         surfaces = []
         if self.options['plot_type'] is 'car':
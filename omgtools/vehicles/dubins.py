@@ -20,10 +20,10 @@
 from vehicle import Vehicle
 from ..problems.point2point import FreeTPoint2point, FixedTPoint2point
 from ..basics.shape import Square, Circle
-from ..basics.spline_extra import sample_splines
+from ..basics.spline_extra import sample_splines, cumulative_integral
 from ..basics.spline_extra import evalspline, running_integral, concat_splines
 from ..basics.spline import BSplineBasis
-from casadi import inf, SX, MX
+from casadi import inf, SX, MX, vertcat, cos, sin
 import numpy as np
 
 # Elaboration of the vehicle model:
@@ -272,29 +272,30 @@ class Dubins(Vehicle):
         # note: here the splines are not dimensionless anymore
         signals = {}
         v_til, tg_ha = splines[0], splines[1]
-        dtg_ha = tg_ha.derivative()
-        dx = v_til*(1-tg_ha**2)
-        dy = v_til*(2*tg_ha)
+        v_til_s, tg_ha_s = sample_splines([v_til, tg_ha], time)
+        dv_til_s, dtg_ha_s = sample_splines([v_til, tg_ha], time, 1)
         if not hasattr(self, 'signals'):  # first iteration
-            x = self.integrate_once(dx, self.pose0[0], time[0])
-            y = self.integrate_once(dy, self.pose0[1], time[0])
+            pos0 = np.array(self.pose0[:2], dtype=float)
         else:
-            x = self.integrate_once(dx, self.signals['state'][0, -1], time[0])
-            y = self.integrate_once(dy, self.signals['state'][1, -1], time[0])
-        x_s, y_s, v_til_s, tg_ha_s, dtg_ha_s = sample_splines([x, y, v_til, tg_ha, dtg_ha], time)
-        den = sample_splines([(1+tg_ha**2)], time)[0]
-        theta = 2*np.arctan2(tg_ha_s,1)
-        dtheta = 2*np.array(dtg_ha_s)/(1.+np.array(tg_ha_s)**2)
+            pos0 = self.signals['state'][:2, -1]
+        # integrate velocity, sampled from the primitive splines
+        def dpos(t):
+            v_til_t, tg_ha_t = sample_splines([v_til, tg_ha], t)
+            return np.array([v_til_t*(1-tg_ha_t**2), v_til_t*(2*tg_ha_t)])
+        degree = v_til.basis.degree + 2*tg_ha.basis.degree
+        knots = np.union1d(v_til.basis.knots, tg_ha.basis.knots)
+        x_s, y_s = pos0[:, None] + cumulative_integral(dpos, time, degree, knots)
+        den = 1. + tg_ha_s**2
+        theta = 2*np.arctan2(tg_ha_s, 1)
+        dtheta = 2*dtg_ha_s/den
         v_s = v_til_s*den
-        acc = v_til*(1+tg_ha**2)
-        acc = acc.derivative()
-        acc_s = sample_splines([acc], time)[0]
-        signals['state'] = np.c_[x_s, y_s, theta.T].T
-        signals['input'] = np.c_[v_s, dtheta.T].T
+        acc_s = dv_til_s*den + 2*v_til_s*tg_ha_s*dtg_ha_s
+        signals['state'] = np.c_[x_s, y_s, theta].T
+        signals['input'] = np.c_[v_s, dtheta].T
         signals['acc'] = np.c_[acc_s].T
         if hasattr(self, 'rel_pos_c'):
-            x_c = x_s + sample_splines([self.rel_pos_c[0]*2*tg_ha + self.rel_pos_c[1]*(1-tg_ha**2)], time)[0]/den
-            y_c = y_s + sample_splines([self.rel_pos_c[1]*2*tg_ha - self.rel_pos_c[0]*(1-tg_ha**2)], time)[0]/den
+            x_c = x_s + (self.rel_pos_c[0]*2*tg_ha_s + self.rel_pos_c[1]*(1-tg_ha_s**2))/den
+            y_c = y_s + (self.rel_pos_c[1]*2*tg_ha_s - self.rel_pos_c[0]*(1-tg_ha_s**2))/den
             signals['fleet_center'] = np.c_[x_c, y_c].T
 
         if (self.options['substitution']): # and not self.options['exact_substitution']):  # don't plot error for exact_subs
@@ -307,14 +308,10 @@ class Dubins(Vehicle):
                 horizon_time = self.problem.options['horizon_time']
             dx2 = concat_splines([dx2], [horizon_time])[0]
             dy2 = concat_splines([dy2], [horizon_time])[0]
-            if not hasattr(self, 'signals'): # first iteration
-                x2 = self.integrate_once(dx2, self.pose0[0], time[0])
-                y2 = self.integrate_once(dy2, self.pose0[1], time[0])
-            else:
-                x2 = self.integrate_once(dx2, self.signals['state'][0, -1], time[0])
-                y2 = self.integrate_once(dy2, self.signals['state'][1, -1], time[0])
-            dx_s, dy_s = sample_splines([dx, dy], time)
-            x_s2, y_s2, dx_s2, dy_s2 = sample_splines([x2, y2, dx2, dy2], time)
+            dpos2 = lambda t: np.array(sample_splines([dx2, dy2], t))
+            x_s2, y_s2 = pos0[:, None] + cumulative_integral(dpos2, time, dx2.basis.degree, dx2.basis.knots)
+            dx_s, dy_s = dpos(time)
+            dx_s2, dy_s2 = dpos2(time)
             signals['err_dpos'] = np.c_[dx_s-dx_s2, dy_s-dy_s2].T
             signals['err_pos'] = np.c_[x_s-x_s2, y_s-y_s2].T
 
@@ -323,6 +320,9 @@ class Dubins(Vehicle):
     def state2pose(self, state):
         return state
 
+    def states2poses(self, states):
+        return np.array(states)
+
     def ode(self, state, input):
         # state: x, y, theta
         # inputs: V, dtheta
@@ -332,6 +332,10 @@ class Dubins(Vehicle):
         u1, u2 = input[0], input[1]
         return np.r_[u1*np.cos(state[2]), u1*np.sin(state[2]), u2].T
 
+    def symbolic_ode(self, state, input):
+        u1, u2 = input[0], input[1]
+        return vertcat(u1*cos(state[2]), u1*sin(state[2]), u2)
+
     def draw(self, t=-1):
         surfaces = []
         for shape in self.shapes:
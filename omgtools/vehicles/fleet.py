@@ -17,7 +17,7 @@
 # License along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
 
-from vehicle import Vehicle
+from vehicle import Vehicle, integrate_odes
 from ..execution.plotlayer import PlotLayer
 import numpy as np
 
@@ -174,12 +174,31 @@ class Fleet(PlotLayer):
                 data.append(dat)
         return data
 
-    def sort_vehicles(self):
+    def sort_vehicles(self, vehicles=None):
+        vehicles = self.vehicles if vehicles is None else vehicles
         vehicle_types = {}
-        for vehicle in self.vehicles:
+        for vehicle in vehicles:
             veh_type = vehicle.__class__.__name__
             if veh_type in vehicle_types:
                 vehicle_types[veh_type].append(vehicle)
             else:
                 vehicle_types[veh_type] = [vehicle]
         return vehicle_types
+
+    def simulate(self, simulation_time, sample_time, vehicles=None):
+        # vehicles of the same type are integrated in one batched call
+        for group in self.sort_vehicles(vehicles).values():
+            batch, states0, inputs = [], [], []
+            for vehicle in group:
+                init = vehicle.prepare_simulation(simulation_time, sample_time)
+                if init is None:
+                    vehicle.finish_simulation(None, None, simulation_time, sample_time)
+                else:
+                    batch.append(vehicle)
+                    states0.append(init[0])
+                    inputs.append(init[1])
+            if not batch:
+                continue
+            states = integrate_odes(batch, states0, inputs, simulation_time, sample_time)
+            for vehicle, state, input in zip(batch, states, inputs):
+                vehicle.finish_simulation(state, input, simulation_time, sample_time)
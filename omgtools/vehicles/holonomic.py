@@ -177,5 +177,11 @@ class Holonomic(Vehicle):
     def state2pose(self, state):
         return np.r_[state, 0.]
 
+    def states2poses(self, states):
+        return np.r_[states, np.zeros((1, states.shape[1]))]
+
     def ode(self, state, input):
         return input
+
+    def linear_model(self):
+        return np.zeros((2, 2)), np.eye(2)
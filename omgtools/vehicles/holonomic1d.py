@@ -112,5 +112,11 @@ class Holonomic1D(Vehicle):
     def state2pose(self, state):
         return np.r_[state, np.zeros(2)]
 
+    def states2poses(self, states):
+        return np.r_[states, np.zeros((2, states.shape[1]))]
+
     def ode(self, state, input):
         return input
+
+    def linear_model(self):
+        return np.zeros((1, 1)), np.eye(1)
@@ -148,5 +148,11 @@ class Holonomic3D(Vehicle):
     def state2pose(self, state):
         return np.r_[state, np.zeros(3)]
 
+    def states2poses(self, states):
+        return np.r_[states, np.zeros((3, states.shape[1]))]
+
     def ode(self, state, input):
         return input
+
+    def linear_model(self):
+        return np.zeros((3, 3)), np.eye(3)
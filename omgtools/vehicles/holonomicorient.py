@@ -179,5 +179,11 @@ class HolonomicOrient(Vehicle):
     def state2pose(self, state):
         return state
 
+    def states2poses(self, states):
+        return np.array(states)
+
     def ode(self, state, input):
         return input
+
+    def linear_model(self):
+        return np.zeros((3, 3)), np.eye(3)
@@ -20,7 +20,7 @@
 from vehicle import Vehicle
 from ..basics.shape import Circle
 from ..basics.spline_extra import sample_splines
-from casadi import inf
+from casadi import inf, vertcat, cos, sin
 import numpy as np
 
 
@@ -146,11 +146,22 @@ class Quadrotor(Vehicle):
     def state2pose(self, state):
         return np.r_[state[0], state[1], -state[4]]
 
+    def states2poses(self, states):
+        return np.vstack((states[0], states[1], -states[4]))
+
     def ode(self, state, input):
         theta = state[4]
         u1, u2 = input[0], input[1]
         return np.r_[state[2:4], u1*np.sin(theta), u1*np.cos(theta)-self.g, u2].T
 
+    def ode_parameters(self):
+        return (self.g,)
+
+    def symbolic_ode(self, state, input):
+        theta = state[4]
+        u1, u2 = input[0], input[1]
+        return vertcat(state[2:4], u1*sin(theta), u1*cos(theta)-self.g, u2)
+
     def draw(self, t=-1):
         theta = self.signals['pose'][2, t]
         cth, sth = np.cos(theta), np.sin(theta)
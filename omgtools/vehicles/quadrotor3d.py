@@ -20,9 +20,9 @@
 from vehicle import Vehicle
 from ..basics.shape import Sphere
 from ..basics.spline import BSplineBasis
-from ..basics.spline_extra import sample_splines
+from ..basics.spline_extra import sample_splines, cumulative_integral
 from ..basics.spline_extra import evalspline, running_integral, concat_splines, definite_integral
-from casadi import inf, SX, MX
+from casadi import inf, SX, MX, vertcat, cos, sin
 import numpy as np
 import time
 
@@ -250,26 +250,39 @@ class Quadrotor3D(Vehicle):
             x = dx_int-dx_int(t/T) + x0
         return x, dx
 
+    def integrate_twice_sampled(self, ddpos, dpos0, pos0, time, degree, breakpoints):
+        # sampled counterpart of integrate_twice: ddpos maps time instants to
+        # accelerations (one row per axis), which are integrated by quadrature
+        t0 = time[0]
+        def integrand(t):
+            ddpos_t = ddpos(t)
+            return np.r_[ddpos_t, (t-t0)*ddpos_t]
+        integral = cumulative_integral(integrand, time, degree+1, breakpoints)
+        n_ax = len(dpos0)
+        dpos = np.array(dpos0, dtype=float)[:, None] + integral[:n_ax]
+        pos = np.array(pos0, dtype=float)[:, None] + dpos*(np.array(time)-t0) - integral[n_ax:]
+        return pos, dpos
+
     def splines2signals(self, splines, time):
         signals = {}
         f_til, q_phi, q_theta = splines
-        dq_phi, dq_theta = q_phi.derivative(), q_theta.derivative()
-        # ddq_phi, ddq_theta = q_phi.derivative(2), q_theta.derivative(2)
-        ddx = f_til*(1-q_phi**2)*(2*q_theta)
-        ddy = -f_til*(1+q_theta**2)*(2*q_phi)
-        ddz = f_til*(1-q_phi**2)*(1-q_theta**2) - self.g
-
-        x, dx = self.integrate_twice(ddx, self.prediction['state'][3], self.prediction['state'][0], time[0])
-        y, dy = self.integrate_twice(ddy, self.prediction['state'][4], self.prediction['state'][1], time[0])
-        z, dz = self.integrate_twice(ddz, self.prediction['state'][5], self.prediction['state'][2], time[0])
-
-        x_s, y_s, z_s, dx_s, dy_s, dz_s = sample_splines([x, y, z, dx, dy, dz], time)
-        f_til_s, q_phi_s, q_theta_s, dq_phi_s, dq_theta_s = sample_splines([f_til, q_phi, q_theta, dq_phi, dq_theta], time)
-        den = sample_splines([(1+q_phi**2)*(1+q_theta**2)], time)[0]
+        def ddpos(t):
+            f_til_t, q_phi_t, q_theta_t = sample_splines([f_til, q_phi, q_theta], t)
+            return np.array([f_til_t*(1-q_phi_t**2)*(2*q_theta_t),
+                             -f_til_t*(1+q_theta_t**2)*(2*q_phi_t),
+                             f_til_t*(1-q_phi_t**2)*(1-q_theta_t**2) - self.g])
+        degree = f_til.basis.degree + 2*q_phi.basis.degree + 2*q_theta.basis.degree
+        knots = np.union1d(np.union1d(f_til.basis.knots, q_phi.basis.knots), q_theta.basis.knots)
+        pos0, dpos0 = self.prediction['state'][:3], self.prediction['state'][3:6]
+        (x_s, y_s, z_s), (dx_s, dy_s, dz_s) = self.integrate_twice_sampled(ddpos, dpos0, pos0, time, degree, knots)
+
+        f_til_s, q_phi_s, q_theta_s = sample_splines([f_til, q_phi, q_theta], time)
+        dq_phi_s, dq_theta_s = sample_splines([q_phi, q_theta], time, 1)
+        den = (1+q_phi_s**2)*(1+q_theta_s**2)
         phi = 2*np.arctan2(q_phi_s, 1)
         theta = 2*np.arctan2(q_theta_s, 1)
-        dphi = 2*np.array(dq_phi_s)/(1.+np.array(q_phi_s)**2)
-        dtheta = 2*np.array(dq_theta_s)/(1.+np.array(q_theta_s)**2)
+        dphi = 2*dq_phi_s/(1.+q_phi_s**2)
+        dtheta = 2*dq_theta_s/(1.+q_theta_s**2)
         f_s = f_til_s*den
         signals['state'] = np.c_[x_s, y_s, z_s, dx_s, dy_s, dz_s, phi, theta].T
         signals['input'] = np.c_[f_s, dphi.T, dtheta.T].T
@@ -281,14 +294,13 @@ class Quadrotor3D(Vehicle):
             ddx2 = concat_splines([ddx2], [self.problem.options['horizon_time']])[0]
             ddy2 = concat_splines([ddy2], [self.problem.options['horizon_time']])[0]
             ddz2 = concat_splines([ddz2], [self.problem.options['horizon_time']])[0]
+            ddpos2 = lambda t: np.array(sample_splines([ddx2, ddy2, ddz2], t))
 
-            x2, dx2 = self.integrate_twice(ddx2, self.prediction['state'][3], self.prediction['state'][0], time[0])
-            y2, dy2 = self.integrate_twice(ddy2, self.prediction['state'][4], self.prediction['state'][1], time[0])
-            z2, dz2 = self.integrate_twice(ddz2, self.prediction['state'][5], self.prediction['state'][2], time[0])
+            (x_s2, y_s2, z_s2), (dx_s2, dy_s2, dz_s2) = self.integrate_twice_sampled(
+                ddpos2, dpos0, pos0, time, ddx2.basis.degree, ddx2.basis.knots)
 
-            ddx_s, ddy_s, ddz_s = sample_splines([ddx, ddy, ddz], time)
-            ddx_s2, ddy_s2, ddz_s2 = sample_splines([ddx2, ddy2, ddz2], time)
-            x_s2, y_s2, z_s2, dx_s2, dy_s2, dz_s2 = sample_splines([x2, y2, z2, dx2, dy2, dz2], time)
+            ddx_s, ddy_s, ddz_s = ddpos(time)
+            ddx_s2, ddy_s2, ddz_s2 = ddpos2(time)
             signals['err_ddpos'] = np.c_[ddx_s-ddx_s2, ddy_s-ddy_s2, ddz_s-ddz_s2].T
             signals['err_dpos'] = np.c_[dx_s-dx_s2, dy_s-dy_s2, dz_s-dz_s2].T
             signals['err_pos'] = np.c_[x_s-x_s2, y_s-y_s2, z_s-z_s2].T
@@ -297,12 +309,24 @@ class Quadrotor3D(Vehicle):
     def state2pose(self, state):
         return np.r_[state[0], state[1], state[2], state[6], state[7], 0.]
 
+    def states2poses(self, states):
+        return np.vstack((states[:3], states[6:8], np.zeros((1, states.shape[1]))))
+
     def ode(self, state, input):
         phi = state[6]
         theta = state[7]
         u1, u2, u3 = input[0], input[1], input[2]
         return np.r_[state[3:6], u1*np.sin(theta)*np.cos(phi), -u1*np.sin(phi), -self.g + u1*np.cos(phi)*np.cos(theta), u2, u3].T
 
+    def ode_parameters(self):
+        return (self.g,)
+
+    def symbolic_ode(self, state, input):
+        phi = state[6]
+        theta = state[7]
+        u1, u2, u3 = input[0], input[1], input[2]
+        return vertcat(state[3:6], u1*sin(theta)*cos(phi), -u1*sin(phi), -self.g + u1*cos(phi)*cos(theta), u2, u3)
+
     def draw(self, t=-1):
         phi, theta = self.signals['pose'][3, t], self.signals['pose'][4, t]
         cth, sth = np.cos(theta), np.sin(theta)
@@ -20,7 +20,7 @@
 from vehicle import Vehicle
 from ..basics.shape import Sphere
 from ..basics.spline_extra import sample_splines
-from casadi import inf
+from casadi import inf, vertcat, cos, sin
 import numpy as np
 
 # Vehicle model:
@@ -194,12 +194,24 @@ class SimpleQuadrotor3D(Vehicle):
     def state2pose(self, state):
         return np.r_[state[0], state[1], state[2], state[6], state[7], 0.]
 
+    def states2poses(self, states):
+        return np.vstack((states[:3], states[6:8], np.zeros((1, states.shape[1]))))
+
     def ode(self, state, input):
         phi = state[6]
         theta = state[7]
         u1, u2, u3 = input[0], input[1], input[2]
         return np.r_[state[3:6], u1*np.sin(theta)*np.cos(phi), -u1*np.sin(phi), -self.g + u1*np.cos(phi)*np.cos(theta), u2, u3].T
 
+    def ode_parameters(self):
+        return (self.g,)
+
+    def symbolic_ode(self, state, input):
+        phi = state[6]
+        theta = state[7]
+        u1, u2, u3 = input[0], input[1], input[2]
+        return vertcat(state[3:6], u1*sin(theta)*cos(phi), -u1*sin(phi), -self.g + u1*cos(phi)*cos(theta), u2, u3)
+
     def draw(self, t=-1):
         phi, theta = self.signals['pose'][3, t], self.signals['pose'][4, t]
         cth, sth = np.cos(theta), np.sin(theta)
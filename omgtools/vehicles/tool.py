@@ -20,7 +20,7 @@
 from vehicle import Vehicle
 from ..basics.shape import Circle, Ring, Rectangle, Square
 from ..basics.spline_extra import sample_splines
-from casadi import inf
+from casadi import inf, fmin, fmax
 import numpy as np
 
 
@@ -40,6 +40,8 @@ class Tool(Vehicle):
         # impose jerk limits --> degree 3
         Vehicle.__init__(
             self, n_spl=3, degree=3, shapes=self.shapes, options=options)
+        # by default, the tool stops at its terminal position
+        self.inputT, self.dinputT = None, None
 
         # user specified separate velocities for x, y and z
         self.vxmin = bounds['vxmin'] if 'vxmin' in bounds else -0.5
@@ -87,7 +89,7 @@ class Tool(Vehicle):
         dddx, dddy, dddz = x.derivative(3), y.derivative(3), z.derivative(3)  # jerk
 
         # constrain local velocity
-        if self.options['vel_limit'] is 'machining':
+        if self.options['vel_limit'] == 'machining':
             # the machining process is the limiting factor, so limit the total velocity
             # in x- and y-axis combined
             if self.vxmax != 0.:
@@ -99,7 +101,7 @@ class Tool(Vehicle):
                 self.define_constraint(
                     (dz**2) - (horizon_time**2)*self.vzmax**2, -inf, 0., skip=skip)
 
-        elif self.options['vel_limit'] is 'axes':
+        elif self.options['vel_limit'] == 'axes':
             # the axes themselves are the limiting factor, so limit the x- and y- axis separately
             self.define_constraint(-dx + horizon_time*self.vxmin, -inf, 0., skip=skip)
             self.define_constraint(-dy + horizon_time*self.vymin, -inf, 0., skip=skip)
@@ -136,10 +138,19 @@ class Tool(Vehicle):
                 (dx, horizon_time*input0[0]), (dy, horizon_time*input0[1]), (dz, horizon_time*input0[2]),
                 (ddx, horizon_time**2*dinput0[0]), (ddy, horizon_time**2*dinput0[1]), (ddz, horizon_time**2*dinput0[2])]
 
-    def get_terminal_constraints(self, splines):
+    def get_terminal_constraints(self, splines, horizon_time=None):
         position = self.define_parameter('poseT', 3)
         x, y, z = splines
         term_con = [(x, position[0]), (y, position[1]), (z, position[2])]
+        if self.inputT is not None:
+            # pass the terminal position with a given velocity and acceleration
+            inputT = self.define_parameter('inputT', 3)
+            dinputT = self.define_parameter('dinputT', 3)
+            dx, dy, dz = x.derivative(), y.derivative(), z.derivative()
+            ddx, ddy, ddz = x.derivative(2), y.derivative(2), z.derivative(2)
+            term_con_der = [(dx, horizon_time*inputT[0]), (dy, horizon_time*inputT[1]), (dz, horizon_time*inputT[2]),
+                            (ddx, horizon_time**2*dinputT[0]), (ddy, horizon_time**2*dinputT[1]), (ddz, horizon_time**2*dinputT[2])]
+            return [term_con, term_con_der]
         term_con_der = []
         for d in range(1, self.degree):
             term_con_der.extend([(x.derivative(d), 0.), (y.derivative(d), 0.), (z.derivative(d), 0.)])
@@ -157,13 +168,17 @@ class Tool(Vehicle):
         self.prediction['input'] = input
         self.prediction['dinput'] = dinput
 
-    def set_terminal_conditions(self, position):
+    def set_terminal_conditions(self, position, input=None, dinput=None):
         self.poseT = position
+        if input is not None:
+            self.inputT = input
+            self.dinputT = dinput if dinput is not None else np.zeros(3)
 
     def check_terminal_conditions(self):
         tol = self.options['stop_tol']
+        inputT = self.inputT if self.inputT is not None else np.zeros(3)
         if (np.linalg.norm(self.signals['state'][:, -1] - self.poseT) > tol or
-                np.linalg.norm(self.signals['input'][:, -1])) > tol:
+                np.linalg.norm(self.signals['input'][:, -1] - inputT) > tol):
             return False
         else:
             return True
@@ -174,6 +189,9 @@ class Tool(Vehicle):
         parameters[self]['input0'] = self.prediction['input']
         parameters[self]['dinput0'] = self.prediction['dinput']
         parameters[self]['poseT'] = self.poseT
+        if self.inputT is not None:
+            parameters[self]['inputT'] = self.inputT
+            parameters[self]['dinputT'] = self.dinputT
         return parameters
 
     def define_collision_constraints(self, segment, splines, horizon_time):
@@ -195,9 +213,13 @@ class Tool(Vehicle):
             # we have a horizontal or vertical straight line segment and
             # a Circular or rectangular tool
 
-            lims = segment['shape'].get_canvas_limits()
-            room_limits = []
-            room_limits += [lims[k]+segment['pose'][k] for k in range(self.n_dim)]
+            if 'parameters' in segment:
+                # segment geometry is a parameter, see Environment.get_room
+                room_limits = segment['parameters']['limits']
+            else:
+                lims = segment['shape'].get_canvas_limits()
+                room_limits = []
+                room_limits += [lims[k]+segment['pose'][k] for k in range(self.n_dim)]
             for chck in checkpoints:
                 for k in range(2):
                     self.define_constraint(-(chck[k]+position[k]) + room_limits[k][0] + rad[0], -inf, 0.)
@@ -211,13 +233,18 @@ class Tool(Vehicle):
             # -tol <= a'*q - b <= tol
             # with b the offset,a the normalized normal vector, and q = [x,y]'
 
-            x1, y1, z1 = segment['start']
-            x2, y2, z2 = segment['end']
-            tolerance = segment['shape'].height*0.5
+            if 'parameters' in segment:
+                a = segment['parameters']['normal']
+                b = segment['parameters']['offset']
+                tolerance = segment['parameters']['tolerance']
+            else:
+                x1, y1, z1 = segment['start']
+                x2, y2, z2 = segment['end']
+                tolerance = segment['shape'].height*0.5
 
-            vector = [x2-x1, y2-y1]  # vector from end to start
-            a = np.array([-vector[1],vector[0]])*(1/np.sqrt(vector[0]**2+vector[1]**2))  # normalized normal vector
-            b = np.dot(a,np.array([x1, y1]))  # offset
+                vector = [x2-x1, y2-y1]  # vector from end to start
+                a = np.array([-vector[1],vector[0]])*(1/np.sqrt(vector[0]**2+vector[1]**2))  # normalized normal vector
+                b = np.dot(a,np.array([x1, y1]))  # offset
 
             self.define_constraint(a[0]*position[0] + a[1]*position[1] - b - tolerance + rad[0], -inf, 0.)
             self.define_constraint(-a[0]*position[0] - a[1]*position[1] + b - tolerance + rad[0], -inf, 0.)
@@ -230,18 +257,27 @@ class Tool(Vehicle):
             # Todo: constraint imposes that the trajectory must lie inside the complete ring, not that it
             # may only lie inside the ring segment. Improve?
 
-            center = segment['pose']
+            if 'parameters' in segment:
+                center = segment['parameters']['center']
+                radius_in, radius_out = segment['parameters']['radii'][0], segment['parameters']['radii'][1]
+            else:
+                center = segment['pose']
+                radius_in, radius_out = segment['shape'].radius_in, segment['shape'].radius_out
             self.define_constraint(-(position[0] - center[0])**2 - (position[1] - center[1])**2 +
-                                  (segment['shape'].radius_in + rad[0])**2, -inf, 0.)
+                                  (radius_in + rad[0])**2, -inf, 0.)
             self.define_constraint((position[0] - center[0])**2 + (position[1] - center[1])**2 -
-                                  (segment['shape'].radius_out - rad[0])**2, -inf, 0.)
+                                  (radius_out - rad[0])**2, -inf, 0.)
         else:
             raise RuntimeError('Invalid segment obtained when setting up collision avoidance constraints')
 
         # collision avoidance in z-direction: stay within connection from start to end, with a little margin
+        if 'parameters' in segment:
+            start, end = segment['parameters']['start'], segment['parameters']['end']
+        else:
+            start, end = segment['start'], segment['end']
         if segment['start'][2] != segment['end'][2]:
-            z_min = min(segment['start'][2],segment['end'][2])
-            z_max = max(segment['start'][2],segment['end'][2])
+            z_min = fmin(start[2], end[2])
+            z_max = fmax(start[2], end[2])
             # movement in z-direction
             self.define_constraint(-z + z_min - rad[0], -inf, 0.)
             self.define_constraint(z - z_max  - rad[0], -inf, 0.)
@@ -262,10 +298,10 @@ class Tool(Vehicle):
         # when using variable tolerances, explaining the if-check below.
 
         if self.options['variable_tolerance']:
-            self.define_constraint(position[0](1.) - segment['end'][0] - self.tolerance*0.9, -inf, 0.)
-            self.define_constraint(-position[0](1.) + segment['end'][0] - self.tolerance*0.9, -inf, 0.)
-            self.define_constraint(position[1](1.) - segment['end'][1] - self.tolerance*0.9, -inf, 0.)
-            self.define_constraint(-position[1](1.) + segment['end'][1] - self.tolerance*0.9, -inf, 0.)
+            self.define_constraint(position[0](1.) - end[0] - self.tolerance*0.9, -inf, 0.)
+            self.define_constraint(-position[0](1.) + end[0] - self.tolerance*0.9, -inf, 0.)
+            self.define_constraint(position[1](1.) - end[1] - self.tolerance*0.9, -inf, 0.)
+            self.define_constraint(-position[1](1.) + end[1] - self.tolerance*0.9, -inf, 0.)
 
     def splines2signals(self, splines, time):
         signals = {}
@@ -284,5 +320,11 @@ class Tool(Vehicle):
     def state2pose(self, state):
         return np.r_[state, np.zeros(3)]
 
+    def states2poses(self, states):
+        return np.r_[states, np.zeros((3, states.shape[1]))]
+
     def ode(self, state, input):
-        return input
\ No newline at end of file
+        return input
+
+    def linear_model(self):
+        return np.zeros((3, 3)), np.eye(3)
@@ -21,7 +21,7 @@ from vehicle import Vehicle
 from dubins import Dubins
 from ..basics.shape import Circle, Rectangle, Square
 from ..basics.spline_extra import sample_splines
-from casadi import inf
+from casadi import inf, vertcat, cos, sin
 import numpy as np
 
 
@@ -201,11 +201,30 @@ class Trailer(Vehicle):
         ode = np.r_[ode_trailer, ode_veh]
         return ode
 
+    def ode_parameters(self):
+        return (self.l_hitch, self.lead_veh.get_integrator_key())
+
+    def symbolic_ode(self, state, input):
+        theta_tr = state[2]
+        V_veh = input[0]
+        dtheta_tr = V_veh/self.l_hitch*sin(state[5]-theta_tr)
+        ode_veh = self.lead_veh.symbolic_ode(state[3:], input)
+        if ode_veh is None:
+            return None
+        return vertcat(ode_veh[0]+self.l_hitch*sin(theta_tr)*dtheta_tr,
+                       ode_veh[1]-self.l_hitch*cos(theta_tr)*dtheta_tr,
+                       dtheta_tr, ode_veh)
+
     def state2pose(self, state):
         pose_veh = self.lead_veh.state2pose(state[3:])
         pose_tr = state[:3]
         return np.r_[pose_tr , pose_veh]
 
+    def states2poses(self, states):
+        poses_veh = self.lead_veh.states2poses(states[3:, :])
+        poses_tr = states[:3, :]
+        return np.r_[poses_tr, poses_veh]
+
     def draw(self, t=-1):
         surfaces, lines = [], []
         for shape in self.shapes:
@@ -21,15 +21,49 @@ from ..basics.optilayer import OptiChild
 from ..basics.spline import BSplineBasis
 from ..basics.spline_extra import concat_splines, definite_integral, sample_splines
 from ..basics.shape import Rectangle, Square, Circle
+from ..basics.discretization import discretize_foh, simulate_discrete
 from ..execution.plotlayer import PlotLayer
-from casadi import inf
-from scipy.signal import filtfilt, butter
+from ..execution.history import History
+from casadi import inf, SX, MX, Function, horzcat, mtimes
 from scipy.interpolate import interp1d
-from scipy.integrate import odeint
 from numpy.random import normal
 from itertools import groupby
 import numpy as np
 
+# compiled integrators, shared by all vehicles with the same integrator key
+_integrators = {}
+
+
+def integrate_odes(vehicles, states0, inputs, integration_time, sample_time):
+    # integrate the odes of vehicles of the same type in one batched call,
+    # returns a list of state trajectories
+    n_samp = int(integration_time/sample_time)+1
+    inputs = [input[:, np.minimum(np.arange(n_samp), input.shape[1]-1)]
+              for input in inputs]
+    models = [veh._get_linear_model(veh._ode) for veh in vehicles]
+    if all(model is not None for model in models):
+        discr = [veh._discretize(model, sample_time)
+                 for veh, model in zip(vehicles, models)]
+        if all(all(np.array_equal(m0, m) for m0, m in zip(discr[0], d)) for d in discr):
+            # stack the states of all vehicles: block diagonal dynamics
+            Ad, B0, B1 = discr[0]
+            drive = np.vstack([B0.dot(input[:, :-1]) + B1.dot(input[:, 1:])
+                               for input in inputs])
+            states = simulate_discrete(np.kron(np.eye(len(vehicles)), Ad),
+                                       np.hstack(states0), drive)
+            return np.vsplit(states, len(vehicles))
+    elif all(model is None and veh.options['integrator'] == 'rk4'
+             for veh, model in zip(vehicles, models)):
+        n_st, n_in = len(states0[0]), inputs[0].shape[0]
+        keys = set([veh.get_integrator_key() for veh in vehicles])
+        integrator = vehicles[0].get_integrator(n_st, n_in, sample_time, n_samp, len(vehicles))
+        if integrator is not None and len(keys) == 1:
+            states = np.array(integrator(np.array(states0).T, np.hstack(inputs)))
+            return np.hsplit(states, len(vehicles))
+    # no common model or integrator: integrate one by one
+    return [veh.integrate_ode(st0, inp, integration_time, sample_time)
+            for veh, st0, inp in zip(vehicles, states0, inputs)]
+
 
 class Vehicle(OptiChild, PlotLayer):
 
@@ -69,7 +103,8 @@ class Vehicle(OptiChild, PlotLayer):
                         'room_constraints': True, 'stop_tol': 1.e-3,
                         'ideal_prediction': False, 'ideal_update': False,
                         '1storder_delay': False, 'time_constant': 0.1,
-                        'input_disturbance': None}
+                        'input_disturbance': None, 'integrator': 'odeint',
+                        'integrator_steps': 1}
 
     def set_options(self, options):
         self.options.update(options)
@@ -159,9 +194,13 @@ class Vehicle(OptiChild, PlotLayer):
             # then decide on type of constraints to use:
             # room_limits or hyperplanes
             if self.options['room_constraints']:
-                lims = room['shape'].get_canvas_limits()
-                room_limits = []
-                room_limits += [lims[k]+room['position'][k] for k in range(self.n_dim)]
+                if 'parameters' in room:
+                    # limits are parameters, see Environment.get_room
+                    room_limits = self.get_room_limits(room)
+                else:
+                    lims = room['shape'].get_canvas_limits()
+                    room_limits = []
+                    room_limits += [lims[k]+room['position'][k] for k in range(self.n_dim)]
                 if ((isinstance(room['shape'], (Rectangle, Square)) and
                     room['shape'].orientation == 0.0) and
                     (isinstance(shape, Circle) or
@@ -173,7 +212,14 @@ class Vehicle(OptiChild, PlotLayer):
                             self.define_constraint(-(chck[k]+position[k]) + room_limits[k][0] + rad[0], -inf, 0.)
                             self.define_constraint((chck[k]+position[k]) - room_limits[k][1] + rad[0], -inf, 0.)
                 else:
-                    hyp_room = room['shape'].get_hyperplanes(position = room['position'])
+                    if 'parameters' in room:
+                        # axis-aligned room with parametric limits
+                        hyp_room = {0: {'a': [-1., 0.], 'b': -room_limits[0][0]},
+                                    1: {'a': [1., 0.], 'b': room_limits[0][1]},
+                                    2: {'a': [0., -1.], 'b': -room_limits[1][0]},
+                                    3: {'a': [0., 1.], 'b': room_limits[1][1]}}
+                    else:
+                        hyp_room = room['shape'].get_hyperplanes(position = room['position'])
                     for l, chck in enumerate(checkpoints):
                         for hpp in hyp_room.itervalues():
                             con = 0
@@ -218,9 +264,12 @@ class Vehicle(OptiChild, PlotLayer):
                             sum([a[k]*(chck[k]+position[k]) for k in range(3)])-b+rad[l], -inf, 0)
             # room constraints
             if self.options['room_constraints']:
-                lims = room['shape'].get_canvas_limits()
-                room_limits = []
-                room_limits += [lims[k]+room['position'][k] for k in range(self.n_dim)]
+                if 'parameters' in room:
+                    room_limits = self.get_room_limits(room)
+                else:
+                    lims = room['shape'].get_canvas_limits()
+                    room_limits = []
+                    room_limits += [lims[k]+room['position'][k] for k in range(self.n_dim)]
                 for chck in checkpoints:
                     for k in range(3):
                         self.define_constraint(-
@@ -228,6 +277,15 @@ class Vehicle(OptiChild, PlotLayer):
                         self.define_constraint(
                             (chck[k]+position[k]) - room_limits[k][1], -inf, 0.)
 
+    def get_room_limits(self, room):
+        # parametric rooms only give limits when they are axis-aligned
+        # rectangles, other shapes (e.g. rotated rectangles or rings) are
+        # only supported by vehicles which handle their parameters, e.g. Tool
+        if 'limits' not in room['parameters']:
+            raise ValueError('Parametric rooms of ' + self.__class__.__name__ +
+                             ' should be axis-aligned rectangles.')
+        return room['parameters']['limits']
+
     def get_fleet_center(self, splines, rel_pos, substitute=True):
         if substitute:
             center = self.define_substitute('fleet_center', [s+rp for s, rp in zip(splines, rel_pos)])
@@ -353,46 +411,66 @@ class Vehicle(OptiChild, PlotLayer):
             self.prediction['dinput'] = dinput
 
     def simulate(self, simulation_time, sample_time):
-        if self.to_simulate:
-            if not hasattr(self, 'signals'):
-                self.signals = {}
-                for key in self.trajectories:
-                    self.signals[key] = np.c_[self.trajectories[key][:, 0]]
+        init = self.prepare_simulation(simulation_time, sample_time)
+        if init is None:
+            self.finish_simulation(None, None, simulation_time, sample_time)
+        else:
+            state0, input = init
+            state = self.integrate_ode(
+                state0, input, simulation_time, sample_time)
+            self.finish_simulation(state, input, simulation_time, sample_time)
+
+    def prepare_simulation(self, simulation_time, sample_time):
+        # returns the current state and the input to apply, or None if there
+        # is no ode to integrate
+        if not self.to_simulate:
+            return None
+        if not hasattr(self, 'signals'):
+            self.signals = {}
+            for key in self.trajectories:
+                self.signals[key] = np.c_[self.trajectories[key][:, 0]]
+        n_samp = int(np.round(simulation_time/sample_time, 6))
+        if self.options['ideal_update']:
+            for key in self.trajectories:
+                self.signals[key] = np.hstack((
+                    self.signals[key], self.trajectories[key][:, 1:n_samp+1]))
+            return None
+        for key in self.trajectories:
+            if key not in ['state', 'input', 'pose']:
+                self.signals[key] = np.hstack((
+                    self.signals[key], self.trajectories[key][:, 1:n_samp+1]))
+        input = self.trajectories['input']
+        if self.options['input_disturbance']:
+            input = self.add_disturbance(input)
+        if self.options['1storder_delay']:
+            input0 = self.signals['input'][:, -1]
+            input = self.integrate_ode(
+                input0, input, simulation_time, sample_time, self._ode_1storder)
+        state0 = self.signals['state'][:, -1]  # current state
+        return state0, input
+
+    def finish_simulation(self, state, input, simulation_time, sample_time):
+        # append the simulated state and input (if any) to the signals
+        # and store trajectories
+        if state is not None:
             n_samp = int(np.round(simulation_time/sample_time, 6))
-            if self.options['ideal_update']:
-                for key in self.trajectories:
-                    self.signals[key] = np.c_[
-                        self.signals[key], self.trajectories[key][:, 1:n_samp+1]]
-            else:
-                for key in self.trajectories:
-                    if key not in ['state', 'input', 'pose']:
-                        self.signals[key] = np.c_[
-                            self.signals[key], self.trajectories[key][:, 1:n_samp+1]]
-                input = self.trajectories['input']
-                if self.options['input_disturbance']:
-                    input = self.add_disturbance(input)
-                if self.options['1storder_delay']:
-                    input0 = self.signals['input'][:, -1]
-                    input = self.integrate_ode(
-                        input0, input, simulation_time, sample_time, self._ode_1storder)
-                state0 = self.signals['state'][:, -1]  # current state
-                state = self.integrate_ode(
-                    state0, input, simulation_time, sample_time)
-                self.signals['input'] = np.c_[
-                    self.signals['input'], input[:, 1:n_samp+1]]
-                self.signals['state'] = np.c_[
-                    self.signals['state'], state[:, 1:n_samp+1]]
-                self.signals['pose'] = np.c_[
-                self.signals['pose'], self._state2pose(state[:, 1:n_samp+1])]
+            self.signals['input'] = np.hstack((
+                self.signals['input'], input[:, 1:n_samp+1]))
+            self.signals['state'] = np.hstack((
+                self.signals['state'], state[:, 1:n_samp+1]))
+            self.signals['pose'] = np.hstack((
+                self.signals['pose'], self._state2pose(state[:, 1:n_samp+1])))
         # store trajectories
         if not hasattr(self, 'traj_storage'):
             self.traj_storage = {}
             self.traj_storage_kn = {}
             self.pred_storage = {}
         repeat = int(simulation_time/sample_time)
-        self._add_to_memory(self.traj_storage, self.trajectories, repeat)
-        self._add_to_memory(self.traj_storage_kn, self.trajectories_kn, repeat)
-        self._add_to_memory(self.pred_storage, self.prediction, repeat)
+        start_time = self.trajectories['time'][0, 0]
+        end_time = start_time + repeat*sample_time
+        self._add_to_memory(self.traj_storage, self.trajectories, repeat, start_time, end_time)
+        self._add_to_memory(self.traj_storage_kn, self.trajectories_kn, repeat, start_time, end_time)
+        self._add_to_memory(self.pred_storage, self.prediction, repeat, start_time, end_time)
         # update plots
         self.update_plots()
 
@@ -400,21 +478,32 @@ class Vehicle(OptiChild, PlotLayer):
         if len(state.shape) <= 1:
             return self.state2pose(state)
         else:
-            pose = []
-            for k in range(state.shape[1]):
-                pose.append(self.state2pose(state[:, k]))
-            return np.c_[pose].T
+            return self.states2poses(state)
 
     def integrate_ode(self, state0, input, integration_time, sample_time, ode=None):
         if ode is None:
             ode = self._ode
         n_samp = int(integration_time/sample_time)+1
+        # input is linearly interpolated and held constant after its last sample
+        input_samp = input[:, np.minimum(np.arange(n_samp), input.shape[1]-1)]
+        model = self._get_linear_model(ode)
+        if model is not None:
+            # linear dynamics: exact discretization
+            Ad, B0, B1 = self._discretize(model, sample_time)
+            drive = B0.dot(input_samp[:, :-1]) + B1.dot(input_samp[:, 1:])
+            return simulate_discrete(Ad, state0, drive)
+        if ode == self._ode and self.options['integrator'] == 'rk4':
+            integrator = self.get_integrator(
+                len(state0), input.shape[0], sample_time, n_samp)
+            if integrator is not None:
+                return np.array(integrator(state0, input_samp))
         time_axis = np.linspace(0., (n_samp-1)*sample_time, n_samp)
         # make interpolation function which returns the input at a certain time
         time_interp = np.linspace(
             0., (input.shape[1]-1)*sample_time, input.shape[1])
         input_interp = interp1d(time_interp, input, kind='linear',
                                 bounds_error=False, fill_value=input[:, -1])
+        from scipy.integrate import odeint
         state = odeint(ode, state0, time_axis, args=(input_interp,)).T
         return state
 
@@ -426,6 +515,72 @@ class Vehicle(OptiChild, PlotLayer):
         input = input_interp(time)
         return (1./self.options['time_constant'])*(input - state)
 
+    def _get_linear_model(self, ode):
+        if ode == self._ode:
+            return self.linear_model()
+        if ode == self._ode_1storder:
+            n_in = self.trajectories['input'].shape[0]
+            tau = self.options['time_constant']
+            return -np.eye(n_in)/tau, np.eye(n_in)/tau
+        return None
+
+    def get_integrator_key(self):
+        # vehicles of the same class, with the same options and ode
+        # parameters share their compiled integrator
+        return (self.__class__.__name__, repr(sorted(self.options.items())),
+                repr(self.ode_parameters()))
+
+    def get_integrator(self, n_st, n_in, sample_time, n_samp, n_veh=1):
+        # fixed-step rk4 integration of the symbolic ode, with linearly
+        # interpolated input, mapped over n_samp samples:
+        # (state0, input) -> state, with input and state sampled on the time axis
+        # for n_veh > 1, the integrator is mapped over n_veh vehicles:
+        # states0 and inputs/states of the vehicles are horizontally stacked
+        n_steps = self.options['integrator_steps']
+        key = (self.get_integrator_key(), n_st, n_in, sample_time, n_samp, n_veh)
+        if key in _integrators:
+            return _integrators[key]
+        x, u0, u1 = SX.sym('x', n_st), SX.sym('u0', n_in), SX.sym('u1', n_in)
+        if self.symbolic_ode(x, u0) is None:
+            _integrators[key] = None
+            return None
+        # one rk4 step over a sample interval
+        h = sample_time/n_steps
+        x_next = x
+        for k in range(n_steps):
+            ua = u0 + (u1-u0)*(float(k)/n_steps)
+            ub = u0 + (u1-u0)*(float(k+1)/n_steps)
+            um = 0.5*(ua+ub)
+            k1 = self.symbolic_ode(x_next, ua)
+            k2 = self.symbolic_ode(x_next + 0.5*h*k1, um)
+            k3 = self.symbolic_ode(x_next + 0.5*h*k2, um)
+            k4 = self.symbolic_ode(x_next + h*k3, ub)
+            x_next = x_next + (h/6.)*(k1 + 2*k2 + 2*k3 + k4)
+        step = Function('rk4', [x, u0, u1], [x_next])
+        # accumulate over the horizon
+        state0, input = MX.sym('state0', n_st), MX.sym('input', n_in, n_samp)
+        if n_samp > 1:
+            horizon = step.mapaccum('rk4_horizon', n_samp-1)
+            state = horzcat(state0, horizon(state0, input[:, :-1], input[:, 1:]))
+        else:
+            state = state0
+        integrator = Function('integrator', [state0, input], [state])
+        if n_veh > 1:
+            integrator = integrator.map(n_veh)
+        _integrators[key] = integrator
+        return integrator
+
+    def _discretize(self, model, sample_time):
+        # discretizations are cached, as the model and sample time
+        # rarely change between updates
+        if not hasattr(self, '_discretizations'):
+            self._discretizations = {}
+        A, B = model
+        key = (A.tostring(), B.tostring(), A.shape, B.shape, sample_time)
+        if key not in self._discretizations:
+            self._discretizations[key] = discretize_foh(A, B, sample_time)
+        return self._discretizations[key]
+
     def add_disturbance(self, input):
         if self.options['input_disturbance'] is not None:
             fc = self.options['input_disturbance']['fc']
@@ -437,6 +592,7 @@ class Vehicle(OptiChild, PlotLayer):
             n_sign = input.shape[0]
             n_samp = input.shape[1]
             disturbance = np.zeros((n_sign, n_samp))
+            from scipy.signal import filtfilt, butter
             filt = butter(3, fc, 'low')
             for k in range(n_sign):
                 disturbance[k, :] = filtfilt(filt[0], filt[1],
@@ -445,11 +601,11 @@ class Vehicle(OptiChild, PlotLayer):
         else:
             return input
 
-    def _add_to_memory(self, memory, dictionary, repeat=1):
+    def _add_to_memory(self, memory, dictionary, repeat=1, start_time=None, end_time=None):
         for key in dictionary.keys():
             if not (key in memory):
-                memory[key] = []
-            memory[key].extend([dictionary[key] for k in range(repeat)])
+                memory[key] = History()
+            memory[key].append(dictionary[key], repeat, start_time, end_time)
 
     def draw(self, t=-1):
         surf, lines = [], []
@@ -545,5 +701,31 @@ class Vehicle(OptiChild, PlotLayer):
     def state2pose(self, state):
         raise NotImplementedError('Please implement this method!')
 
+    def states2poses(self, states):
+        # maps a block of states (one column per sample) to poses
+        # override with an array-level mapping to avoid the per-sample loop
+        pose = []
+        for k in range(states.shape[1]):
+            pose.append(self.state2pose(states[:, k]))
+        return np.c_[pose].T
+
     def ode(self, state, input):
         raise NotImplementedError('Please implement this method!')
+
+    def linear_model(self):
+        # vehicles with linear dynamics (dstate = A*state + B*input) return
+        # (A, B), such that they are simulated by exact discretization
+        return None
+
+    def ode_parameters(self):
+        # parameters of symbolic_ode which are not in the options, e.g. the
+        # length of a car, vehicles which use them should override this method
+        return ()
+
+    def symbolic_ode(self, state, input):
+        # ode as casadi expression, used to build compiled rk4 integrators
+        # nonlinear vehicles should override this method
+        model = self.linear_model()
+        if model is None:
+            return None
+        return mtimes(model[0], state) + mtimes(model[1], input)
@@ -1,4 +1,5 @@
 import os
+import sys
 import imp
 import subprocess
 
@@ -37,6 +38,216 @@ def test_export():
                 (d, f), shell=True, stderr=subprocess.STDOUT)
 
 
+def test_import_time():
+    # importing the core planning path should stay cheap: plotting and the
+    # heavy scipy subpackages are only loaded on first use
+    budget = 1.  # seconds
+    output = subprocess.check_output([sys.executable, '-c', (
+        "import sys, time; t0 = time.time(); import omgtools; "
+        "print time.time() - t0; "
+        "print [m for m in ['matplotlib', 'scipy.signal', 'scipy.ndimage'] "
+        "if sys.modules.get(m) is not None]")])
+    import_time, loaded = output.strip().split('\n')[-2:]
+    print 'import omgtools: %.3f s' % float(import_time)
+    assert eval(loaded) == []
+    assert float(import_time) < budget
+
+
+def test_anytime_fallback():
+    # an update which is 0.2 s late has no time left to solve: the solver is
+    # stopped at its first iteration and the previous solution is kept
+    from omgtools import Holonomic, Environment, Square, Obstacle, Circle, Point2point, Deployer
+    import numpy as np
+    vehicle = Holonomic()
+    vehicle.set_initial_conditions([-1.5, -1.5])
+    vehicle.set_terminal_conditions([2., 2.])
+    environment = Environment(room={'shape': Square(5.)})
+    environment.add_obstacle(Obstacle({'position': [0., 0.]}, shape=Circle(0.4)))
+    problem = Point2point(vehicle, environment, freeT=False, options={'anytime': True})
+    problem.init()
+    deployer = Deployer(problem, sample_time=0.01, update_time=0.1)
+    previous = deployer.update(0.)
+    trajectories = deployer.update(0.3, states=previous['state'][:, 30],
+                                   inputs=previous['input'][:, 30])
+    assert problem.solve_status == ['Solve_Succeeded', 'User_Requested_Stop']
+    assert np.allclose(trajectories['state'][:, :50], previous['state'][:, 30:80])
+
+
+def test_dstar_lite_replanning():
+    # repaired searches, after changing cells and moving the start, should
+    # find paths as cheap as Dijkstra's algorithm on the same grid
+    from omgtools import Environment, Square, Obstacle, Rectangle
+    from omgtools.problems.globalplanner import DStarLitePlanner
+    import numpy as np
+    import heapq
+
+    def dijkstra(planner, start):
+        costs, heap = {tuple(planner.goal): 0}, [(0, tuple(planner.goal))]
+        while heap:
+            cost, point = heapq.heappop(heap)
+            if point == start:
+                return cost
+            if cost > costs[point]:
+                continue
+            for neighbor in planner.get_neighbors(point):
+                new_cost = cost + planner.calculate_cost(point, neighbor)
+                if new_cost < costs.get(neighbor, np.inf):
+                    costs[neighbor] = new_cost
+                    heapq.heappush(heap, (new_cost, neighbor))
+        return None
+
+    def plan(planner, start):
+        try:
+            path = planner.get_path(start=planner.convert_node_to_waypoint(list(start))[0])
+        except RuntimeError as error:
+            assert 'no path' in str(error)
+            return None
+        cells = [tuple(planner.grid.get_cell(point)) for point in path]
+        return sum([planner.calculate_cost(a, b) for a, b in zip(cells[:-1], cells[1:])])
+
+    for seed in [9, 12]:
+        random = np.random.RandomState(seed)
+        environment = Environment(room={'shape': Square(40.), 'position': [20., 20.]})
+        for position in random.uniform(3., 37., (10, 2)):
+            environment.add_obstacle(Obstacle({'position': list(position)}, shape=Rectangle(width=4., height=4.)))
+        planner = DStarLitePlanner(environment, [40, 40], [1., 1.], [39., 39.])
+        start = (0, 0)
+        for k in range(40):
+            for l in range(3):
+                i, j = random.randint(0, 40, 2)
+                if [i, j] != planner.goal:
+                    planner.grid.occupied[i, j] = not planner.grid.occupied[i, j]
+            # mostly small moves of the start, sometimes a jump
+            free = np.argwhere(~planner.grid.occupied)
+            if random.rand() < 0.3 or planner.grid.occupied[start]:
+                start = tuple(free[random.randint(len(free))])
+            assert plan(planner, start) == dijkstra(planner, start)
+
+
+def test_obstacle_grid_queries():
+    # the obstacle grid should find the same obstacles as a scan over all
+    # obstacles, also after obstacles were moved with set_state
+    from omgtools import Environment, Square, Obstacle, Circle, Rectangle
+    import numpy as np
+    random = np.random.RandomState(3)
+    environment = Environment(room={'shape': Square(40.), 'position': [20., 20.]})
+    for k in range(60):
+        shape = Circle(random.uniform(0.2, 2.)) if k % 2 else Rectangle(*random.uniform(0.5, 4., 2))
+        trajectories = {'velocity': {'time': [0.], 'values': [list(random.uniform(-1., 1., 2))]}}
+        environment.add_obstacle(Obstacle({'position': list(random.uniform(0., 40., 2))}, shape=shape,
+                                          simulation={'trajectories': trajectories} if k % 3 == 0 else {}))
+    grid = environment.get_obstacle_grid()
+
+    def scan(limits, horizon=None):
+        obstacles = []
+        for obstacle in environment.obstacles:
+            box = grid._get_box(obstacle)
+            if horizon is not None:
+                vx, vy = obstacle.signals['velocity'][:2, -1]*horizon
+                if vx == 0. and vy == 0.:
+                    continue
+                box = [box[0]+min(vx, 0.), box[1]+min(vy, 0.), box[2]+max(vx, 0.), box[3]+max(vy, 0.)]
+            if box[0] <= limits[2] and limits[0] <= box[2] and box[1] <= limits[3] and limits[1] <= box[3]:
+                obstacles.append(obstacle)
+        return obstacles
+
+    for step in range(20):
+        environment.simulate(0.5, 0.1)
+        for obstacle in random.permutation(environment.obstacles)[:5]:
+            state = {'position': list(random.uniform(0., 40., 2))}
+            if random.rand() < 0.5:
+                state['velocity'] = list(random.uniform(-2., 2., 2))
+            obstacle.set_state(state)
+        for l in range(10):
+            x, y = random.uniform(-5., 45., 2)
+            limits = [x, y, x + random.uniform(0., 10.), y + random.uniform(0., 10.)]
+            assert grid.query(limits) == scan(limits)
+            assert grid.query_moving(limits, 2.) == scan(limits, 2.)
+
+
+def test_obstacle_bouncing():
+    # bouncing with the obstacle grid should give the same trajectories as
+    # checking every pair of obstacles
+    from omgtools import Environment, Square, Obstacle, Circle, Rectangle
+    import numpy as np
+
+    def make_environment():
+        random = np.random.RandomState(5)
+        environment = Environment(room={'shape': Square(10.), 'position': [5., 5.]})
+        for k in range(12):
+            shape = Circle(random.uniform(0.2, 0.6)) if k % 2 else Rectangle(*random.uniform(0.4, 1.2, 2))
+            trajectories = {'velocity': {'time': [0.], 'values': [list(random.uniform(-2., 2., 2))]}}
+            environment.add_obstacle(Obstacle({'position': list(random.uniform(1., 9., 2))}, shape=shape,
+                                              options={'bounce': True}, simulation={'trajectories': trajectories}))
+        return environment
+
+    def simulate(environment, simulation_time, sample_time):
+        for obstacle in environment.obstacles:
+            vel = obstacle.signals['velocity'][:, -1]
+            for obs in environment.obstacles:
+                if obs != obstacle and obstacle.overlaps_with(obs):
+                    obstacle.signals['velocity'][:, -1] = environment._bounce(
+                        obstacle, vel, lambda: obstacle.overlaps_with(obs))
+            if obstacle.is_outside_of(environment.room[0]):
+                obstacle.signals['velocity'][:, -1] = environment._bounce(
+                    obstacle, vel, lambda: obstacle.is_outside_of(environment.room[0]))
+            obstacle.simulate(simulation_time, sample_time)
+
+    environment1, environment2 = make_environment(), make_environment()
+    for step in range(50):
+        environment1.simulate(0.1, 0.01)
+        simulate(environment2, 0.1, 0.01)
+    velocities = [obstacle.signals['velocity'] for obstacle in environment1.obstacles]
+    # the obstacles bounced
+    assert any([np.any(np.diff(np.sign(vel), axis=1) != 0) for vel in velocities])
+    for obstacle1, obstacle2 in zip(environment1.obstacles, environment2.obstacles):
+        assert np.array_equal(obstacle1.signals['position'], obstacle2.signals['position'])
+        assert np.array_equal(obstacle1.signals['velocity'], obstacle2.signals['velocity'])
+
+
+def test_obstacle_trajectory_steps():
+    # velocity and acceleration steps of the simulation trajectories act from
+    # their time on, also within a sample interval
+    from omgtools import Obstacle, Circle
+    import numpy as np
+    trajectories = {'velocity': {'time': [0., 0.33], 'values': [[1., 0.], [0., 2.]]},
+                    'acceleration': {'time': [0.27, 0.34], 'values': [[0.5, 0.], [0., -1.]]}}
+    obstacle = Obstacle({'position': [0., 0.]}, shape=Circle(0.1), simulation={'trajectories': trajectories})
+    obstacle.simulate(0.25, 0.1)
+    obstacle.simulate(0.5, 0.1)
+    time = obstacle.signals['time']
+    since = lambda t0: np.maximum(time - t0, 0.)
+    position = np.vstack((time + 0.25*since(0.27)**2, 2.*since(0.33) - 0.5*since(0.34)**2))
+    velocity = np.vstack((1. + 0.5*since(0.27), 2.*(time >= 0.33) - since(0.34)))
+    assert np.allclose(obstacle.signals['position'], position, rtol=0., atol=1e-12)
+    assert np.allclose(obstacle.signals['velocity'], velocity, rtol=0., atol=1e-12)
+
+
+def test_moving_points_in_frame():
+    # the slab test should find every moving point that the sampled check in
+    # point_in_frame finds, over the same horizon
+    from omgtools.environment.frame import Frame
+    import numpy as np
+    random = np.random.RandomState(7)
+    frame = Frame(None, [0., 0.], [], 0.5, 1.1, options={})
+    n_hits = 0
+    for k in range(50):
+        xmin, ymin = random.uniform(-5., 5., 2)
+        frame.border = frame.make_border(xmin, ymin, xmin + random.uniform(0.5, 5.), ymin + random.uniform(0.5, 5.))
+        time, sample_time = random.uniform(0., 5.), random.choice([0.1, 0.25, 0.5])
+        points = random.uniform(-15., 15., (100, 2))
+        velocities = random.uniform(-5., 5., (100, 2))
+        velocities[::5, random.randint(2)] = 0.
+        # point_in_frame checks at l*sample_time, l = 0, ..., round(time/sample_time)+1
+        horizon = (int(round(time/sample_time))+1)*sample_time
+        slab = frame.moving_points_in_frame(points, velocities, horizon)
+        for point, velocity, hit in zip(points, velocities, slab):
+            if frame.point_in_frame(point, sample_time=sample_time, time=time, velocity=velocity):
+                n_hits += 1
+                assert hit
+    assert n_hits > 100
+
+
 def run_example(filename):
     example_dir = os.path.join(os.getcwd(), 'examples')
     print ''